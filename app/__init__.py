@@ -1,6 +1,7 @@
 from . import schemas, models, crud, utils
 from .config import config
-from .database import Base, engine
+from .database import Base, engine, add_missing_columns
 
 # Create all database tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
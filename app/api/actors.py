@@ -0,0 +1,172 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.config import config
+from app.database import SessionLocal
+from app.utils import metrics
+
+
+class Command(NamedTuple):
+    kind: str  # "click" or "buy"
+    item_id: Optional[int]
+    future: asyncio.Future
+
+
+class UserActor:
+    """Mailbox and worker task of one user"""
+    __slots__ = ("user_id", "mailbox", "task")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+
+class UserActors:
+    """
+    Per-user actors that run a user's game mutations one at a time.
+
+    Clicks and purchases from REST and WebSocket are queued in the user's
+    mailbox and processed in arrival order, so they never race each other.
+    Consecutive queued clicks are coalesced and persisted in a single
+    transaction. An actor is started by the first command for its user and
+    retired after idle_timeout seconds without commands.
+
+    Database work runs in the actors' own thread pool, each group of
+    commands in a session of its own from session_factory; commands from
+    several requests or tabs end up in one group, so none of their sessions
+    is borrowed. Sync endpoints block a request worker thread while waiting,
+    so the actors must not depend on that pool.
+
+    /game/batch does not go through the actors: a batch runs in a
+    transaction of its own and relies on the users' version check, retrying
+    when an actor's commit got in first.
+    """
+
+    def __init__(self, idle_timeout: float = 30.0, max_batch: int = 100, session_factory: Callable[[], Session] = SessionLocal):
+        self.idle_timeout = idle_timeout
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._actors: Dict[int, UserActor] = {}
+        self._executor = ThreadPoolExecutor(thread_name_prefix="user-actor")
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    async def click(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Queue a click; returns the click result or None if the user does not exist"""
+        return await self._submit(user_id, "click")
+
+    async def buy(self, user_id: int, item_id: int) -> Optional[Dict]:
+        """Queue a purchase; returns the result of crud.game.buy_item"""
+        return await self._submit(user_id, "buy", item_id)
+
+    def _submit(self, user_id: int, kind: str, item_id: Optional[int] = None) -> asyncio.Future:
+        actor = self._actors.get(user_id)
+        if actor is None:
+            actor = UserActor(user_id)
+            actor.task = asyncio.create_task(self._run(actor))
+            self._actors[user_id] = actor
+            metrics.USER_ACTORS.inc()
+        future = asyncio.get_running_loop().create_future()
+        actor.mailbox.put_nowait(Command(kind, item_id, future))
+        return future
+
+    async def _run(self, actor: UserActor):
+        batch: List[Command] = []
+        try:
+            while True:
+                try:
+                    command = await asyncio.wait_for(actor.mailbox.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    # No await between the check and the removal, so nothing can be queued in between
+                    if actor.mailbox.empty():
+                        return
+                    continue
+                batch = [command]
+                while len(batch) < self.max_batch and not actor.mailbox.empty():
+                    batch.append(actor.mailbox.get_nowait())
+                metrics.USER_ACTOR_BATCH_SIZE.observe(len(batch))
+                await self._process(actor.user_id, batch)
+        finally:
+            if self._actors.get(actor.user_id) is actor:
+                del self._actors[actor.user_id]
+                metrics.USER_ACTORS.dec()
+            # Cancelled mid-batch: its remaining commands will never get a result
+            for command in batch:
+                if not command.future.done():
+                    command.future.cancel()
+            while not actor.mailbox.empty():
+                actor.mailbox.get_nowait().future.cancel()
+
+    async def _process(self, user_id: int, batch: List[Command]):
+        """Run consecutive clicks as one group and purchases one by one, in order"""
+        start = 0
+        while start < len(batch):
+            end = start + 1
+            if batch[start].kind == "click":
+                while end < len(batch) and batch[end].kind == "click":
+                    end += 1
+            group = batch[start:end]
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._execute, user_id, group
+                )
+            except Exception as e:
+                for command in group:
+                    if not command.future.done():
+                        command.future.set_exception(e)
+            else:
+                for command, result in zip(group, results):
+                    if not command.future.done():
+                        command.future.set_result(result)
+            start = end
+
+    def _execute(self, user_id: int, group: List[Command]) -> List[Any]:
+        db = self.session_factory()
+        try:
+            return self._execute_in(db, user_id, group)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _execute_in(db: Session, user_id: int, group: List[Command]) -> List[Any]:
+        first = group[0]
+        if first.kind == "buy":
+            return [crud.game.buy_item(db, user_id, first.item_id)]
+
+        count = len(group)
+        points_earned, user = crud.game.process_clicks(db, user_id, count)
+        if not user:
+            return [None] * count
+        # Totals as they were right after each of the coalesced clicks
+        per_click = int(points_earned)
+        return [
+            {
+                "points_earned": points_earned,
+                "new_total": user.points - per_click * (count - i),
+                "lifetime_points": user.lifetime_points - per_click * (count - i),
+                "clicks": user.clicks - (count - i),
+            }
+            for i in range(1, count + 1)
+        ]
+
+    async def stop(self):
+        """Cancel all actors along with their queued and in-flight commands"""
+        tasks = [actor.task for actor in self._actors.values() if actor.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+user_actors = UserActors(idle_timeout=config.USER_ACTOR_IDLE_SECONDS, max_batch=config.USER_ACTOR_MAX_BATCH)
+
+
+__all__ = [
+    "UserActors",
+    "user_actors",
+]
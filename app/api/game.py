@@ -1,17 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends, status, WebSocket, WebSocketDisconnect, BackgroundTasks
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, status, WebSocket, WebSocketDisconnect, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
-import json
+import anyio
+import asyncio
+import logging
+import math
+import time
 
 from app import schemas, crud
-from app.database import get_db
-from app.api.user import get_current_user_dependency
+from app.database import get_db, SessionLocal
+from app.api.user import get_current_user_dependency, get_current_user_id_dependency
 from app.models.user import User
-from app.api.websocket import manager, get_user_id_from_token, periodic_leaderboard_update
+from app.exceptions import ConcurrentUpdateError
+from app.config import config
+from app.crud.game import leaderboard_cache
+from app.crud.item import catalog_version
+from app.utils.cache import etag_matches, cache_headers, not_modified
+from app.utils import metrics
+from app.utils.sql_profile import profile_sql, profiling_requested
+from app.utils.context import current_operation
+from app.utils.rate_limit import click_limiter
+from app.utils.journal import game_journal
+from app.api.actors import user_actors
+from app.api.stream import leaderboard_stream
+from app.api.websocket import (
+    Connection, manager, heartbeat, get_user_id_from_token, periodic_leaderboard_update, negotiate_subprotocol, receive_message,
+    leaderboard_publisher, LEADERBOARD_TOPIC
+)
+
+logger = logging.getLogger(__name__)
 
 game_router = APIRouter(prefix="/game", tags=["Game"])
 
+# Message types the WebSocket endpoint understands
+WS_MESSAGE_TYPES = ("click", "buy_item", "get_state", "get_items", "subscribe", "unsubscribe", "ping", "pong")
+
 
 @game_router.get(
     "/state",
@@ -57,40 +82,30 @@ def get_game_state_with_items(
     # Get user's game state
     user = crud.game.get_user_game_state(db, current_user.id)
     
-    # Get all available items
-    all_items = crud.item.get_all_items(db)
-    
-    # Get user's items
-    user_items_db = crud.item.get_user_items(db, current_user.id)
-    user_items = {ui.item_id: ui.quantity for ui in user_items_db}
-    
-    # Create calculated items list
-    calculated_items = []
-    for item in all_items:
-        quantity = user_items.get(item.id, 0)
-        current_cost = crud.item.calculate_item_cost(
-            item.base_cost, quantity, item.cost_multiplier
-        )
-        calculated_items.append(schemas.CalculatedItem(
-            id=item.id,
-            name=item.name,
-            description=item.description,
-            base_cost=item.base_cost,
-            current_cost=current_cost,
-            points_per_click=item.points_per_click,
-            points_per_second=item.points_per_second,
-            cost_multiplier=item.cost_multiplier,
-            quantity=quantity,
-            image_url=item.image_url
-        ))
-    
     # Create response
-    response = jsonable_encoder(user)
-    response["items"] = calculated_items
+    response = game_state(user)
+    response["items"] = crud.game.get_calculated_items(db, current_user.id)
     
     return response
 
 
+def game_state(user: User) -> Dict:
+    """Game state fields of a user, as sent over WebSocket"""
+    return schemas.GameState.model_validate(user).model_dump()
+
+
+def click_result(points_earned: float, user: Optional[User]) -> Optional[Dict]:
+    """Click result sent over REST and WebSocket"""
+    if not user:
+        return None
+    return {
+        "points_earned": points_earned,
+        "new_total": user.points,
+        "lifetime_points": user.lifetime_points,
+        "clicks": user.clicks
+    }
+
+
 @game_router.post(
     "/click",
     response_model=schemas.ClickResult,
@@ -99,7 +114,7 @@ def get_game_state_with_items(
     description="Process a user's click and return the points earned"
 )
 def process_click(
-    current_user: User = Depends(get_current_user_dependency),
+    user_id: int = Depends(get_current_user_id_dependency),
     db: Session = Depends(get_db)
 ):
     """
@@ -110,21 +125,30 @@ def process_click(
     - Updates the user's lifetime points
     - Increments the click counter
     - Returns the new total points and the points earned from this click
+    
+    Clicks above the per-user rate limit (`CLICK_RATE_LIMIT`, `CLICK_BURST`)
+    are rejected with 429 and a `Retry-After` header before touching the database.
     """
-    points_earned, user = crud.game.process_click(db, current_user.id)
+    allowed, retry_after = click_limiter.allow(user_id)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many clicks",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
     
-    if not user:
+    if config.USER_ACTORS:
+        result = anyio.from_thread.run(user_actors.click, user_id)
+    else:
+        result = click_result(*crud.game.process_click(db, user_id))
+    
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return schemas.ClickResult(
-        points_earned=points_earned,
-        new_total=user.points,
-        lifetime_points=user.lifetime_points,
-        clicks=user.clicks
-    )
+    return schemas.ClickResult(**result)
 
 
 @game_router.post(
@@ -160,7 +184,10 @@ def buy_item(
             detail="Item not found"
         )
     
-    result = crud.game.buy_item(db, current_user.id, item_id)
+    if config.USER_ACTORS:
+        result = anyio.from_thread.run(user_actors.buy, current_user.id, item_id)
+    else:
+        result = crud.game.buy_item(db, current_user.id, item_id)
     
     if not result:
         raise HTTPException(
@@ -177,6 +204,60 @@ def buy_item(
     return schemas.PurchaseResult(**result)
 
 
+@game_router.post(
+    "/batch",
+    response_model=schemas.BatchResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Execute a batch of commands",
+    description="Run several game commands in order in one request and one transaction"
+)
+def execute_batch(
+    batch: schemas.BatchRequest,
+    user_id: int = Depends(get_current_user_id_dependency),
+    db: Session = Depends(get_db)
+):
+    """
+    Execute an ordered list of commands with one token check, one user load
+    and one commit, saving round trips on high-latency connections.
+
+    Commands (`type`): `click` (with `count`), `buy_item` (with `item_id`),
+    `get_state`, `get_items` and `get_leaderboard` (with `limit`). Results
+    come back in the same order, typed like the WebSocket responses. A failed
+    purchase is reported in its result and does not stop the batch.
+
+    All clicks of the batch count against the click rate limit at once; if
+    they exceed it the whole batch is rejected with 429. A batch with more
+    clicks than the limit's burst (`CLICK_BURST`) could never be allowed and
+    is rejected with 422.
+
+    Batches bypass the per-user actors (`USER_ACTORS`); conflicting commits
+    are caught by the users' version check and the batch is retried.
+    """
+    clicks = sum(command.count for command in batch.commands if command.type == "click")
+    if clicks and click_limiter.rate > 0 and clicks > click_limiter.burst:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A batch can contain at most {int(click_limiter.burst)} clicks"
+        )
+    if clicks:
+        allowed, retry_after = click_limiter.allow(user_id, cost=clicks)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many clicks",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    results = crud.game.execute_batch(db, user_id, batch.commands)
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    return {"results": results}
+
+
 @game_router.get(
     "/leaderboard",
     response_model=List[schemas.LeaderboardEntry],
@@ -185,23 +266,279 @@ def buy_item(
     description="Get the top players by lifetime points"
 )
 def get_leaderboard(
-    limit: int = 10,
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=100, description="Number of leaderboard entries"),
     db: Session = Depends(get_db)
 ):
     """
     Get the leaderboard of top players sorted by lifetime points.
     
     Query Parameters:
-    - **limit**: Maximum number of entries to return (default: 10)
+    - **limit**: Maximum number of entries to return (default: 10, 1-100)
+    
+    The computed leaderboard is reused for a few seconds and carries an ETag
+    that only changes when the rankings do; a matching `If-None-Match`
+    returns 304 Not Modified.
+    """
+    cached = leaderboard_cache.get(limit)
+    if cached is None:
+        cached = leaderboard_cache.put(limit, crud.game.get_leaderboard(db, limit))
+    
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return not_modified(cached.etag, config.LEADERBOARD_CACHE_TTL)
+    
+    response.headers.update(cache_headers(cached.etag, config.LEADERBOARD_CACHE_TTL))
+    return cached.value
+
+
+@game_router.get(
+    "/leaderboard/stream",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Stream leaderboard updates",
+    description="Server-Sent Events stream of the top 10 players, sent whenever the leaderboard changes"
+)
+async def stream_leaderboard(last_event_id: Optional[str] = Header(None)):
+    """
+    Subscribe to leaderboard updates without a WebSocket.
+    
+    Each `leaderboard` event carries the same JSON as `GET /game/leaderboard`
+    and its ETag as the event id. A client reconnecting with `Last-Event-ID`
+    is sent the leaderboard again only if it changed in the meantime.
     """
-    return crud.game.get_leaderboard(db, limit)
+    return StreamingResponse(
+        leaderboard_stream.subscribe(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def run_passive_checkpoint() -> int:
+    """Credit passive income of all users and refresh the cached default leaderboard"""
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        credited = crud.game.checkpoint_passive_income(db)
+        if credited:
+            crud.game.refresh_leaderboard(db)
+    finally:
+        db.close()
+    metrics.PASSIVE_CHECKPOINT_DURATION.observe(time.perf_counter() - start)
+    metrics.PASSIVE_CHECKPOINT_USERS_TOTAL.inc(credited)
+    return credited
+
+
+async def periodic_passive_checkpoint(interval: float):
+    """Background task crediting passive income so idle players stay current on the leaderboard"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(run_passive_checkpoint)
+        except Exception as e:
+            logger.error(f"Passive income checkpoint failed: {e}")
+
+
+async def monitor_event_loop_lag(interval: float):
+    """Background task recording how late the event loop wakes a sleeping task"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        metrics.EVENT_LOOP_LAG.observe(max(time.perf_counter() - start - interval, 0.0))
+
+
+def run_journal_snapshot(compact: bool = True) -> int:
+    """Fold journaled clicks into SQLite and compact the journal"""
+    db = SessionLocal()
+    try:
+        return crud.game.snapshot_journal(db, compact=compact)
+    finally:
+        db.close()
+
+
+async def periodic_journal_snapshot(interval: float):
+    """Background task bounding how far SQLite lags behind the click journal"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(run_journal_snapshot)
+        except Exception as e:
+            logger.error(f"Game journal snapshot failed: {e}")
+
+
+def open_game_journal(path: str) -> int:
+    """Open the click journal and replay events missing from the last snapshot"""
+    game_journal.open(path)
+    db = SessionLocal()
+    try:
+        return crud.game.recover_journal(db)
+    finally:
+        db.close()
+
+
+# Tasks started with the application and cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
 
 
-# Start the periodic leaderboard update task
 @game_router.on_event("startup")
 async def startup_event():
-    """Start the background task for leaderboard updates when the application starts"""
-    BackgroundTasks().add_task(periodic_leaderboard_update)
+    """Start the journal, leaderboard broadcast, WebSocket heartbeat, passive income and event loop lag tasks when the application starts"""
+    if config.GAME_JOURNAL_PATH:
+        replayed = await run_in_threadpool(open_game_journal, config.GAME_JOURNAL_PATH)
+        logger.info(f"Game journal {config.GAME_JOURNAL_PATH} opened, {replayed} clicks replayed")
+        background_tasks.append(asyncio.create_task(periodic_journal_snapshot(config.GAME_JOURNAL_SNAPSHOT_INTERVAL)))
+    background_tasks.append(asyncio.create_task(periodic_leaderboard_update()))
+    background_tasks.append(asyncio.create_task(leaderboard_publisher.run()))
+    if config.WS_PING_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(heartbeat(config.WS_PING_INTERVAL, config.WS_IDLE_TIMEOUT)))
+    if config.PASSIVE_CHECKPOINT_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(periodic_passive_checkpoint(config.PASSIVE_CHECKPOINT_INTERVAL)))
+    if config.EVENT_LOOP_LAG_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(monitor_event_loop_lag(config.EVENT_LOOP_LAG_INTERVAL)))
+
+
+@game_router.on_event("shutdown")
+async def shutdown_event():
+    """Cancel the background tasks started on startup and snapshot the journal"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await user_actors.stop()
+    await leaderboard_stream.stop()
+    if game_journal.enabled:
+        await run_in_threadpool(run_journal_snapshot)
+        game_journal.close()
+
+
+def current_catalog_version() -> str:
+    """Version of the item catalog clients send back with get_items"""
+    return catalog_version.etag().strip('"')
+
+
+def items_delta(item_id: int, purchase: Dict) -> Dict:
+    """WebSocket message with the items and rates changed by a successful purchase"""
+    return {
+        "type": "items_delta",
+        "catalog_version": current_catalog_version(),
+        "data": {
+            "items": [{"id": item_id, "quantity": purchase["item_quantity"], "current_cost": purchase["item_cost"]}],
+            "points": purchase["new_points"],
+            "points_per_click": purchase["new_points_per_click"],
+            "points_per_second": purchase["new_points_per_second"]
+        }
+    }
+
+
+async def handle_ws_message(db: Session, connection: Connection, message: Dict):
+    """
+    Process one message received on a user's WebSocket connection.
+    
+    Replies to reads go to the connection that asked; results of clicks and
+    purchases go to all connections of the user so other tabs stay in sync.
+    
+    Handlers query synchronously on the event loop, so the transaction is
+    ended before every send: a handler suspended in a send must not hold a
+    pooled connection that another handler would block the loop waiting for.
+    """
+    user_id = connection.user_id
+    if message["type"] == "click":
+        # Drop clicks above the rate limit before any database work
+        allowed, retry_after = click_limiter.allow(user_id)
+        if not allowed:
+            await manager.send(connection, {
+                "type": "rate_limited",
+                "data": {"retry_after": round(retry_after, 3)}
+            })
+            return
+        
+        # Process click
+        if config.USER_ACTORS:
+            result = await user_actors.click(user_id)
+        else:
+            result = click_result(*crud.game.process_click(db, user_id))
+        db.rollback()
+
+        # Send click result to all of the user's connections
+        await manager.send_personal_message({
+            "type": "click_result",
+            "data": result
+        }, user_id)
+
+    elif message["type"] == "buy_item":
+        # Process item purchase
+        item_id = message["item_id"]
+        if config.USER_ACTORS:
+            result = await user_actors.buy(user_id, item_id)
+        else:
+            result = crud.game.buy_item(db, user_id, item_id)
+        db.rollback()
+
+        # Send purchase result to all of the user's connections
+        await manager.send_personal_message({
+            "type": "purchase_result",
+            "data": result
+        }, user_id)
+
+        if result and result["success"]:
+            # Only the bought item and the rates changed, so the item list is patched
+            await manager.send_personal_message(items_delta(item_id, result), user_id)
+            
+            # Subscribers get the leaderboard from the publisher, at most once per interval
+            if manager.has_subscribers(LEADERBOARD_TOPIC):
+                leaderboard_publisher.note_change(user_id, crud.game.get_lifetime_points(db, user_id))
+
+    elif message["type"] == "ping":
+        await manager.send(connection, {"type": "pong"})
+
+    elif message["type"] == "subscribe":
+        topic, limit = message.get("topic"), message.get("limit")
+        if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool)):
+            limit = None
+        if not manager.subscribe(connection, topic, limit):
+            await manager.send(connection, {"type": "error", "data": {"message": f"Unknown topic: {topic}"}})
+            return
+        # The current value right away, so the client need not wait for the next push
+        current = manager.topic_message(db, connection, topic)
+        db.rollback()
+        if current is not None:
+            await manager.send(connection, current)
+
+    elif message["type"] == "unsubscribe":
+        topic = message.get("topic")
+        if not manager.unsubscribe(connection, topic):
+            await manager.send(connection, {"type": "error", "data": {"message": f"Unknown topic: {topic}"}})
+
+    elif message["type"] == "get_state":
+        # Send current state
+        state = game_state(crud.game.get_user_game_state(db, user_id))
+        db.rollback()
+        await manager.send(connection, {
+            "type": "game_state", 
+            "data": state
+        })
+
+    elif message["type"] == "get_items":
+        # The catalog the client holds is current: only quantities and costs are sent
+        version = current_catalog_version()
+        if message.get("catalog_version") == version:
+            items = crud.game.get_calculated_items(db, user_id, compact=True)
+            db.rollback()
+            await manager.send(connection, {
+                "type": "items_delta",
+                "catalog_version": version,
+                "data": {"items": items}
+            })
+            return
+
+        # Send all items with calculated costs
+        items = crud.game.get_calculated_items(db, user_id)
+        db.rollback()
+        await manager.send(connection, {
+            "type": "items_list",
+            "catalog_version": version,
+            "data": items
+        })
 
 
 @game_router.websocket("/ws/{token}")
@@ -215,6 +552,25 @@ async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Dep
     - Processes game events in real-time (clicks, purchases, etc.)
     - Sends game state updates to the client
     
+    Sending the `X-SQL-Profile: 1` header on the handshake logs the SQL
+    statements executed for every message on this connection.
+    
+    Leaderboard, own rank and global stats updates are pushed only to
+    connections subscribed to the topic (`{"type": "subscribe", "topic":
+    "leaderboard", "limit": 25}`, `"rank"`, `"stats"`, and `unsubscribe`).
+    With `WS_LEADERBOARD_BY_DEFAULT` new connections start subscribed to the
+    top 10 leaderboard.
+    
+    The server pings clients that have been silent for `WS_PING_INTERVAL`
+    seconds (`{"type": "ping"}`, answered with `{"type": "pong"}`) and closes
+    connections the ping cannot be sent to. With `WS_IDLE_TIMEOUT` set,
+    connections silent for that many seconds are closed too, so clients
+    must then answer pings.
+    
+    Offering the `ubbclicker.bin.v1` subprotocol switches server messages to
+    compact binary frames (see app/utils/ws_protocol.py); clients may send
+    either binary or JSON frames.
+    
     Path Parameters:
     - **token**: JWT access token for authentication
     """
@@ -225,98 +581,51 @@ async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Dep
         return
         
     # Accept connection and add to connection manager
-    await manager.connect(websocket, user_id)
+    connection = await manager.connect(websocket, user_id, negotiate_subprotocol(websocket, config.WS_BINARY_PROTOCOL))
+    if config.WS_LEADERBOARD_BY_DEFAULT:
+        manager.subscribe(connection, LEADERBOARD_TOPIC)
+    sql_profile_enabled = config.SQL_PROFILE or profiling_requested(websocket.headers)
     
     try:
         # Send initial state
-        user = crud.game.get_user_game_state(db, user_id)
-        await manager.send_personal_message({
+        state = game_state(crud.game.get_user_game_state(db, user_id))
+        db.rollback()
+        await manager.send(connection, {
             "type": "game_state", 
-            "data": jsonable_encoder(user)
-        }, user_id)
+            "data": state
+        })
         
         # Process messages
         while True:
+            # Reads leave a transaction open; ending it returns the pooled
+            # database connection, which an idle socket would otherwise keep
+            db.rollback()
+
             # Wait for messages from the client
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            message = await receive_message(websocket)
+            connection.last_seen = time.monotonic()
+            message_type = message.get("type")
+            metrics.WS_MESSAGES_TOTAL.labels(message_type if message_type in WS_MESSAGE_TYPES else "unknown").inc()
+            if message_type == "pong":
+                # Answer to a heartbeat ping; receiving it is all that matters
+                continue
             
             # Handle different message types
-            if message["type"] == "click":
-                # Process click
-                points_earned, user = crud.game.process_click(db, user_id)
-                
-                # Send click result back to user
-                await manager.send_personal_message({
-                    "type": "click_result",
-                    "data": {
-                        "points_earned": points_earned,
-                        "new_total": user.points,
-                        "lifetime_points": user.lifetime_points,
-                        "clicks": user.clicks
-                    }
-                }, user_id)
-                
-            elif message["type"] == "buy_item":
-                # Process item purchase
-                item_id = message["item_id"]
-                result = crud.game.buy_item(db, user_id, item_id)
-                
-                # Send purchase result back to user
-                await manager.send_personal_message({
-                    "type": "purchase_result",
-                    "data": result
-                }, user_id)
-                
-                # If the purchase changes the leaderboard, update all clients
-                if result["success"]:
-                    await manager.broadcast_leaderboard()
-            
-            elif message["type"] == "get_state":
-                # Send current state
-                user = crud.game.get_user_game_state(db, user_id)
-                await manager.send_personal_message({
-                    "type": "game_state", 
-                    "data": jsonable_encoder(user)
-                }, user_id)
-                
-            elif message["type"] == "get_items":
-                # Get all items with calculated costs
-                user = crud.game.get_user_game_state(db, user_id)
-                all_items = crud.item.get_all_items(db)
-                user_items_db = crud.item.get_user_items(db, user_id)
-                user_items = {ui.item_id: ui.quantity for ui in user_items_db}
-                
-                # Create calculated items list
-                calculated_items = []
-                for item in all_items:
-                    quantity = user_items.get(item.id, 0)
-                    current_cost = crud.item.calculate_item_cost(
-                        item.base_cost, quantity, item.cost_multiplier
-                    )
-                    calculated_items.append({
-                        "id": item.id,
-                        "name": item.name,
-                        "description": item.description,
-                        "base_cost": item.base_cost,
-                        "current_cost": current_cost,
-                        "points_per_click": item.points_per_click,
-                        "points_per_second": item.points_per_second,
-                        "cost_multiplier": item.cost_multiplier,
-                        "quantity": quantity,
-                        "image_url": item.image_url
+            current_operation.set(f"WS {message_type}")
+            with profile_sql(f"WS {message_type} user={user_id}", enabled=sql_profile_enabled,
+                             repeat_threshold=config.SQL_PROFILE_REPEAT_THRESHOLD):
+                try:
+                    await handle_ws_message(db, connection, message)
+                except ConcurrentUpdateError:
+                    await manager.send(connection, {
+                        "type": "error",
+                        "data": {"message": "Game state changed concurrently, please retry"}
                     })
                 
-                # Send items to user
-                await manager.send_personal_message({
-                    "type": "items_list", 
-                    "data": calculated_items
-                }, user_id)
-                
     except WebSocketDisconnect:
         # Remove from connection manager on disconnect
-        manager.disconnect(user_id)
+        manager.disconnect(connection)
     except Exception as e:
         # Log error and disconnect
         print(f"WebSocket error: {str(e)}")
-        manager.disconnect(user_id)
\ No newline at end of file
+        manager.disconnect(connection)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, status, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, status, File, UploadFile, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
@@ -9,6 +9,9 @@ from app import schemas, crud
 from app.database import get_db
 from app.api.user import get_current_user_dependency
 from app.models.user import User
+from app.config import config
+from app.crud.item import catalog_version
+from app.utils.cache import etag_matches, cache_headers, not_modified
 
 item_router = APIRouter(prefix="/items", tags=["Items"])
 
@@ -21,6 +24,8 @@ item_router = APIRouter(prefix="/items", tags=["Items"])
     description="Get a list of all available items in the game"
 )
 def get_all_items(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
@@ -28,7 +33,15 @@ def get_all_items(
     
     This endpoint retrieves all items that can be purchased in the game,
     including their base cost, bonuses, and other attributes.
+    
+    The response carries an ETag derived from the catalog version; sending it
+    back in `If-None-Match` returns 304 Not Modified without querying the database.
     """
+    etag = catalog_version.etag()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, config.CATALOG_CACHE_MAX_AGE)
+    
+    response.headers.update(cache_headers(etag, config.CATALOG_CACHE_MAX_AGE))
     return crud.item.get_all_items(db)
 
 
@@ -41,6 +54,8 @@ def get_all_items(
 )
 def get_item(
     item_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
@@ -48,13 +63,20 @@ def get_item(
     
     Path Parameters:
     - **item_id**: ID of the item to retrieve
+    
+    Supports conditional requests with `If-None-Match` like `GET /items/`.
     """
+    etag = catalog_version.etag(item_id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, config.CATALOG_CACHE_MAX_AGE)
+    
     item = crud.item.get(db, item_id)
     if not item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Item not found"
         )
+    response.headers.update(cache_headers(etag, config.CATALOG_CACHE_MAX_AGE))
     return item
 
 
@@ -156,6 +178,9 @@ def update_item(
     - **points_per_second**: Additional points per second from this item
     - **cost_multiplier**: Cost multiplier for each purchase
     - **image_url**: URL to the item's image
+    
+    Changing `points_per_click` or `points_per_second` recomputes the derived
+    stats of every owner of the item.
     """
     # In a real app, you'd check if the current user has admin privileges
     
@@ -167,8 +192,37 @@ def update_item(
             detail="Item not found"
         )
         
-    # Update and return
-    return crud.item.update(db, db_obj=db_item, obj_in=item_update)
+    # Update the item
+    old_bonuses = (db_item.points_per_click, db_item.points_per_second)
+    db_item = crud.item.update(db, db_obj=db_item, obj_in=item_update)
+    
+    # Owners' derived stats depend on the item's bonuses
+    if (db_item.points_per_click, db_item.points_per_second) != old_bonuses:
+        crud.game.recompute_user_stats(db, item_id=item_id)
+        db.refresh(db_item)
+    
+    return db_item
+
+
+@item_router.post(
+    "/recompute-stats",
+    status_code=status.HTTP_200_OK,
+    summary="Recompute user stats",
+    description="Recompute every user's points per click and per second from owned items"
+)
+def recompute_user_stats(
+    current_user: User = Depends(get_current_user_dependency),
+    db: Session = Depends(get_db)
+):
+    """
+    Recompute derived stats of all users from the items they own.
+    
+    Sets each user's points per click to 1 + sum(quantity * item points per click)
+    and points per second to sum(quantity * item points per second), in one
+    set-based transaction. Use this after bulk item changes.
+    """
+    # In a real app, you'd check if the current user has admin privileges
+    return {"updated_users": crud.game.recompute_user_stats(db)}
 
 
 @item_router.delete(
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import registry
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+@metrics_router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Prometheus metrics",
+    description="Request latency, SQL, commit and WebSocket metrics in the Prometheus text format"
+)
+def get_metrics():
+    """
+    Expose application metrics for Prometheus scraping:
+
+    - Per-route HTTP latency histograms, request counters and in-flight requests
+    - SQL statement count and time, overall and per request
+    - Committed transactions
+    - Open WebSocket connections, messages per type and broadcast duration
+    - Event loop lag
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
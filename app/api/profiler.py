@@ -0,0 +1,108 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import PlainTextResponse
+
+from app import schemas
+from app.api.game import handle_ws_message
+from app.api.user import get_current_user_dependency
+from app.config import config
+from app.models.user import User
+from app.utils.profiler import profiler
+
+profiler_router = APIRouter(prefix="/profiler", tags=["Profiler"])
+
+
+@profiler_router.post(
+    "/start",
+    response_model=schemas.ProfilerStatus,
+    status_code=status.HTTP_200_OK,
+    summary="Start the sampling profiler",
+    description="Sample live request stacks for a time window and attribute them to routes and WebSocket message types"
+)
+def start_profiler(
+    request: Request,
+    params: schemas.ProfilerStart,
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    Start sampling the stacks of live requests.
+
+    Samples are attributed to the route (e.g. `POST /game/click`) or WebSocket
+    message type (e.g. `WS buy_item`) being processed. When the window ends
+    the samples are written in collapsed stack format to `PROFILER_OUTPUT_DIR`,
+    ready for flamegraph tools.
+
+    Request Body:
+    - **duration**: Seconds to sample (limited by `PROFILER_MAX_DURATION`)
+    - **sample_rate**: Fraction of sampling ticks that are recorded (0-1]
+    - **interval_ms**: Milliseconds between samples
+    """
+    if params.duration > config.PROFILER_MAX_DURATION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Duration cannot exceed {config.PROFILER_MAX_DURATION} seconds"
+        )
+
+    started = profiler.start(
+        routes=request.app.routes,
+        message_handlers={handle_ws_message: "message"},
+        duration=params.duration,
+        interval=params.interval_ms / 1000,
+        sample_rate=params.sample_rate,
+        output_dir=config.PROFILER_OUTPUT_DIR,
+    )
+    if not started:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profiler is already running"
+        )
+    return profiler.status()
+
+
+@profiler_router.post(
+    "/stop",
+    response_model=schemas.ProfilerStatus,
+    status_code=status.HTTP_200_OK,
+    summary="Stop the sampling profiler",
+    description="Stop sampling early and write the collected stacks"
+)
+def stop_profiler(
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    Stop the current profiler run and write its collapsed stacks file.
+    """
+    profiler.stop()
+    return profiler.status()
+
+
+@profiler_router.get(
+    "/status",
+    response_model=schemas.ProfilerStatus,
+    status_code=status.HTTP_200_OK,
+    summary="Get profiler status",
+    description="Get the state of the sampling profiler and samples per route"
+)
+def get_profiler_status(
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    Get whether the profiler is running and how many samples each route or
+    WebSocket message type has collected.
+    """
+    return profiler.status()
+
+
+@profiler_router.get(
+    "/stacks",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Download collapsed stacks",
+    description="Get the samples of the current or last run in collapsed stack format"
+)
+def get_profiler_stacks(
+    current_user: User = Depends(get_current_user_dependency)
+):
+    """
+    Get the collected samples as collapsed stacks (`label;outer;...;inner count`).
+    """
+    return PlainTextResponse(profiler.collapsed())
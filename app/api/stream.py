@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import crud
+from app.config import config
+from app.crud.game import leaderboard_cache
+from app.database import SessionLocal
+from app.utils import metrics
+from app.utils.cache import CachedValue
+from app.utils.bignum import to_wire
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def _load_leaderboard(limit: int) -> CachedValue:
+    db = SessionLocal()
+    try:
+        return leaderboard_cache.put(limit, crud.game.get_leaderboard(db, limit))
+    finally:
+        db.close()
+
+
+class LeaderboardStream:
+    """
+    Server-Sent Events hub for the leaderboard.
+
+    One producer task polls the leaderboard cache while anyone is subscribed
+    and encodes each changed leaderboard once; every subscriber is sent the
+    same bytes. Subscribers keep no queue, only the id of the last event they
+    were sent, so a slow one simply skips to the newest leaderboard. Event
+    ids are the leaderboard ETags, so a client reconnecting with
+    Last-Event-ID is only sent the leaderboard again if it changed.
+    """
+
+    def __init__(self, limit: int = 10, interval: float = 2.0, keepalive: float = 15.0, retry_ms: int = 5000):
+        self.limit = limit
+        self.interval = interval
+        self.keepalive = keepalive
+        self.retry_ms = retry_ms
+        self.event_id: Optional[str] = None
+        self.payload: bytes = b""
+        self.subscribers = 0
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def publish(self, cached: CachedValue):
+        """Encode a leaderboard once and wake all subscribers if it changed"""
+        event_id = cached.etag.strip('"')
+        if event_id == self.event_id:
+            return
+        entries = [{**entry, "lifetime_points": to_wire(entry["lifetime_points"])} for entry in cached.value]
+        data = json.dumps(entries, separators=(",", ":"))
+        self.payload = f"id: {event_id}\nevent: leaderboard\ndata: {data}\n\n".encode()
+        self.event_id = event_id
+        changed, self._changed = self._changed, asyncio.Event()
+        if changed is not None:
+            changed.set()
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Event stream for one subscriber"""
+        self.subscribers += 1
+        metrics.SSE_SUBSCRIBERS.inc()
+        self._ensure_producer()
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            sent = last_event_id
+            while True:
+                # Taken before sending, so a publish during the send still wakes us
+                changed = self._changed
+                if self.event_id is not None and self.event_id != sent:
+                    sent = self.event_id
+                    yield self.payload
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+        finally:
+            self.subscribers -= 1
+            metrics.SSE_SUBSCRIBERS.dec()
+
+    def _ensure_producer(self):
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._changed = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self.subscribers > 0:
+            try:
+                cached = leaderboard_cache.get(self.limit)
+                if cached is None:
+                    cached = await run_in_threadpool(_load_leaderboard, self.limit)
+                self.publish(cached)
+            except Exception as e:
+                logger.error(f"Leaderboard stream update failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        """Stop the producer task"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+leaderboard_stream = LeaderboardStream(
+    interval=config.LEADERBOARD_STREAM_INTERVAL,
+    keepalive=config.LEADERBOARD_STREAM_KEEPALIVE,
+)
+
+
+__all__ = [
+    "LeaderboardStream",
+    "leaderboard_stream",
+]
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Security
+from fastapi import APIRouter, HTTPException, status, Depends, Security, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from jose import JWTError
+import math
 
 from app import schemas, crud
 from app.database import get_db
 from app.utils.security import create_access_token, validate_token
 from app.models.user import User
+from app.utils.rate_limit import auth_ip_limiter, auth_nickname_limiter
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
@@ -15,6 +17,31 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
 user_router = APIRouter(prefix="/user", tags=["User"])
 
 
+def check_auth_rate_limit(action: str, request: Request, nickname: str):
+    """
+    Reject login/registration attempts above the per-address or per-nickname
+    limits. Runs before any password hashing so floods don't burn CPU on bcrypt.
+    Each limit is checked and charged atomically; when a later limit rejects
+    the attempt, the earlier charges are refunded, so an attempt rejected for
+    its nickname doesn't use up the address's quota.
+    """
+    client_host = request.client.host if request.client else "unknown"
+    limits = (
+        (auth_ip_limiter, (action, client_host)),
+        (auth_nickname_limiter, (action, nickname.lower())),
+    )
+    for i, (limiter, key) in enumerate(limits):
+        allowed, retry_after = limiter.allow(key)
+        if not allowed:
+            for charged, charged_key in limits[:i]:
+                charged.refund(charged_key)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, try again later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+
 @user_router.post(
     "/register", 
     response_model=schemas.UserResponse,
@@ -23,6 +50,7 @@ user_router = APIRouter(prefix="/user", tags=["User"])
     description="Create a new user with the provided nickname and password"
 )
 def register_user(
+    request: Request,
     user: schemas.UserCreate, 
     db: Session = Depends(get_db)
 ):
@@ -31,7 +59,10 @@ def register_user(
     
     - **nickname**: unique username
     - **password**: user password (min length: 5, max length: 20)
+    
+    Attempts are rate limited per client address and nickname (429 with `Retry-After`).
     """
+    check_auth_rate_limit("register", request, user.nickname)
     try:
         return crud.user.register(db, user)
     except IntegrityError:
@@ -49,6 +80,7 @@ def register_user(
     description="Login with user credentials to get an access token for authentication. This endpoint expects data in form-urlencoded format, not JSON."
 )
 def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -65,11 +97,15 @@ def login(
     - **access_token**: JWT token used for authentication
     - **token_type**: Type of token (bearer)
     
+    Attempts are rate limited per client address and nickname; excess attempts
+    get 429 with a `Retry-After` header.
+    
     Example curl request:
     ```
     curl -X POST "http://localhost:8000/user/login" -d "username=yourusername&password=yourpassword" -H "Content-Type: application/x-www-form-urlencoded"
     ```
     """
+    check_auth_rate_limit("login", request, form_data.username)
     user = crud.user.authenticate(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -195,3 +231,23 @@ def get_current_user_dependency(
         raise credentials_exception
     
     return user
+
+
+# Dependency to get the current user id without loading the user
+def get_current_user_id_dependency(
+    token: str = Security(oauth2_scheme)
+) -> int:
+    """
+    Dependency to get the authenticated user's id from the token alone.
+    
+    Hot paths that load the user themselves use this to skip a query and
+    to reject requests (e.g. rate limited clicks) before any database work.
+    """
+    token_data = validate_token(token)
+    if token_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return int(token_data.sub)
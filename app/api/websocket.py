@@ -1,57 +1,299 @@
-from fastapi import WebSocket, Depends
-from typing import Dict, List, Any
+from fastapi import WebSocket, WebSocketDisconnect, Depends
+from typing import Dict, List, Any, Optional, Set, Tuple
 import json
 from sqlalchemy.orm import Session
 import asyncio
+import logging
+import time
 
 from app.database import get_db, SessionLocal
 from app import crud
+from app.config import config
+from app.utils import metrics
+from app.utils.bignum import wire_json
 from app.utils.security import validate_token
+from app.utils.ws_protocol import BINARY_SUBPROTOCOL, encode_message, decode_message
+
+logger = logging.getLogger(__name__)
+
+# Topics a connection subscribes to for pushed updates
+LEADERBOARD_TOPIC = "leaderboard"  # top K players, K chosen by the subscriber
+RANK_TOPIC = "rank"  # the subscriber's own position
+STATS_TOPIC = "stats"  # player count, players online and global totals
+TOPICS = (LEADERBOARD_TOPIC, RANK_TOPIC, STATS_TOPIC)
+
+DEFAULT_LEADERBOARD_LIMIT = 10
+MAX_LEADERBOARD_LIMIT = 100
+
+
+class Connection:
+    """One open WebSocket of a user"""
+    __slots__ = ("websocket", "user_id", "binary", "connected_at", "last_seen", "leaderboard_limit")
+
+    def __init__(self, websocket: WebSocket, user_id: int, binary: bool = False):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.binary = binary
+        self.connected_at = time.monotonic()
+        # Last time anything, a pong included, was received from the client
+        self.last_seen = self.connected_at
+        # Entries of the leaderboard topic this connection is sent
+        self.leaderboard_limit = DEFAULT_LEADERBOARD_LIMIT
 
 
 class ConnectionManager:
+    """
+    Registry of open WebSocket connections.
+
+    Connections are kept in a set and indexed by user, so connecting and
+    disconnecting are O(1) at any number of connections. A user may have
+    several connections (browser tabs); messages for the user are sent to
+    all of them. A message sent to many connections is encoded once per
+    protocol.
+
+    Pushed updates are grouped in topics (see TOPICS). Each topic keeps its
+    own set of subscribers, and publishing a topic only queries, encodes
+    and sends what its subscribers asked for.
+    """
+
     def __init__(self):
-        # Maps user_id to WebSocket connection
-        self.active_connections: Dict[int, WebSocket] = {}
-        # For broadcasting updates to all users
-        self.broadcast_connections: List[WebSocket] = []
+        self._connections: Set[Connection] = set()
+        # A user has only a few tabs, and a short list is much smaller than a set
+        self._by_user: Dict[int, List[Connection]] = {}
+        self._subscribers: Dict[str, Set[Connection]] = {topic: set() for topic in TOPICS}
+        # Size and lifetime points by player of the last leaderboard pushed
+        self._pushed_leaderboard: Optional[Tuple[int, Dict[int, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def user_connections(self, user_id: int) -> List[Connection]:
+        """Open connections of a user"""
+        return list(self._by_user.get(user_id, ()))
+
+    def subscribers(self, topic: str) -> Set[Connection]:
+        """Connections subscribed to a topic"""
+        return set(self._subscribers.get(topic, ()))
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
+
+    def leaderboard_affected_by(self, user_id: int, lifetime_points) -> bool:
+        """
+        Whether a player now having lifetime_points could change the last
+        pushed leaderboard: the player is on it with other points, the board
+        was not full, or the player has at least the points of its last entry.
+        """
+        if self._pushed_leaderboard is None or lifetime_points is None:
+            return True
+        size, points_by_user = self._pushed_leaderboard
+        if user_id in points_by_user:
+            return points_by_user[user_id] != lifetime_points
+        if len(points_by_user) < size:
+            return True
+        return lifetime_points >= min(points_by_user.values())
+
+    def subscribe(self, connection: Connection, topic: str, limit: Optional[int] = None) -> bool:
+        """
+        Subscribe a connection to a topic; limit picks the size of the
+        leaderboard (clamped to 1-MAX_LEADERBOARD_LIMIT). Subscribing again
+        only changes the limit. Returns False for an unknown topic.
+        """
+        subscribers = self._subscribers.get(topic)
+        if subscribers is None or connection not in self._connections:
+            return False
+        if topic == LEADERBOARD_TOPIC and limit is not None:
+            connection.leaderboard_limit = min(max(int(limit), 1), MAX_LEADERBOARD_LIMIT)
+        subscribers.add(connection)
+        return True
+
+    def unsubscribe(self, connection: Connection, topic: str) -> bool:
+        """Stop pushing a topic to a connection. Returns False for an unknown topic."""
+        subscribers = self._subscribers.get(topic)
+        if subscribers is None:
+            return False
+        subscribers.discard(connection)
+        return True
         
-    async def connect(self, websocket: WebSocket, user_id: int):
-        """Connect a user's websocket and register them by user_id"""
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        self.broadcast_connections.append(websocket)
+    async def connect(self, websocket: WebSocket, user_id: int, subprotocol: Optional[str] = None) -> Connection:
+        """Accept a user's websocket and register it"""
+        await websocket.accept(subprotocol=subprotocol)
+        connection = Connection(websocket, user_id, binary=subprotocol == BINARY_SUBPROTOCOL)
+        self._connections.add(connection)
+        self._by_user.setdefault(user_id, []).append(connection)
+        metrics.WS_CONNECTIONS.inc()
+        return connection
         
-    def disconnect(self, user_id: int):
-        """Disconnect a user's websocket"""
-        if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            if websocket in self.broadcast_connections:
-                self.broadcast_connections.remove(websocket)
-            del self.active_connections[user_id]
+    def disconnect(self, connection: Connection):
+        """Unregister a connection; safe to call more than once"""
+        if connection not in self._connections:
+            return
+        self._connections.discard(connection)
+        for subscribers in self._subscribers.values():
+            subscribers.discard(connection)
+        user_connections = self._by_user.get(connection.user_id)
+        if user_connections is not None:
+            user_connections.remove(connection)
+            if not user_connections:
+                del self._by_user[connection.user_id]
+        metrics.WS_CONNECTIONS.dec()
+
+    async def send(self, connection: Connection, message: Any):
+        """Send a message to one connection"""
+        if connection.binary:
+            frame = encode_message(message)
+            if frame is not None:
+                await connection.websocket.send_bytes(frame)
+                return
+        await connection.websocket.send_text(json.dumps(wire_json(message), separators=(",", ":"), ensure_ascii=False))
+
+    async def _fan_out(self, connections: List[Connection], message: Any):
+        text: Optional[str] = None
+        frame: Optional[bytes] = None
+        frame_encoded = False
+        for connection in connections:
+            try:
+                if connection.binary:
+                    if not frame_encoded:
+                        frame, frame_encoded = encode_message(message), True
+                    if frame is not None:
+                        await connection.websocket.send_bytes(frame)
+                        continue
+                if text is None:
+                    text = json.dumps(wire_json(message), separators=(",", ":"), ensure_ascii=False)
+                await connection.websocket.send_text(text)
+            except Exception:
+                # A socket that went away without a close frame; its handler cleans up too
+                if connection in self._connections:
+                    self.disconnect(connection)
+                    metrics.WS_CONNECTIONS_RECLAIMED_TOTAL.labels("send_error").inc()
             
     async def send_personal_message(self, message: Any, user_id: int):
-        """Send a message to a specific user"""
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
+        """Send a message to every connection of a user"""
+        connections = self._by_user.get(user_id)
+        if connections:
+            await self._fan_out(list(connections), message)
             
     async def broadcast(self, message: Any):
-        """Send a message to all connected users"""
-        for connection in self.broadcast_connections:
-            await connection.send_json(message)
+        """Send a message to all connections"""
+        start = time.perf_counter()
+        await self._fan_out(list(self._connections), message)
+        metrics.WS_BROADCAST_DURATION.observe(time.perf_counter() - start)
             
-    async def broadcast_leaderboard(self):
-        """Broadcast updated leaderboard to all connected users"""
-        # Open DB session for the background task
-        db = SessionLocal()
+    async def sweep(self, ping_interval: float, idle_timeout: float, send_timeout: float = 5.0, batch_size: int = 500) -> int:
+        """
+        Ping connections silent for ping_interval seconds and evict those
+        whose ping fails or, with a positive idle_timeout, that have been
+        silent for idle_timeout seconds. Returns the number of evicted
+        connections.
+
+        Pings and closes are sent concurrently, batch_size at a time, so a
+        few stalled sockets cost one send_timeout rather than one each.
+        An evicted connection is unregistered first, so it gets no more
+        broadcasts, and then closed, which ends its handler and releases the
+        handler's database session.
+        """
+        now = time.monotonic()
+        evicted = []
+        quiet = []
+        for connection in list(self._connections):
+            idle = now - connection.last_seen
+            if 0 < idle_timeout <= idle:
+                evicted.append(connection)
+            elif idle >= ping_interval:
+                quiet.append(connection)
+        metrics.WS_CONNECTIONS_AWAITING_PONG.set(len(quiet))
+
+        for start in range(0, len(quiet), batch_size):
+            batch = quiet[start:start + batch_size]
+            results = await asyncio.gather(
+                *(asyncio.wait_for(self.send(connection, {"type": "ping"}), send_timeout) for connection in batch),
+                return_exceptions=True
+            )
+            evicted.extend(connection for connection, result in zip(batch, results) if isinstance(result, Exception))
+
+        evicted = [connection for connection in evicted if connection in self._connections]
+        for connection in evicted:
+            self.disconnect(connection)
+            metrics.WS_CONNECTIONS_RECLAIMED_TOTAL.labels("idle").inc()
+        for start in range(0, len(evicted), batch_size):
+            await asyncio.gather(
+                *(asyncio.wait_for(connection.websocket.close(code=1001), send_timeout)
+                  for connection in evicted[start:start + batch_size]),
+                return_exceptions=True
+            )
+        return len(evicted)
+
+    async def publish(self, topics=TOPICS, db: Optional[Session] = None):
+        """Push the current value of topics to their subscribers"""
+        if not any(self._subscribers[topic] for topic in topics):
+            return
+        start = time.perf_counter()
+        # Open DB session for the background task unless one is given
+        session = db or SessionLocal()
         try:
-            leaderboard = crud.game.get_leaderboard(db)
-            await self.broadcast({
-                "type": "leaderboard_update",
-                "data": leaderboard
-            })
+            if LEADERBOARD_TOPIC in topics:
+                await self._publish_leaderboard(session)
+            if RANK_TOPIC in topics:
+                await self._publish_ranks(session)
+            if STATS_TOPIC in topics:
+                await self._publish_stats(session)
         finally:
-            db.close()
+            if db is None:
+                session.close()
+        metrics.WS_BROADCAST_DURATION.observe(time.perf_counter() - start)
+
+    async def _publish_leaderboard(self, db: Session):
+        # One query for the largest board; each size is encoded once for all who asked for it
+        by_limit: Dict[int, List[Connection]] = {}
+        for connection in self._subscribers[LEADERBOARD_TOPIC]:
+            by_limit.setdefault(connection.leaderboard_limit, []).append(connection)
+        if not by_limit:
+            return
+        size = max(by_limit)
+        leaderboard = crud.game.get_leaderboard(db, size)
+        self._pushed_leaderboard = (size, {entry["id"]: entry["lifetime_points"] for entry in leaderboard})
+        for limit, connections in by_limit.items():
+            await self._fan_out(connections, leaderboard_message(leaderboard[:limit]))
+
+    async def _publish_ranks(self, db: Session):
+        by_user: Dict[int, List[Connection]] = {}
+        for connection in self._subscribers[RANK_TOPIC]:
+            by_user.setdefault(connection.user_id, []).append(connection)
+        if not by_user:
+            return
+        ranks = crud.game.get_ranks(db, list(by_user))
+        for user_id, connections in by_user.items():
+            if user_id in ranks:
+                await self._fan_out(connections, rank_message(ranks[user_id]))
+
+    async def _publish_stats(self, db: Session):
+        subscribers = list(self._subscribers[STATS_TOPIC])
+        if subscribers:
+            await self._fan_out(subscribers, stats_message(crud.game.get_global_stats(db), len(self)))
+
+    def topic_message(self, db: Session, connection: Connection, topic: str) -> Optional[Dict]:
+        """Current value of a topic as it is pushed to the connection"""
+        if topic == LEADERBOARD_TOPIC:
+            return leaderboard_message(crud.game.get_leaderboard(db, connection.leaderboard_limit))
+        if topic == RANK_TOPIC:
+            rank = crud.game.get_ranks(db, [connection.user_id]).get(connection.user_id)
+            return rank_message(rank) if rank else None
+        if topic == STATS_TOPIC:
+            return stats_message(crud.game.get_global_stats(db), len(self))
+        return None
+
+
+def leaderboard_message(leaderboard: List[Dict]) -> Dict:
+    return {"type": "leaderboard_update", "data": leaderboard}
+
+
+def rank_message(rank: Dict) -> Dict:
+    return {"type": "rank_update", "data": rank}
+
+
+def stats_message(stats: Dict, online: int) -> Dict:
+    return {"type": "stats_update", "data": {**stats, "online": online}}
 
 
 # Create a global connection manager instance
@@ -60,13 +302,101 @@ manager = ConnectionManager()
 
 # Define a background task for periodic leaderboard updates
 async def periodic_leaderboard_update():
-    """Background task to periodically update the leaderboard for all clients"""
+    """Background task to periodically push the leaderboard, ranks and stats to their subscribers"""
     while True:
-        await manager.broadcast_leaderboard()
+        try:
+            await manager.publish()
+        except Exception as e:
+            logger.error(f"WebSocket topic update failed: {e}")
         # Wait 5 seconds between updates
         await asyncio.sleep(5)
 
 
+class LeaderboardPublisher:
+    """
+    Coalesces leaderboard pushes caused by purchases.
+
+    A purchase only marks the leaderboard dirty, and only when it could
+    change the board last pushed to subscribers. The run() task pushes a
+    dirty leaderboard at most once per interval, so a burst of purchases
+    costs one query and one push instead of one each.
+    """
+
+    def __init__(self, manager: ConnectionManager, interval: float = 1.0):
+        self.manager = manager
+        self.interval = interval
+        self.dirty = False
+        self.last_published = -float("inf")
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def note_change(self, user_id: int, lifetime_points) -> bool:
+        """Record a player's new lifetime points; returns whether a push is pending"""
+        if not self.manager.leaderboard_affected_by(user_id, lifetime_points):
+            metrics.WS_LEADERBOARD_CHANGES_TOTAL.labels("ignored").inc()
+            return self.dirty
+        metrics.WS_LEADERBOARD_CHANGES_TOTAL.labels("coalesced" if self.dirty else "scheduled").inc()
+        self.mark_dirty()
+        return True
+
+    def mark_dirty(self):
+        self.dirty = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        """Background task pushing the dirty leaderboard, at most once per interval"""
+        # Created here so the event belongs to the loop running the task
+        self._wakeup = asyncio.Event()
+        if self.dirty:
+            self._wakeup.set()
+        try:
+            while True:
+                await self._wakeup.wait()
+                delay = self.last_published + self.interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Purchases from here on need the next push
+                self._wakeup.clear()
+                self.dirty = False
+                self.last_published = time.monotonic()
+                try:
+                    await self.manager.publish((LEADERBOARD_TOPIC,))
+                except Exception as e:
+                    logger.error(f"Leaderboard push failed: {e}")
+        finally:
+            self._wakeup = None
+
+
+leaderboard_publisher = LeaderboardPublisher(manager, config.WS_LEADERBOARD_PUBLISH_INTERVAL)
+
+
+async def heartbeat(ping_interval: float, idle_timeout: float):
+    """Background task pinging quiet clients and evicting dead ones"""
+    while True:
+        await asyncio.sleep(ping_interval)
+        try:
+            await manager.sweep(ping_interval, idle_timeout)
+        except Exception as e:
+            logger.error(f"WebSocket heartbeat failed: {e}")
+
+
+def negotiate_subprotocol(websocket: WebSocket, binary_enabled: bool = True) -> Optional[str]:
+    """Pick the binary subprotocol if the client offers it, otherwise plain JSON"""
+    if binary_enabled and BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return BINARY_SUBPROTOCOL
+    return None
+
+
+async def receive_message(websocket: WebSocket) -> Dict:
+    """Receive one client message, a JSON text frame or a binary frame"""
+    frame = await websocket.receive()
+    if frame["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(frame.get("code", 1000))
+    if frame.get("bytes") is not None:
+        return decode_message(frame["bytes"])
+    return json.loads(frame["text"])
+
+
 # Helper function to get user_id from token
 async def get_user_id_from_token(token: str) -> int:
     """Validate token and extract user_id"""
@@ -15,5 +15,66 @@ class Config(BaseSettings):
     # JWT token secret key - default is only for testing
     PASSWORD_TOKEN: str = Field("testing_secret_key_not_for_production", description="Secret key for JWT token encoding")
 
+    # HTTP caching of polled endpoints
+    CATALOG_CACHE_MAX_AGE: int = Field(30, description="Seconds shared caches may reuse item catalog responses")
+    LEADERBOARD_CACHE_TTL: int = Field(2, description="Seconds a computed leaderboard is reused before querying the database again")
+    LEADERBOARD_STREAM_INTERVAL: float = Field(2.0, description="Seconds between leaderboard checks of the Server-Sent Events stream")
+    LEADERBOARD_STREAM_KEEPALIVE: float = Field(15.0, description="Seconds of silence after which a keepalive comment is sent to stream subscribers")
+
+    # Response compression
+    COMPRESSION_MINIMUM_SIZE: int = Field(1024, description="Minimum HTTP response size in bytes before it is compressed")
+    COMPRESSION_GZIP_LEVEL: int = Field(6, description="gzip compression level (1-9)")
+    COMPRESSION_BROTLI: bool = Field(True, description="Prefer brotli when the client accepts it and the brotli package is installed")
+    COMPRESSION_BROTLI_QUALITY: int = Field(4, description="brotli quality (0-11)")
+    WS_PER_MESSAGE_DEFLATE: bool = Field(True, description="Negotiate permessage-deflate on WebSocket connections")
+    WS_PING_INTERVAL: float = Field(20.0, description="Seconds of silence on a WebSocket after which the server pings the client (0 disables the heartbeat)")
+    WS_IDLE_TIMEOUT: float = Field(0.0, description="Seconds without any message from a client, pongs included, after which its WebSocket is closed (0 disables; only for clients that answer pings)")
+    WS_PING_TIMEOUT: float = Field(20.0, description="Seconds to wait for the answer to a WebSocket protocol ping frame before closing the connection")
+    WS_BINARY_PROTOCOL: bool = Field(True, description="Accept the compact binary WebSocket subprotocol when a client offers it")
+    WS_LEADERBOARD_PUBLISH_INTERVAL: float = Field(1.0, description="Shortest time in seconds between leaderboard pushes triggered by purchases; purchases in between are coalesced into one push")
+    WS_LEADERBOARD_BY_DEFAULT: bool = Field(True, description="Subscribe new WebSocket connections to the top 10 leaderboard topic, as clients written before topic subscriptions expect")
+
+    # SQL profiling (debug)
+    SQL_PROFILE: bool = Field(False, description="Record SQL statements of every request and WebSocket message, not only those sending X-SQL-Profile")
+    SQL_PROFILE_ALLOW_HEADER: bool = Field(False, description="Honour the X-SQL-Profile header; leave off where untrusted clients can reach the API")
+    SQL_PROFILE_REPEAT_THRESHOLD: int = Field(2, description="Executions of the same statement within one request that are flagged as a possible N+1")
+
+    # Slow query log
+    SLOW_QUERY_THRESHOLD_MS: float = Field(100.0, description="Log SQL statements slower than this many milliseconds (0 disables)")
+    SLOW_QUERY_EXPLAIN: bool = Field(True, description="Attach the SQLite EXPLAIN QUERY PLAN output to slow query log entries")
+
+    # Optimistic concurrency
+    OPTIMISTIC_LOCK_ATTEMPTS: int = Field(3, description="Attempts of a game state update before giving up when the same user keeps changing concurrently")
+
+    # Batch endpoint
+    BATCH_MAX_COMMANDS: int = Field(50, description="Maximum commands accepted in one POST /game/batch request")
+
+    # Per-user actors
+    USER_ACTORS: bool = Field(False, description="Run each user's clicks and purchases one at a time in a per-user actor, coalescing queued clicks into one transaction")
+    USER_ACTOR_IDLE_SECONDS: float = Field(30.0, description="Seconds without commands after which a user's actor is retired")
+    USER_ACTOR_MAX_BATCH: int = Field(100, description="Maximum queued commands an actor takes in one batch")
+
+    # Background tasks
+    PASSIVE_CHECKPOINT_INTERVAL: float = Field(10.0, description="Seconds between crediting passive income of all users in the background (0 disables)")
+    EVENT_LOOP_LAG_INTERVAL: float = Field(0.5, description="Seconds between event loop lag measurements (0 disables)")
+
+    # Click journal
+    GAME_JOURNAL_PATH: str = Field("", description="Append-only click journal file; clicks skip per-event SQLite transactions when set (empty disables)")
+    GAME_JOURNAL_FLUSH_INTERVAL_MS: float = Field(10.0, description="Group commit window of the click journal; a crash loses at most this much")
+    GAME_JOURNAL_SNAPSHOT_INTERVAL: float = Field(5.0, description="Seconds between folding journaled clicks into SQLite and compacting the journal")
+
+    # Rate limiting
+    CLICK_RATE_LIMIT: float = Field(20.0, description="Sustained clicks per second allowed per user (0 disables the limit)")
+    CLICK_BURST: float = Field(40.0, description="Clicks a user may send in a burst above the sustained rate")
+    AUTH_RATE_LIMIT_PER_IP: int = Field(20, description="Login or registration attempts allowed per client address per window (0 disables)")
+    AUTH_RATE_LIMIT_PER_NICKNAME: int = Field(10, description="Login or registration attempts allowed per nickname per window (0 disables)")
+    AUTH_RATE_LIMIT_WINDOW: float = Field(60.0, description="Length of the login/registration rate limit window in seconds")
+    RATE_LIMIT_MAX_ENTRIES: int = Field(100_000, description="Most rate limiter buckets kept in memory before the least recently used are evicted (an evicted key gets a fresh burst)")
+    RATE_LIMIT_IDLE_SECONDS: float = Field(300.0, description="Seconds after which an idle rate limiter bucket is evicted")
+
+    # Sampling profiler
+    PROFILER_OUTPUT_DIR: str = Field("profiles", description="Directory for collapsed stack files written by the sampling profiler")
+    PROFILER_MAX_DURATION: float = Field(600.0, description="Longest allowed sampling profiler run in seconds")
+
 
 config = Config()
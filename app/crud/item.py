@@ -6,9 +6,29 @@ import math
 from app.crud.base import CRUDBase
 from app.models.item import Item, UserItem
 from app.schemas.item import ItemCreate, ItemUpdate
+from app.utils.cache import VersionCounter
+from app.utils.bignum import scaled_cost
+
+# Bumped on every catalog write; GET /items ETags are derived from it
+catalog_version = VersionCounter("items")
 
 
 class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
+    def create(self, db: Session, obj_in: ItemCreate) -> Item:
+        db_obj = super().create(db, obj_in)
+        catalog_version.bump()
+        return db_obj
+
+    def update(self, db: Session, *, db_obj: Item, obj_in: ItemUpdate) -> Item:
+        db_obj = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        catalog_version.bump()
+        return db_obj
+
+    def delete(self, db: Session, *, id: int) -> Item:
+        obj = super().delete(db, id=id)
+        catalog_version.bump()
+        return obj
+
     def get_by_name(self, db: Session, name: str) -> Optional[Item]:
         """Get item by name"""
         return db.query(self.model).filter(self.model.name == name).first()
@@ -28,8 +48,8 @@ class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
         """Get all items owned by user"""
         return db.query(UserItem).filter(UserItem.user_id == user_id).all()
     
-    def add_user_item(self, db: Session, user_id: int, item_id: int, quantity: int = 1) -> UserItem:
-        """Add item to user's inventory or increase quantity"""
+    def add_user_item(self, db: Session, user_id: int, item_id: int, quantity: int = 1, commit: bool = True) -> UserItem:
+        """Add item to user's inventory or increase quantity; with commit=False it is only flushed"""
         user_item = self.get_user_item(db, user_id, item_id)
         
         if user_item:
@@ -38,15 +58,16 @@ class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
             user_item = UserItem(user_id=user_id, item_id=item_id, quantity=quantity)
             db.add(user_item)
         
+        if not commit:
+            db.flush()
+            return user_item
+        
         db.commit()
         db.refresh(user_item)
         return user_item
     
     def calculate_item_cost(self, base_cost: int, quantity: int, multiplier: float = 1.15) -> int:
         """Calculate cost of next item purchase based on current quantity"""
-        # Calculate the raw value for debugging
-        raw_cost = base_cost * (multiplier ** quantity)
-        
         # For specific test cases, return the expected values
         if base_cost == 10 and multiplier == 1.15:
             if quantity == 0:
@@ -61,8 +82,8 @@ class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
                 # 10 * 1.15¹⁰ = 10 * 4.0456 = 40.456 -> 41
                 return 41
         
-        # For other cases, calculate using a general approach
-        return int(raw_cost) + (1 if raw_cost - int(raw_cost) >= 0.5 else 0)
+        # For other cases, calculate using a general approach that saturates instead of overflowing
+        return scaled_cost(base_cost, multiplier, quantity)
 
 
 item = CRUDItem(Item)
\ No newline at end of file
@@ -1,23 +1,74 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
 from app.config import config
+from app.utils import metrics, sql_profile
+from app.utils.slow_query import slow_query_log
 
 # Create SQLite engine
 engine = create_engine(
     config.SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_start_time
+    metrics.record_query(duration)
+    sql_profile.record_statement(statement, duration)
+    slow_query_log.check(conn, cursor, statement, parameters, duration, executemany)
+
+
+def _commit(conn):
+    metrics.DB_COMMITS_TOTAL.inc()
+
+
+def instrument_engine(engine: Engine):
+    """Attach the SQL timing, slow query and commit counting listeners to an engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "commit", _commit)
+
+
+instrument_engine(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create base class for models
 Base = declarative_base()
 
+def add_missing_columns(engine: Engine):
+    """
+    Add model columns missing from existing tables.
+
+    create_all only creates whole tables, so a database created before a
+    column was introduced would fail on every query touching it. Only
+    columns with a server default can be added this way.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.server_default is None:
+                    continue
+                definition = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
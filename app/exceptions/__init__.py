@@ -1,11 +1,20 @@
-from ..schemas.utils import PyObjectId
+from typing import Any
 
 
 class DocumentNotFound(Exception):
-    def __init__(self, id: PyObjectId):
+    def __init__(self, id: Any):
         self.id = id
 
 
+class ConcurrentUpdateError(Exception):
+    """A row kept changing under an optimistic update after all retries"""
+    def __init__(self, operation: str, attempts: int):
+        self.operation = operation
+        self.attempts = attempts
+        super().__init__(f"{operation} conflicted with concurrent updates {attempts} times")
+
+
 __all__ = [
-    "DocumentNotFound"
+    "DocumentNotFound",
+    "ConcurrentUpdateError",
 ]
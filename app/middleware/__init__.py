@@ -0,0 +1,5 @@
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware
+from .sql_profile import SQLProfileMiddleware
+
+__all__ = ["CompressionMiddleware", "MetricsMiddleware", "SQLProfileMiddleware"]
@@ -0,0 +1,55 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import metrics
+from app.utils.context import current_operation
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, in-flight count and SQL usage of HTTP requests.
+
+    Requests are labelled by route template (e.g. /game/buy/{item_id}) so
+    path parameters don't create one series per value.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = metrics.QueryStats()
+        token = metrics.current_query_stats.set(stats)
+        operation_token = current_operation.set(scope)
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            metrics.current_query_stats.reset(token)
+            current_operation.reset(operation_token)
+
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            metrics.REQUEST_LATENCY.labels(method, route_path).observe(elapsed)
+            metrics.REQUESTS_TOTAL.labels(method, route_path, status_code).inc()
+            metrics.SQL_STATEMENTS_PER_REQUEST.labels(route_path).observe(stats.statements)
+            metrics.SQL_DURATION_PER_REQUEST.labels(route_path).observe(stats.duration)
+
+
+__all__ = ["MetricsMiddleware"]
@@ -0,0 +1,36 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.sql_profile import PROFILE_HEADER, profile_sql, profiling_requested
+
+
+class SQLProfileMiddleware:
+    """
+    Record every SQL statement of a request when profiling is switched on,
+    either for all requests (always_on) or per request with the X-SQL-Profile
+    header when SQL_PROFILE_ALLOW_HEADER permits it. The summary is returned in the X-SQL-Profile response header and
+    the full statement list is logged, flagging repeated statements.
+    """
+
+    def __init__(self, app: ASGIApp, always_on: bool = False, repeat_threshold: int = 2) -> None:
+        self.app = app
+        self.always_on = always_on
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not (self.always_on or profiling_requested(Headers(scope=scope))):
+            await self.app(scope, receive, send)
+            return
+
+        label = f"{scope['method']} {scope['path']}"
+        with profile_sql(label, repeat_threshold=self.repeat_threshold) as profile:
+
+            async def send_with_profile(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)[PROFILE_HEADER] = profile.summary()
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile)
+
+
+__all__ = ["SQLProfileMiddleware"]
@@ -1,2 +1,3 @@
 from .user import User
 from .item import Item, UserItem
+from .journal import JournalSnapshot
@@ -24,10 +24,13 @@ class UserItem(Base):
     __tablename__ = "user_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    item_id = Column(Integer, ForeignKey("items.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), index=True)
     quantity = Column(Integer, default=0)
+    version = Column(Integer, nullable=False, server_default="0")  # Row version for optimistic concurrency
     
     # Relationships
     user = relationship("User", back_populates="user_items")
-    item = relationship("Item", back_populates="user_items")
\ No newline at end of file
+    item = relationship("Item", back_populates="user_items")
+
+    __mapper_args__ = {"version_id_col": version}
\ No newline at end of file
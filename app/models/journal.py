@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger
+
+from app.database import Base
+
+
+class JournalSnapshot(Base):
+    __tablename__ = "journal_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    seq = Column(BigInteger, default=0)  # Last journal event folded into the users table
+    created_at = Column(Integer, default=0)  # Timestamp of the snapshot
+
+    __table_args__ = (
+        {"extend_existing": True},
+    )
@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Float
+from sqlalchemy.types import TypeDecorator
+
+from app.utils.bignum import compact, saturate
+
+
+class BigPoints(TypeDecorator):
+    """
+    Amount of points stored as INTEGER while it fits int64 and as REAL
+    beyond it; both sort and add correctly in SQLite.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compact(value)
+
+
+class Rate(TypeDecorator):
+    """Points per click or second; saturates instead of overflowing to inf"""
+    impl = Float
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return saturate(float(value))
@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, Float, ForeignKey, BigInteger
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import BigPoints, Rate
 
 
 class User(Base):
@@ -12,12 +13,15 @@ class User(Base):
     password = Column(String)
     
     # Game-related fields
-    points = Column(BigInteger, default=0)  # Current points
-    lifetime_points = Column(BigInteger, default=0)  # Total points ever earned
+    points = Column(BigPoints, default=0)  # Current points
+    lifetime_points = Column(BigPoints, default=0)  # Total points ever earned
     clicks = Column(Integer, default=0)  # Number of clicks
-    points_per_click = Column(Float, default=1.0)  # Points earned per click
-    points_per_second = Column(Float, default=0.0)  # Points earned passively per second
+    points_per_click = Column(Rate, default=1.0)  # Points earned per click
+    points_per_second = Column(Rate, default=0.0)  # Points earned passively per second
     last_updated = Column(Integer, default=0)  # Timestamp for calculating passive points
+    passive_carry = Column(Float, nullable=False, default=0.0, server_default="0")  # Passive income below a whole point, not yet credited
+    journal_seq = Column(BigInteger, nullable=False, default=0, server_default="0")  # Last journal event folded for this user alone
+    version = Column(Integer, nullable=False, server_default="0")  # Row version for optimistic concurrency
     
     # Relationships
     user_items = relationship("UserItem", back_populates="user", cascade="all, delete-orphan")
@@ -25,3 +29,5 @@ class User(Base):
     __table_args__ = (
         {"extend_existing": True},
     )
+    # Updates through the ORM check and bump the version, a concurrent change raises StaleDataError
+    __mapper_args__ = {"version_id_col": version}
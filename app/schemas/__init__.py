@@ -10,8 +10,10 @@ from app.schemas.item import (
 )
 from app.schemas.game import (
     GameState, GameStateUpdate, LeaderboardEntry,
-    GameStateWithItems, ClickResult, PurchaseResult
+    GameStateWithItems, ClickResult, PurchaseResult,
+    BatchCommand, BatchRequest, BatchResponse
 )
+from app.schemas.profiler import ProfilerStart, ProfilerStatus
 
 __all__ = [
     'Token', 'TokenData',
@@ -19,5 +21,6 @@ __all__ = [
     'ItemBase', 'ItemCreate', 'ItemUpdate', 'Item',
     'UserItemBase', 'UserItemCreate', 'UserItem', 'UserItemSimple', 'CalculatedItem',
     'GameState', 'GameStateUpdate', 'LeaderboardEntry', 'GameStateWithItems',
-    'ClickResult', 'PurchaseResult'
+    'ClickResult', 'PurchaseResult', 'BatchCommand', 'BatchRequest', 'BatchResponse',
+    'ProfilerStart', 'ProfilerStatus'
 ]
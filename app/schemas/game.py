@@ -1,14 +1,16 @@
-from typing import Optional, List
+from typing import Annotated, Literal, Optional, List, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 from app.schemas.item import UserItem, CalculatedItem
+from app.schemas.utils import Points
+from app.config import config
 
 
 class GameState(BaseModel):
     """Current game state for a user"""
-    points: int = Field(..., description="Current points")
-    lifetime_points: int = Field(..., description="Total points earned")
+    points: Points = Field(..., description="Current points")
+    lifetime_points: Points = Field(..., description="Total points earned")
     clicks: int = Field(..., description="Number of clicks")
     points_per_click: float = Field(..., description="Points earned per click")
     points_per_second: float = Field(..., description="Points earned passively per second")
@@ -19,8 +21,8 @@ class GameState(BaseModel):
 
 class GameStateUpdate(BaseModel):
     """Update to game state"""
-    points: Optional[int] = Field(None, description="Current points")
-    lifetime_points: Optional[int] = Field(None, description="Total points earned")
+    points: Optional[Points] = Field(None, description="Current points")
+    lifetime_points: Optional[Points] = Field(None, description="Total points earned")
     clicks: Optional[int] = Field(None, description="Number of clicks")
     
 
@@ -28,7 +30,7 @@ class LeaderboardEntry(BaseModel):
     """Schema for leaderboard entries"""
     id: int = Field(..., description="User ID")
     nickname: str = Field(..., description="User's nickname")
-    lifetime_points: int = Field(..., description="Total points earned")
+    lifetime_points: Points = Field(..., description="Total points earned")
     rank: int = Field(..., description="Rank on the leaderboard")
 
 
@@ -40,8 +42,8 @@ class GameStateWithItems(GameState):
 class ClickResult(BaseModel):
     """Result of a click action"""
     points_earned: float = Field(..., description="Points earned from this click")
-    new_total: int = Field(..., description="New total points")
-    lifetime_points: int = Field(..., description="Updated lifetime points")
+    new_total: Points = Field(..., description="New total points")
+    lifetime_points: Points = Field(..., description="Updated lifetime points")
     clicks: int = Field(..., description="Updated click count")
 
 
@@ -49,11 +51,66 @@ class PurchaseResult(BaseModel):
     """Result of an item purchase"""
     success: bool = Field(..., description="Whether the purchase was successful")
     message: str = Field(..., description="Message about the purchase")
-    new_points: Optional[int] = Field(None, description="New points balance after purchase")
+    new_points: Optional[Points] = Field(None, description="New points balance after purchase")
     new_points_per_click: Optional[float] = Field(None, description="New points per click after purchase")
     new_points_per_second: Optional[float] = Field(None, description="New points per second after purchase")
     item_quantity: Optional[int] = Field(None, description="New quantity of the purchased item")
-    item_cost: Optional[int] = Field(None, description="New cost of the item for next purchase")
+    item_cost: Optional[Points] = Field(None, description="New cost of the item for next purchase")
+
+
+class BatchCommand(BaseModel):
+    """One command of a batch, named like the WebSocket message types"""
+    type: Literal["click", "buy_item", "get_state", "get_items", "get_leaderboard"] = Field(..., description="Command type")
+    count: int = Field(1, ge=1, le=1000, description="Number of clicks (click)")
+    item_id: Optional[int] = Field(None, description="ID of the item to buy (buy_item)")
+    limit: int = Field(10, ge=1, le=100, description="Number of leaderboard entries (get_leaderboard)")
+
+    @model_validator(mode="after")
+    def check_item_id(self):
+        if self.type == "buy_item" and self.item_id is None:
+            raise ValueError("buy_item requires item_id")
+        return self
+
+
+class BatchRequest(BaseModel):
+    """Commands executed in order in one transaction"""
+    commands: List[BatchCommand] = Field(..., min_length=1, max_length=config.BATCH_MAX_COMMANDS, description="Commands to execute in order")
+
+
+class BatchClickResult(BaseModel):
+    type: Literal["click_result"]
+    data: ClickResult
+
+
+class BatchPurchaseResult(BaseModel):
+    type: Literal["purchase_result"]
+    data: PurchaseResult
+
+
+class BatchStateResult(BaseModel):
+    type: Literal["game_state"]
+    data: GameState
+
+
+class BatchItemsResult(BaseModel):
+    type: Literal["items_list"]
+    data: List[CalculatedItem]
+
+
+class BatchLeaderboardResult(BaseModel):
+    type: Literal["leaderboard"]
+    data: List[LeaderboardEntry]
+
+
+BatchResult = Annotated[
+    Union[BatchClickResult, BatchPurchaseResult, BatchStateResult, BatchItemsResult, BatchLeaderboardResult],
+    Field(discriminator="type"),
+]
+
+
+class BatchResponse(BaseModel):
+    """Results of a batch, one per command in the same order"""
+    results: List[BatchResult] = Field(..., description="Result of each command")
 
 
 __all__ = [
@@ -62,5 +119,9 @@ __all__ = [
     "LeaderboardEntry",
     "GameStateWithItems",
     "ClickResult",
-    "PurchaseResult"
+    "PurchaseResult",
+    "BatchCommand",
+    "BatchRequest",
+    "BatchResult",
+    "BatchResponse"
 ]
\ No newline at end of file
@@ -1,6 +1,8 @@
 from typing import Optional, List
 from pydantic import BaseModel, Field
 
+from app.schemas.utils import Points
+
 
 class ItemBase(BaseModel):
     name: str = Field(..., description="Item name")
@@ -71,7 +73,7 @@ class CalculatedItem(BaseModel):
     name: str = Field(..., description="Item name")
     description: str = Field(..., description="Item description")
     base_cost: int = Field(..., description="Base cost of the item")
-    current_cost: int = Field(..., description="Current cost based on owned quantity")
+    current_cost: Points = Field(..., description="Current cost based on owned quantity")
     points_per_click: float = Field(..., description="Additional points per click from this item")
     points_per_second: float = Field(..., description="Additional points per second from this item")
     cost_multiplier: float = Field(..., description="Cost multiplier for each purchase")
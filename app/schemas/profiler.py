@@ -0,0 +1,28 @@
+from typing import Optional, Dict
+
+from pydantic import BaseModel, Field
+
+
+class ProfilerStart(BaseModel):
+    """Parameters for a sampling profiler run"""
+    duration: float = Field(30.0, gt=0, le=3600, description="Seconds to sample before stopping automatically, at most PROFILER_MAX_DURATION")
+    sample_rate: float = Field(1.0, gt=0, le=1, description="Fraction of sampling ticks that are recorded")
+    interval_ms: float = Field(10.0, ge=1, le=1000, description="Milliseconds between stack samples")
+
+
+class ProfilerStatus(BaseModel):
+    """State of the sampling profiler"""
+    running: bool = Field(..., description="Whether the profiler is currently sampling")
+    started_at: Optional[float] = Field(None, description="Unix timestamp of the last start")
+    remaining_seconds: float = Field(..., description="Seconds until the current run stops")
+    sample_rate: float = Field(..., description="Fraction of sampling ticks that are recorded")
+    interval_ms: float = Field(..., description="Milliseconds between stack samples")
+    samples: int = Field(..., description="Stacks recorded so far")
+    by_label: Dict[str, int] = Field({}, description="Samples per route or WebSocket message type")
+    output: Optional[str] = Field(None, description="Path of the last collapsed stacks file")
+
+
+__all__ = [
+    "ProfilerStart",
+    "ProfilerStatus"
+]
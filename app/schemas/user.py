@@ -2,6 +2,8 @@ from typing import Optional, List
 
 from pydantic import BaseModel, Field
 
+from app.schemas.utils import Points
+
 
 class UserBase(BaseModel):
     nickname: str = Field(..., description="The user's nickname")
@@ -24,8 +26,8 @@ class UserUpdate(BaseModel):
 class UserInDB(UserBase):
     id: int
     password: str  # No length constraints for the hashed password
-    points: int = Field(0, description="Current points")
-    lifetime_points: int = Field(0, description="Total points earned")
+    points: Points = Field(0, description="Current points")
+    lifetime_points: Points = Field(0, description="Total points earned")
     clicks: int = Field(0, description="Number of clicks")
     points_per_click: float = Field(1.0, description="Points earned per click")
     points_per_second: float = Field(0.0, description="Points earned passively per second")
@@ -43,8 +45,8 @@ class UserResponse(UserBase):
 
 class UserGameResponse(UserResponse):
     """User response with game data"""
-    points: int
-    lifetime_points: int
+    points: Points
+    lifetime_points: Points
     clicks: int
     points_per_click: float
     points_per_second: float
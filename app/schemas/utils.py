@@ -1,5 +1,15 @@
-from typing import Any
+from typing import Annotated, Union
 
-# SQLite-specific utility functions can be added here if needed
+from pydantic import AfterValidator, PlainSerializer
 
-__all__ = []
+from app.utils.bignum import compact, to_wire
+
+# Amount of points: exact integer up to int64, double beyond it. Serialized as a
+# JSON integer while JavaScript holds it exactly, in exponent notation beyond.
+Points = Annotated[
+    Union[int, float],
+    AfterValidator(compact),
+    PlainSerializer(to_wire, return_type=Union[int, float]),
+]
+
+__all__ = ["Points"]
@@ -0,0 +1,117 @@
+import math
+import sys
+from typing import Union
+
+# Points are exact integers while they fit a SQLite INTEGER and IEEE doubles
+# beyond it. SQLite compares INTEGER and REAL values numerically and turns
+# integer arithmetic that overflows into REAL, so ORDER BY and set-based
+# UPDATEs keep working on a column holding both.
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+# Largest integer a JSON (JavaScript) number represents exactly
+JSON_SAFE_INTEGER = 2 ** 53
+# Values saturate here instead of becoming inf, which JSON cannot carry
+POINTS_MAX = sys.float_info.max
+
+Number = Union[int, float]
+
+
+def saturate(value: float) -> float:
+    """Clamp inf to +-POINTS_MAX; NaN is rejected"""
+    if math.isnan(value):
+        raise ValueError("NaN is not a valid amount of points")
+    if math.isinf(value):
+        return math.copysign(POINTS_MAX, value)
+    return value
+
+
+def compact(value: Number) -> Number:
+    """
+    Canonical stored form of an amount of points: an int within int64,
+    otherwise a double (saturated at POINTS_MAX).
+    """
+    if type(value) is int:
+        if INT64_MIN <= value <= INT64_MAX:
+            return value
+        try:
+            return float(value)
+        except OverflowError:
+            return math.copysign(POINTS_MAX, value)
+    value = saturate(float(value))
+    if value.is_integer() and INT64_MIN <= value <= INT64_MAX:
+        return int(value)
+    return value
+
+
+def whole_points(value: float) -> Number:
+    """Truncate earned points to a whole amount; huge amounts stay (saturated) doubles"""
+    value = saturate(value)
+    if abs(value) < JSON_SAFE_INTEGER:
+        return int(value)
+    return compact(value)
+
+
+def to_wire(value: Number) -> Number:
+    """
+    JSON form of an amount of points: an integer when a JavaScript number
+    holds it exactly, otherwise a double (serialized in exponent notation).
+    """
+    if type(value) is int and -JSON_SAFE_INTEGER <= value <= JSON_SAFE_INTEGER:
+        return value
+    value = compact(value)
+    if abs(value) <= JSON_SAFE_INTEGER and float(value).is_integer():
+        return int(value)
+    return float(value)
+
+
+def wire_json(value):
+    """
+    Copy of a JSON-like structure (dicts, lists, tuples) that is safe to
+    serialize for JavaScript clients: integers beyond JSON_SAFE_INTEGER are
+    sent in their to_wire form and infinities are saturated.
+    """
+    if type(value) is int:
+        if -JSON_SAFE_INTEGER <= value <= JSON_SAFE_INTEGER:
+            return value
+        return to_wire(value)
+    if type(value) is float:
+        return saturate(value) if math.isinf(value) else value
+    if isinstance(value, dict):
+        return {key: wire_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [wire_json(item) for item in value]
+    return value
+
+
+def scaled_cost(base_cost: Number, multiplier: float, quantity: int) -> Number:
+    """
+    base_cost * multiplier ** quantity, rounded half up.
+
+    Once the power overflows a double the cost saturates at POINTS_MAX, which
+    no amount of points can pay.
+    """
+    try:
+        raw_cost = base_cost * (multiplier ** quantity)
+    except OverflowError:
+        return POINTS_MAX
+    if math.isinf(raw_cost):
+        return POINTS_MAX
+    if raw_cost > JSON_SAFE_INTEGER:
+        # Doubles this large are integers already
+        return compact(raw_cost)
+    return int(raw_cost) + (1 if raw_cost - int(raw_cost) >= 0.5 else 0)
+
+
+__all__ = [
+    "INT64_MIN",
+    "INT64_MAX",
+    "JSON_SAFE_INTEGER",
+    "POINTS_MAX",
+    "Number",
+    "saturate",
+    "compact",
+    "whole_points",
+    "to_wire",
+    "wire_json",
+    "scaled_cost",
+]
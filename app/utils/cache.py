@@ -0,0 +1,121 @@
+import time
+import uuid
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional
+
+from fastapi import Response, status
+
+# Changes on every process start so ETags issued before a restart never match
+# a counter that has been reset to zero.
+_EPOCH = uuid.uuid4().hex[:8]
+
+
+class VersionCounter:
+    """In-process version number used to derive strong ETags"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.value = 0
+
+    def bump(self) -> int:
+        """Mark the underlying data as changed"""
+        self.value += 1
+        return self.value
+
+    def etag(self, *parts: Any) -> str:
+        """Build a strong ETag for the current version, optionally scoped by parts"""
+        tokens = [self.prefix, _EPOCH, str(self.value), *(str(part) for part in parts)]
+        return '"' + "-".join(tokens) + '"'
+
+
+class CachedValue(NamedTuple):
+    value: Any
+    etag: str
+
+
+class VersionedCache:
+    """
+    Short-lived cache of computed values keyed by query parameters.
+
+    The version only advances when a recomputed value differs from the cached
+    one, so clients polling an unchanged value keep getting the same ETag.
+    With max_entries the oldest key is evicted to make room for a new one.
+    """
+
+    def __init__(self, prefix: str, ttl: float, max_entries: Optional[int] = None):
+        self.version = VersionCounter(prefix)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, tuple] = {}
+
+    def get(self, key: Hashable) -> Optional[CachedValue]:
+        """Return the cached value for key if it is still fresh"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, etag, expires_at = entry
+        if time.monotonic() >= expires_at:
+            return None
+        return CachedValue(value, etag)
+
+    def put(self, key: Hashable, value: Any) -> CachedValue:
+        """Store a freshly computed value and return it with its ETag"""
+        previous = self._entries.get(key)
+        if previous is None or previous[0] != value:
+            self.version.bump()
+        if previous is None and self.max_entries is not None:
+            while len(self._entries) >= self.max_entries:
+                # Dicts keep insertion order, the first key is the oldest
+                del self._entries[next(iter(self._entries))]
+        etag = self.version.etag(key)
+        self._entries[key] = (value, etag, time.monotonic() + self.ttl)
+        return CachedValue(value, etag)
+
+    def keys(self) -> List[Hashable]:
+        """Keys with a cached value, fresh or expired"""
+        return list(self._entries)
+
+    def clear(self):
+        """Drop all cached values"""
+        self.version.bump()
+        self._entries.clear()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(etag: str, max_age: int) -> Dict[str, str]:
+    """Headers advertising an ETag and letting shared caches keep the response"""
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+
+
+def not_modified(etag: str, max_age: int) -> Response:
+    """Empty 304 response for a matching conditional GET"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=cache_headers(etag, max_age)
+    )
+
+
+__all__ = [
+    "VersionCounter",
+    "CachedValue",
+    "VersionedCache",
+    "etag_matches",
+    "cache_headers",
+    "not_modified",
+]
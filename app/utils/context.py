@@ -0,0 +1,23 @@
+from contextvars import ContextVar
+from typing import Any, Optional
+
+# The HTTP request scope or WebSocket message currently being processed
+current_operation: ContextVar[Optional[Any]] = ContextVar("current_operation", default=None)
+
+
+def describe_operation() -> str:
+    """Human readable name of the current operation, e.g. "POST /game/click" or "WS buy_item" """
+    operation = current_operation.get()
+    if operation is None:
+        return "background"
+    if isinstance(operation, dict):
+        route = operation.get("route")
+        path = getattr(route, "path", operation.get("path", "unmatched"))
+        return f"{operation.get('method', 'WS')} {path}"
+    return str(operation)
+
+
+__all__ = [
+    "current_operation",
+    "describe_operation",
+]
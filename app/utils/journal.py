@@ -0,0 +1,236 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.config import config
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GameJournal:
+    """
+    Append-only journal of click events with group commit.
+
+    Clicks are numbered, buffered in memory and written to the journal file
+    by a background thread every flush_interval seconds with one fsync for
+    the whole batch, so a crash loses at most that window. The points and
+    clicks not yet written to SQLite are kept per user as pending deltas.
+    A snapshot folds them into the users table together with the sequence
+    number it covers; on restart, events after that number are replayed.
+
+    Records are text lines "<seq> c <user_id> <points>". A torn last line
+    left by a crash is skipped on replay.
+    """
+
+    def __init__(self, flush_interval: float = 0.01):
+        self.flush_interval = flush_interval
+        self.path: Optional[str] = None
+        self._file = None
+        self._seq = 0
+        self._buffer: List[str] = []
+        self._pending: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last recorded event"""
+        return self._seq
+
+    def open(self, path: str):
+        """Open (or create) the journal file and start the group commit thread"""
+        if self.enabled:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="ascii")
+        if self._file.tell() and not self._ends_with_newline(path):
+            # Terminate a torn last line so new records start on their own line
+            self._file.write("\n")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="game-journal", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Write out buffered events and close the file. Pending deltas are dropped."""
+        if not self.enabled:
+            return
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._io_lock:
+            self._file.close()
+            self._file = None
+        with self._lock:
+            self._pending.clear()
+            self._seq = 0
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, "rb") as journal_file:
+            journal_file.seek(-1, os.SEEK_END)
+            return journal_file.read(1) == b"\n"
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Writing the game journal failed: {e}")
+
+    def record_click(self, user_id: int, points: int):
+        """Journal one click and add it to the user's pending deltas"""
+        with self._lock:
+            self._seq += 1
+            self._buffer.append(f"{self._seq} c {user_id} {points}\n")
+            self._add_pending(user_id, points, 1)
+        metrics.JOURNAL_EVENTS_TOTAL.inc()
+
+    def _add_pending(self, user_id: int, points: int, clicks: int):
+        delta = self._pending.get(user_id)
+        if delta is None:
+            self._pending[user_id] = [points, clicks]
+        else:
+            delta[0] += points
+            delta[1] += clicks
+
+    def pending_for(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """Points and clicks of a user that are journaled but not yet in SQLite"""
+        with self._lock:
+            delta = self._pending.get(user_id)
+            return tuple(delta) if delta else None
+
+    def flush(self):
+        """Group commit: write all buffered events with a single fsync"""
+        with self._io_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch or self._file is None:
+                return
+            self._file.write("".join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        metrics.JOURNAL_FLUSHES_TOTAL.inc()
+
+    @contextmanager
+    def snapshotting(self):
+        """
+        Take all pending deltas for a snapshot.
+
+        Yields the deltas and the last sequence number they cover. Snapshots
+        are serialized so the recorded sequence number only moves forward. If
+        the block raises, the deltas are merged back.
+        """
+        with self._snapshot_lock:
+            with self._lock:
+                deltas, self._pending = self._pending, {}
+                upto_seq = self._seq
+            try:
+                yield deltas, upto_seq
+            except BaseException:
+                with self._lock:
+                    for user_id, (points, clicks) in deltas.items():
+                        self._add_pending(user_id, points, clicks)
+                raise
+
+    @contextmanager
+    def taking(self, user_id: int):
+        """
+        Take one user's pending delta, to be folded into SQLite by the block.
+
+        Yields the delta, or None if the user has no pending clicks, and the
+        last sequence number it covers. A delta is taken under the snapshot
+        lock, so no snapshot can record a sequence number covering clicks
+        that are still on their way to SQLite. If the block raises, the delta
+        is merged back.
+        """
+        with self._lock:
+            pending = user_id in self._pending
+        if not pending:
+            yield None, self._seq
+            return
+        with self._snapshot_lock:
+            with self._lock:
+                delta = self._pending.pop(user_id, None)
+                upto_seq = self._seq
+            try:
+                yield (tuple(delta) if delta else None), upto_seq
+            except BaseException:
+                if delta:
+                    with self._lock:
+                        self._add_pending(user_id, *delta)
+                raise
+
+    def replay(self, after_seq: int, folded: Optional[Dict[int, int]] = None) -> int:
+        """
+        Rebuild pending deltas from events after after_seq (the last snapshot).
+        folded maps user ids to the last sequence number already folded for
+        that user alone; their older events are skipped too. Returns the
+        number of replayed events.
+        """
+        folded = folded or {}
+        replayed = 0
+        last_seq = after_seq
+        if self.path and os.path.exists(self.path):
+            with open(self.path, "r", encoding="ascii", errors="replace") as journal_file:
+                for line in journal_file:
+                    parts = line.split()
+                    if len(parts) != 4 or parts[1] != "c" or not line.endswith("\n"):
+                        continue
+                    try:
+                        seq, user_id, points = int(parts[0]), int(parts[2]), int(parts[3])
+                    except ValueError:
+                        continue
+                    last_seq = max(last_seq, seq)
+                    if seq <= after_seq or seq <= folded.get(user_id, 0):
+                        continue
+                    with self._lock:
+                        self._add_pending(user_id, points, 1)
+                    replayed += 1
+        with self._lock:
+            self._seq = max(self._seq, last_seq)
+        return replayed
+
+    def compact(self, upto_seq: int):
+        """Drop events already covered by a snapshot from the journal file"""
+        with self._io_lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            kept = []
+            with open(self.path, "r", encoding="ascii", errors="replace") as journal_file:
+                for line in journal_file:
+                    parts = line.split(" ", 1)
+                    if line.endswith("\n") and parts[0].isdigit() and int(parts[0]) > upto_seq:
+                        kept.append(line)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="ascii") as tmp_file:
+                tmp_file.write("".join(kept))
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="ascii")
+
+
+game_journal = GameJournal(flush_interval=config.GAME_JOURNAL_FLUSH_INTERVAL_MS / 1000)
+
+
+__all__ = [
+    "GameJournal",
+    "game_journal",
+]
@@ -0,0 +1,322 @@
+import abc
+import math
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond DB calls to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, labelvalues):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Value holder for one combination of label values"""
+
+    def labels(self, *labelvalues, **labelkwargs):
+        """Return the child metric for the given label values"""
+        if labelkwargs:
+            labelvalues = tuple(str(labelkwargs[name]) for name in self.labelnames)
+        else:
+            labelvalues = tuple(str(value) for value in labelvalues)
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        """(name suffix, label names, label values, value) of every exposed sample"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labelnames, labelvalues, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        return [("", self.labelnames, key, child.value) for key, child in list(self._children.items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type = "gauge"
+
+    def dec(self, amount: float = 1):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "bucket_counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Sequence[float]):
+        self.upper_bounds = upper_bounds
+        self.bucket_counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            for i, bound in enumerate(self.upper_bounds):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self):
+        samples = []
+        bucket_labelnames = self.labelnames + ("le",)
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds, child.bucket_counts):
+                cumulative += count
+                samples.append(("_bucket", bucket_labelnames, key + (_format_value(bound),), cumulative))
+            samples.append(("_count", self.labelnames, key, cumulative))
+            samples.append(("_sum", self.labelnames, key, child.sum))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+REQUEST_LATENCY = registry.register(Histogram(
+    "ubbclicker_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+))
+REQUESTS_TOTAL = registry.register(Counter(
+    "ubbclicker_http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "ubbclicker_http_requests_in_flight", "HTTP requests currently being processed"
+))
+
+# Database
+SQL_STATEMENTS_TOTAL = registry.register(Counter(
+    "ubbclicker_db_statements_total", "SQL statements executed"
+))
+SQL_DURATION_TOTAL = registry.register(Counter(
+    "ubbclicker_db_statement_seconds_total", "Time spent executing SQL statements"
+))
+SQL_STATEMENTS_PER_REQUEST = registry.register(Histogram(
+    "ubbclicker_db_statements_per_request", "SQL statements executed per HTTP request", ("route",), buckets=COUNT_BUCKETS
+))
+SQL_DURATION_PER_REQUEST = registry.register(Histogram(
+    "ubbclicker_db_seconds_per_request", "Time spent in SQL per HTTP request", ("route",)
+))
+DB_COMMITS_TOTAL = registry.register(Counter(
+    "ubbclicker_db_commits_total", "Committed transactions, each one a SQLite journal fsync"
+))
+OPTIMISTIC_CONFLICTS_TOTAL = registry.register(Counter(
+    "ubbclicker_db_optimistic_conflicts_total", "Updates retried because the row version changed concurrently", ("operation",)
+))
+
+# WebSocket
+WS_CONNECTIONS = registry.register(Gauge(
+    "ubbclicker_ws_connections", "Open WebSocket connections"
+))
+WS_MESSAGES_TOTAL = registry.register(Counter(
+    "ubbclicker_ws_messages_total", "WebSocket messages received by type", ("type",)
+))
+WS_BROADCAST_DURATION = registry.register(Histogram(
+    "ubbclicker_ws_broadcast_duration_seconds", "Time to send one broadcast to all connections"
+))
+WS_CONNECTIONS_AWAITING_PONG = registry.register(Gauge(
+    "ubbclicker_ws_connections_awaiting_pong", "Connections pinged by the last heartbeat because they were silent"
+))
+WS_CONNECTIONS_RECLAIMED_TOTAL = registry.register(Counter(
+    "ubbclicker_ws_connections_reclaimed_total", "Connections unregistered by the server, by reason", ("reason",)
+))
+WS_LEADERBOARD_CHANGES_TOTAL = registry.register(Counter(
+    "ubbclicker_ws_leaderboard_changes_total",
+    "Purchases seen by the leaderboard publisher: ignored (cannot change the pushed board), scheduled or coalesced into a pending push",
+    ("outcome",)
+))
+
+# Background tasks
+EVENT_LOOP_LAG = registry.register(Histogram(
+    "ubbclicker_event_loop_lag_seconds", "How late the event loop ran a timer, i.e. how long other work held the loop"
+))
+PASSIVE_CHECKPOINT_DURATION = registry.register(Histogram(
+    "ubbclicker_passive_checkpoint_duration_seconds", "Time to credit passive income of all users"
+))
+PASSIVE_CHECKPOINT_USERS_TOTAL = registry.register(Counter(
+    "ubbclicker_passive_checkpoint_users_total", "Users credited with passive income by the background checkpoint"
+))
+
+JOURNAL_EVENTS_TOTAL = registry.register(Counter(
+    "ubbclicker_journal_events_total", "Click events appended to the game journal"
+))
+JOURNAL_FLUSHES_TOTAL = registry.register(Counter(
+    "ubbclicker_journal_flushes_total", "Group commits (fsyncs) of the game journal"
+))
+JOURNAL_SNAPSHOT_DURATION = registry.register(Histogram(
+    "ubbclicker_journal_snapshot_duration_seconds", "Time to fold journaled clicks into the users table"
+))
+
+USER_ACTORS = registry.register(Gauge(
+    "ubbclicker_user_actors", "Per-user actors currently running"
+))
+USER_ACTOR_BATCH_SIZE = registry.register(Histogram(
+    "ubbclicker_user_actor_batch_size", "Commands processed by a user actor in one batch", buckets=COUNT_BUCKETS
+))
+
+# Server-Sent Events
+SSE_SUBSCRIBERS = registry.register(Gauge(
+    "ubbclicker_sse_subscribers", "Open leaderboard event streams"
+))
+
+# Abuse protection
+RATE_LIMITED_TOTAL = registry.register(Counter(
+    "ubbclicker_rate_limited_total", "Actions rejected by a rate limiter", ("limiter",)
+))
+
+
+class QueryStats:
+    """SQL statements executed on behalf of one request"""
+    __slots__ = ("statements", "duration")
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+
+
+# Set by the metrics middleware for the duration of each HTTP request
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def record_query(duration: float):
+    """Account one executed SQL statement globally and to the current request"""
+    SQL_STATEMENTS_TOTAL.inc()
+    SQL_DURATION_TOTAL.inc(duration)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.duration += duration
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "registry",
+    "QueryStats",
+    "current_query_stats",
+    "record_query",
+    "REQUEST_LATENCY",
+    "REQUESTS_TOTAL",
+    "REQUESTS_IN_FLIGHT",
+    "SQL_STATEMENTS_TOTAL",
+    "SQL_DURATION_TOTAL",
+    "SQL_STATEMENTS_PER_REQUEST",
+    "SQL_DURATION_PER_REQUEST",
+    "DB_COMMITS_TOTAL",
+    "OPTIMISTIC_CONFLICTS_TOTAL",
+    "WS_CONNECTIONS",
+    "WS_MESSAGES_TOTAL",
+    "WS_BROADCAST_DURATION",
+    "WS_CONNECTIONS_AWAITING_PONG",
+    "WS_CONNECTIONS_RECLAIMED_TOTAL",
+    "WS_LEADERBOARD_CHANGES_TOTAL",
+    "EVENT_LOOP_LAG",
+    "PASSIVE_CHECKPOINT_DURATION",
+    "PASSIVE_CHECKPOINT_USERS_TOTAL",
+    "JOURNAL_EVENTS_TOTAL",
+    "JOURNAL_FLUSHES_TOTAL",
+    "JOURNAL_SNAPSHOT_DURATION",
+    "USER_ACTORS",
+    "USER_ACTOR_BATCH_SIZE",
+    "SSE_SUBSCRIBERS",
+    "RATE_LIMITED_TOTAL",
+]
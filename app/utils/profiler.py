@@ -0,0 +1,176 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class SamplingProfiler:
+    """
+    Low-overhead stack sampler that can be switched on at runtime.
+
+    A background thread periodically snapshots the stacks of all threads and
+    keeps only those running a route endpoint or a WebSocket message handler,
+    prefixed with the route (e.g. "POST /game/click") or message type
+    (e.g. "WS click"). Each sampling tick is kept with probability
+    sample_rate, so only that fraction of request time is recorded. Results
+    are written as collapsed stacks that flamegraph.pl or speedscope read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._labels: Dict[object, str] = {}
+        self._message_handlers: Dict[object, str] = {}
+        self.samples: Counter = Counter()
+        self.started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.interval = 0.01
+        self.sample_rate = 1.0
+        self.output_dir = "profiles"
+        self.last_output: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self,
+        routes: Iterable,
+        message_handlers: Dict[Callable, str],
+        duration: float,
+        interval: float = 0.01,
+        sample_rate: float = 1.0,
+        output_dir: str = "profiles",
+    ) -> bool:
+        """
+        Start sampling for duration seconds.
+
+        message_handlers maps a handler function to the name of its argument
+        holding the message dict, whose "type" labels the sample.
+        Returns False if the profiler is already running.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._labels = {}
+            for route in routes:
+                endpoint = getattr(route, "endpoint", None)
+                if endpoint is None or not hasattr(endpoint, "__code__"):
+                    continue
+                methods = sorted(getattr(route, "methods", None) or ["WS"])
+                self._labels[endpoint.__code__] = f"{','.join(methods)} {route.path}"
+            self._message_handlers = {handler.__code__: arg for handler, arg in message_handlers.items()}
+            self.samples = Counter()
+            self.interval = interval
+            self.sample_rate = sample_rate
+            self.output_dir = output_dir
+            self.started_at = time.time()
+            self.deadline = time.monotonic() + duration
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> Optional[str]:
+        """Stop sampling, write the collapsed stacks and return their path"""
+        thread = self._thread
+        if thread is None:
+            return self.last_output
+        self._stop_event.set()
+        thread.join()
+        return self.last_output
+
+    def status(self) -> Dict:
+        remaining = max(0.0, self.deadline - time.monotonic()) if self.running else 0.0
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "remaining_seconds": round(remaining, 1),
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self._snapshot().values()),
+            "by_label": self.samples_by_label(),
+            "output": self.last_output,
+        }
+
+    def samples_by_label(self) -> Dict[str, int]:
+        totals: Counter = Counter()
+        for stack, count in self._snapshot().items():
+            totals[stack[0]] += count
+        return dict(totals.most_common())
+
+    def collapsed(self) -> str:
+        """Samples in collapsed stack format: label;outer;...;inner count"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self._snapshot().most_common()) + "\n"
+
+    def _snapshot(self) -> Counter:
+        """Copy of the samples; the sampling thread keeps adding to them"""
+        with self._lock:
+            return self.samples.copy()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval) and time.monotonic() < self.deadline:
+            if self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+                self._sample(own_id)
+        self._write()
+        self._thread = None
+
+    def _sample(self, own_id: int):
+        stacks: List[Tuple[str, ...]] = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            label = None
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                if label is None:
+                    label = self._label_for(frame)
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if label is not None:
+                stack.append(label)
+                stack.reverse()
+                stacks.append(tuple(stack))
+        if stacks:
+            with self._lock:
+                self.samples.update(stacks)
+
+    def _label_for(self, frame) -> Optional[str]:
+        code = frame.f_code
+        message_arg = self._message_handlers.get(code)
+        if message_arg is not None:
+            message = frame.f_locals.get(message_arg)
+            message_type = message.get("type") if isinstance(message, dict) else None
+            return f"WS {message_type}"
+        return self._labels.get(code)
+
+    def _write(self):
+        if not self.samples:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{int(self.started_at * 1000)}")
+        path = f"{base}.collapsed"
+        suffix = 0
+        # Exclusive create, so runs started in the same millisecond keep their own file
+        while True:
+            try:
+                f = open(path, "x")
+                break
+            except FileExistsError:
+                suffix += 1
+                path = f"{base}-{suffix}.collapsed"
+        with f:
+            f.write(self.collapsed())
+        self.last_output = path
+
+
+profiler = SamplingProfiler()
+
+
+__all__ = ["SamplingProfiler", "profiler"]
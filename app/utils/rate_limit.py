@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Tuple
+
+from app.config import config
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at", "rejected")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.rejected = 0
+
+
+class _Window:
+    __slots__ = ("started_at", "current", "previous", "updated_at", "rejected")
+
+    def __init__(self, now: float):
+        self.started_at = now
+        self.current = 0
+        self.previous = 0
+        self.updated_at = now
+        self.rejected = 0
+
+
+class _Limiter:
+    """
+    Per-key state kept in least-recently-used order. Entries idle for longer
+    than idle_seconds, or the oldest ones beyond max_entries, are evicted so
+    memory stays bounded.
+    """
+
+    def __init__(self, name: str, max_entries: int, idle_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        while self._buckets:
+            oldest_key, oldest = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_entries and now - oldest.updated_at < self.idle_seconds:
+                break
+            del self._buckets[oldest_key]
+
+    def _rejected(self, key: Hashable, rejected: int):
+        metrics.RATE_LIMITED_TOTAL.labels(self.name).inc()
+        if rejected >= 100 and rejected in (100, 1_000, 10_000, 100_000):
+            logger.warning(f"{self.name} rate limit: {key} has been rejected {rejected} times")
+
+    def offenders(self, limit: int = 10) -> List[Tuple[Hashable, int]]:
+        """Keys with the most rejected actions among tracked entries"""
+        with self._lock:
+            counts = [(key, bucket.rejected) for key, bucket in self._buckets.items() if bucket.rejected]
+        return sorted(counts, key=lambda pair: pair[1], reverse=True)[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class TokenBucketLimiter(_Limiter):
+    """
+    In-memory token bucket per key with O(1) checks.
+
+    A bucket evicted for being idle would have refilled completely anyway,
+    as long as idle_seconds is at least burst / rate. Evicting the least
+    recently used buckets beyond max_entries can drop a drained one, though,
+    giving that key a fresh burst: with more than max_entries active keys a
+    client may exceed the rate by up to one burst per eviction. Memory stays
+    bounded in exchange.
+    """
+
+    def __init__(self, rate: float, burst: float, max_entries: int = 100_000, idle_seconds: float = 300.0, name: str = "click"):
+        super().__init__(name, max_entries, idle_seconds)
+        self.rate = rate
+        self.burst = burst
+
+    def allow(self, key: Hashable, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Take cost tokens from key's bucket.
+
+        Returns whether the action is allowed and, if not, the number of
+        seconds until enough tokens are available.
+        """
+        if self.rate <= 0:
+            return True, 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(self.burst, now)
+                self._buckets[key] = bucket
+                self._evict(now)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+                bucket.updated_at = now
+
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return True, 0.0
+            bucket.rejected += 1
+            rejected = bucket.rejected
+            retry_after = (cost - bucket.tokens) / self.rate
+        self._rejected(key, rejected)
+        return False, retry_after
+
+
+class SlidingWindowLimiter(_Limiter):
+    """
+    At most limit actions per key in any window of the given length.
+
+    Uses the sliding window counter approximation: the previous fixed
+    window's count is weighted by how much of it still overlaps the sliding
+    window, so each key needs two counters instead of a timestamp log.
+    """
+
+    def __init__(self, limit: int, window: float, max_entries: int = 100_000, idle_seconds: float = 300.0, name: str = "auth"):
+        # A key idle for two windows has nothing left to remember
+        super().__init__(name, max_entries, max(idle_seconds, 2 * window))
+        self.limit = limit
+        self.window = window
+
+    def allow(self, key: Hashable) -> Tuple[bool, float]:
+        """
+        Count one action for key.
+
+        Returns whether the action is allowed and, if not, the number of
+        seconds until it would be. The check and the charge happen under one
+        lock, so concurrent actions can never all pass a nearly full window.
+        """
+        if self.limit <= 0:
+            return True, 0.0
+        now = time.monotonic()
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is None:
+                entry = _Window(now)
+                self._buckets[key] = entry
+                self._evict(now)
+            else:
+                self._buckets.move_to_end(key)
+                elapsed_windows = int((now - entry.started_at) // self.window)
+                if elapsed_windows == 1:
+                    entry.previous, entry.current = entry.current, 0
+                elif elapsed_windows > 1:
+                    entry.previous, entry.current = 0, 0
+                entry.started_at += elapsed_windows * self.window
+            entry.updated_at = now
+
+            overlap = 1 - (now - entry.started_at) / self.window
+            if entry.previous * overlap + entry.current + 1 <= self.limit:
+                entry.current += 1
+                return True, 0.0
+
+            entry.rejected += 1
+            rejected = entry.rejected
+            window_end = entry.started_at + self.window
+            if entry.current + 1 <= self.limit and entry.previous:
+                # Wait until enough of the previous window has slid out
+                needed_overlap = (self.limit - 1 - entry.current) / entry.previous
+                retry_after = window_end - needed_overlap * self.window - now
+            else:
+                retry_after = window_end - now
+        self._rejected(key, rejected)
+        return False, max(retry_after, 0.0)
+
+    def refund(self, key: Hashable):
+        """Give back an action allowed for key that was rejected by another limit"""
+        if self.limit <= 0:
+            return
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is None:
+                return
+            # The window may have rolled since, moving the charge to previous
+            if entry.current:
+                entry.current -= 1
+            elif entry.previous:
+                entry.previous -= 1
+
+
+click_limiter = TokenBucketLimiter(
+    rate=config.CLICK_RATE_LIMIT,
+    burst=config.CLICK_BURST,
+    max_entries=config.RATE_LIMIT_MAX_ENTRIES,
+    idle_seconds=config.RATE_LIMIT_IDLE_SECONDS,
+)
+
+# Login and registration attempts, keyed by (action, client address)
+auth_ip_limiter = SlidingWindowLimiter(
+    limit=config.AUTH_RATE_LIMIT_PER_IP,
+    window=config.AUTH_RATE_LIMIT_WINDOW,
+    max_entries=config.RATE_LIMIT_MAX_ENTRIES,
+    idle_seconds=config.RATE_LIMIT_IDLE_SECONDS,
+    name="auth_ip",
+)
+
+# Login and registration attempts, keyed by (action, nickname)
+auth_nickname_limiter = SlidingWindowLimiter(
+    limit=config.AUTH_RATE_LIMIT_PER_NICKNAME,
+    window=config.AUTH_RATE_LIMIT_WINDOW,
+    max_entries=config.RATE_LIMIT_MAX_ENTRIES,
+    idle_seconds=config.RATE_LIMIT_IDLE_SECONDS,
+    name="auth_nickname",
+)
+
+
+__all__ = [
+    "TokenBucketLimiter",
+    "SlidingWindowLimiter",
+    "click_limiter",
+    "auth_ip_limiter",
+    "auth_nickname_limiter",
+]
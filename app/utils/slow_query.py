@@ -0,0 +1,81 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from app.config import config
+from app.utils.context import describe_operation
+
+logger = logging.getLogger(__name__)
+
+
+def parameters_shape(parameters: Any, executemany: bool = False) -> str:
+    """Describe bound parameters by type only, so no user data ends up in logs"""
+    if executemany:
+        rows = list(parameters or [])
+        first = parameters_shape(rows[0]) if rows else "()"
+        return f"[{len(rows)} x {first}]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """
+    Log SQL statements slower than a threshold together with the SQLite
+    query plan. EXPLAIN QUERY PLAN runs only the first time a distinct
+    statement is slow; later entries reuse the cached plan.
+    """
+
+    def __init__(self, threshold_ms: float, explain: bool = True, max_plans: int = 256):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_plans = max_plans
+        self._plans: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, conn, cursor, statement: str, parameters: Any, duration: float, executemany: bool):
+        """Log the statement if it took longer than the threshold"""
+        if self.threshold_ms <= 0 or duration * 1000 < self.threshold_ms:
+            return
+        plan = self._plan(conn, cursor, statement, parameters, executemany) if self.explain else None
+        lines = [
+            f"Slow query {duration * 1000:.1f} ms in {describe_operation()}: {' '.join(statement.split())}",
+            f"  parameters: {parameters_shape(parameters, executemany)}",
+        ]
+        if plan:
+            lines.append("  query plan:")
+            lines.extend(f"    {row}" for row in plan)
+        logger.warning("\n".join(lines))
+
+    def _plan(self, conn, cursor, statement: str, parameters: Any, executemany: bool) -> Optional[List[str]]:
+        with self._lock:
+            plan = self._plans.get(statement)
+            if plan is not None:
+                self._plans.move_to_end(statement)
+                return plan
+        if conn.dialect.name != "sqlite" or executemany:
+            return None
+        try:
+            rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        except Exception as e:
+            logger.debug(f"EXPLAIN QUERY PLAN failed: {e}")
+            return None
+        plan = [row[-1] for row in rows]
+        with self._lock:
+            self._plans[statement] = plan
+            if len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+
+slow_query_log = SlowQueryLog(config.SLOW_QUERY_THRESHOLD_MS, explain=config.SLOW_QUERY_EXPLAIN)
+
+
+__all__ = [
+    "SlowQueryLog",
+    "slow_query_log",
+    "parameters_shape",
+]
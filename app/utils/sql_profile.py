@@ -0,0 +1,99 @@
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Header that turns profiling on for a single request or WebSocket connection
+PROFILE_HEADER = "X-SQL-Profile"
+
+
+class SQLProfile:
+    """Every SQL statement executed during one request or WebSocket message"""
+
+    def __init__(self, label: str, repeat_threshold: int = 2):
+        self.label = label
+        self.repeat_threshold = repeat_threshold
+        self.statements: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, duration: float):
+        self.statements.append((statement, duration))
+
+    @property
+    def total_time(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """Statements executed at least repeat_threshold times, most frequent first"""
+        counts = Counter(statement for statement, _ in self.statements)
+        return [(statement, count) for statement, count in counts.most_common() if count >= self.repeat_threshold]
+
+    def summary(self) -> str:
+        """One-line summary suitable for a response header"""
+        return (
+            f"statements={len(self.statements)}; "
+            f"time_ms={self.total_time * 1000:.2f}; "
+            f"repeated={len(self.repeated())}"
+        )
+
+    def log(self):
+        repeated = self.repeated()
+        lines = [f"SQL profile for {self.label}: {self.summary()}"]
+        for i, (statement, duration) in enumerate(self.statements, start=1):
+            lines.append(f"  #{i} {duration * 1000:.3f} ms  {' '.join(statement.split())}")
+        for statement, count in repeated:
+            lines.append(f"  possible N+1: executed {count}x  {' '.join(statement.split())}")
+        # Profiles are only taken on request, and the app configures no logging,
+        # so they are logged at WARNING to reach the default stderr handler
+        logger.warning("\n".join(lines))
+
+
+current_sql_profile: ContextVar[Optional[SQLProfile]] = ContextVar("current_sql_profile", default=None)
+
+
+def record_statement(statement: str, duration: float):
+    """Add an executed statement to the active profile, if any"""
+    profile = current_sql_profile.get()
+    if profile is not None:
+        profile.record(statement, duration)
+
+
+def profiling_requested(headers) -> bool:
+    """
+    Whether the request or WebSocket handshake asked for a SQL profile.
+
+    The header is ignored unless SQL_PROFILE_ALLOW_HEADER is set, so anonymous
+    clients cannot flood the log with profiles.
+    """
+    if not config.SQL_PROFILE_ALLOW_HEADER:
+        return False
+    return headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profile_sql(label: str, enabled: bool = True, repeat_threshold: int = 2) -> Iterator[Optional[SQLProfile]]:
+    """Collect statements executed inside the block and log them when it exits"""
+    if not enabled:
+        yield None
+        return
+    profile = SQLProfile(label, repeat_threshold)
+    token = current_sql_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_sql_profile.reset(token)
+        profile.log()
+
+
+__all__ = [
+    "PROFILE_HEADER",
+    "SQLProfile",
+    "current_sql_profile",
+    "record_statement",
+    "profiling_requested",
+    "profile_sql",
+]
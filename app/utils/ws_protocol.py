@@ -0,0 +1,385 @@
+import math
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Subprotocol name a client offers in Sec-WebSocket-Protocol to get binary frames
+BINARY_SUBPROTOCOL = "ubbclicker.bin.v1"
+
+# Frame layout: one type byte, then the fields of that type in a fixed order,
+# little-endian. Numbers are uint32 ids/counts, uint64 click counts and
+# float64 points and rates (exact for integers up to 2**53, the same range
+# JSON clients keep exactly). Strings are a uint16 byte length and UTF-8
+# bytes, 0xFFFF meaning null. A None rate or points value is sent as NaN.
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_NULL_STRING = 0xFFFF
+
+# Client to server
+CLICK = 0x01
+BUY_ITEM = 0x02
+GET_STATE = 0x03
+GET_ITEMS = 0x04
+PONG = 0x05
+PING_REQUEST = 0x06  # a client checking the server
+SUBSCRIBE = 0x07
+UNSUBSCRIBE = 0x08
+
+# Server to client
+GAME_STATE = 0x81
+CLICK_RESULT = 0x82
+PURCHASE_RESULT = 0x83
+ITEMS_LIST = 0x84
+ITEMS_DELTA = 0x85
+LEADERBOARD_UPDATE = 0x86
+RATE_LIMITED = 0x87
+ERROR = 0x88
+PING = 0x89
+PONG_REPLY = 0x8A  # the server answering a client's ping
+RANK_UPDATE = 0x8B
+STATS_UPDATE = 0x8C
+
+_GAME_STATE = struct.Struct("<BddQdd")  # points, lifetime_points, clicks, points_per_click, points_per_second
+_CLICK_RESULT = struct.Struct("<BdddQ")  # points_earned, new_total, lifetime_points, clicks
+_PURCHASE_RESULT = struct.Struct("<BBdddId")  # success, new_points, new_points_per_click, new_points_per_second, item_quantity, item_cost
+_ITEM = struct.Struct("<IIddddd")  # id, quantity, current_cost, base_cost, points_per_click, points_per_second, cost_multiplier
+_ITEM_DELTA = struct.Struct("<IId")  # id, quantity, current_cost
+_RATES = struct.Struct("<ddd")  # points, points_per_click, points_per_second
+_ENTRY = struct.Struct("<IId")  # id, rank, lifetime_points
+_RATE_LIMITED = struct.Struct("<Bd")  # retry_after
+_BUY_ITEM = struct.Struct("<BI")  # item_id
+_RANK_UPDATE = struct.Struct("<BId")  # rank, lifetime_points
+_STATS_UPDATE = struct.Struct("<BIIdQ")  # players, online, lifetime_points, clicks
+
+
+def _number(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _points(value: float):
+    """Decoded points as the JSON protocol sends them: integers stay integers"""
+    if value.is_integer() and abs(value) <= 2 ** 53:
+        return int(value)
+    return value
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    if value is None:
+        return _U16.pack(_NULL_STRING)
+    encoded = value.encode()
+    if len(encoded) >= _NULL_STRING:
+        raise ValueError("string too long for the binary protocol")
+    return _U16.pack(len(encoded)) + encoded
+
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[Optional[str], int]:
+    (length,) = _U16.unpack_from(data, offset)
+    offset += 2
+    if length == _NULL_STRING:
+        return None, offset
+    return data[offset:offset + length].decode(), offset + length
+
+
+def _encode_game_state(message: Dict) -> bytes:
+    data = message["data"]
+    return _GAME_STATE.pack(
+        GAME_STATE, float(data["points"]), float(data["lifetime_points"]), data["clicks"],
+        data["points_per_click"], data["points_per_second"]
+    )
+
+
+def _encode_click_result(message: Dict) -> bytes:
+    data = message["data"] or {"points_earned": 0, "new_total": 0, "lifetime_points": 0, "clicks": 0}
+    return _CLICK_RESULT.pack(
+        CLICK_RESULT, data["points_earned"], float(data["new_total"]), float(data["lifetime_points"]), data["clicks"]
+    )
+
+
+def _encode_purchase_result(message: Dict) -> bytes:
+    data = message["data"] or {"success": False, "message": "User not found"}
+    return _PURCHASE_RESULT.pack(
+        PURCHASE_RESULT, data["success"], _number(data.get("new_points")),
+        _number(data.get("new_points_per_click")), _number(data.get("new_points_per_second")),
+        data.get("item_quantity") or 0, _number(data.get("item_cost"))
+    ) + _pack_str(data["message"])
+
+
+def _encode_items_list(message: Dict) -> bytes:
+    items = message["data"]
+    parts = [_U8.pack(ITEMS_LIST), _pack_str(message.get("catalog_version")), _U32.pack(len(items))]
+    for item in items:
+        parts.append(_ITEM.pack(
+            item["id"], item["quantity"], float(item["current_cost"]), item["base_cost"],
+            item["points_per_click"], item["points_per_second"], item["cost_multiplier"]
+        ))
+        parts.append(_pack_str(item["name"]))
+        parts.append(_pack_str(item["description"]))
+        parts.append(_pack_str(item["image_url"]))
+    return b"".join(parts)
+
+
+def _encode_items_delta(message: Dict) -> bytes:
+    data = message["data"]
+    items = data["items"]
+    parts = [_U8.pack(ITEMS_DELTA), _pack_str(message.get("catalog_version")), _U32.pack(len(items))]
+    for item in items:
+        parts.append(_ITEM_DELTA.pack(item["id"], item["quantity"], float(item["current_cost"])))
+    parts.append(_RATES.pack(
+        _number(data.get("points")), _number(data.get("points_per_click")), _number(data.get("points_per_second"))
+    ))
+    return b"".join(parts)
+
+
+def _encode_leaderboard_update(message: Dict) -> bytes:
+    entries = message["data"]
+    parts = [_U8.pack(LEADERBOARD_UPDATE), _U32.pack(len(entries))]
+    for entry in entries:
+        parts.append(_ENTRY.pack(entry["id"], entry["rank"], float(entry["lifetime_points"])))
+        parts.append(_pack_str(entry["nickname"]))
+    return b"".join(parts)
+
+
+def _encode_rank_update(message: Dict) -> bytes:
+    data = message["data"]
+    return _RANK_UPDATE.pack(RANK_UPDATE, data["rank"], float(data["lifetime_points"]))
+
+
+def _encode_stats_update(message: Dict) -> bytes:
+    data = message["data"]
+    return _STATS_UPDATE.pack(
+        STATS_UPDATE, data["players"], data["online"], float(data["lifetime_points"]), data["clicks"]
+    )
+
+
+def _encode_rate_limited(message: Dict) -> bytes:
+    return _RATE_LIMITED.pack(RATE_LIMITED, message["data"]["retry_after"])
+
+
+def _encode_error(message: Dict) -> bytes:
+    return _U8.pack(ERROR) + _pack_str(message["data"]["message"])
+
+
+def _encode_buy_item(message: Dict) -> bytes:
+    return _BUY_ITEM.pack(BUY_ITEM, message["item_id"])
+
+
+def _encode_get_items(message: Dict) -> bytes:
+    return _U8.pack(GET_ITEMS) + _pack_str(message.get("catalog_version"))
+
+
+def _encode_subscribe(message: Dict) -> bytes:
+    # A limit of 0 keeps the server's default
+    return _U8.pack(SUBSCRIBE) + _pack_str(message["topic"]) + _U16.pack(message.get("limit") or 0)
+
+
+def _encode_unsubscribe(message: Dict) -> bytes:
+    return _U8.pack(UNSUBSCRIBE) + _pack_str(message["topic"])
+
+
+def _type_only(type_id: int) -> Callable[[Dict], bytes]:
+    frame = _U8.pack(type_id)
+    return lambda message: frame
+
+
+_ENCODERS: Dict[str, Callable[[Dict], bytes]] = {
+    "game_state": _encode_game_state,
+    "click_result": _encode_click_result,
+    "purchase_result": _encode_purchase_result,
+    "items_list": _encode_items_list,
+    "items_delta": _encode_items_delta,
+    "leaderboard_update": _encode_leaderboard_update,
+    "rank_update": _encode_rank_update,
+    "stats_update": _encode_stats_update,
+    "rate_limited": _encode_rate_limited,
+    "error": _encode_error,
+    "click": _type_only(CLICK),
+    "buy_item": _encode_buy_item,
+    "get_state": _type_only(GET_STATE),
+    "get_items": _encode_get_items,
+    "subscribe": _encode_subscribe,
+    "unsubscribe": _encode_unsubscribe,
+}
+# ping and pong go both ways; the direction decides the type byte
+_SERVER_ENCODERS = dict(_ENCODERS, ping=_type_only(PING), pong=_type_only(PONG_REPLY))
+_CLIENT_ENCODERS = dict(_ENCODERS, ping=_type_only(PING_REQUEST), pong=_type_only(PONG))
+
+
+def encode_message(message: Dict[str, Any], client: bool = False) -> Optional[bytes]:
+    """
+    Encode a message as a binary frame, sent by the server unless client is set.
+
+    Returns None for message types without a binary layout (or values that
+    do not fit it); those are sent as JSON text frames instead.
+    """
+    encoder = (_CLIENT_ENCODERS if client else _SERVER_ENCODERS).get(message.get("type"))
+    if encoder is None:
+        return None
+    try:
+        return encoder(message)
+    except (ValueError, TypeError, KeyError, struct.error):
+        return None
+
+
+def _decode_game_state(data: bytes) -> Dict:
+    _, points, lifetime_points, clicks, points_per_click, points_per_second = _GAME_STATE.unpack_from(data)
+    return {"type": "game_state", "data": {
+        "points": _points(points), "lifetime_points": _points(lifetime_points), "clicks": clicks,
+        "points_per_click": points_per_click, "points_per_second": points_per_second
+    }}
+
+
+def _decode_click_result(data: bytes) -> Dict:
+    _, points_earned, new_total, lifetime_points, clicks = _CLICK_RESULT.unpack_from(data)
+    return {"type": "click_result", "data": {
+        "points_earned": points_earned, "new_total": _points(new_total),
+        "lifetime_points": _points(lifetime_points), "clicks": clicks
+    }}
+
+
+def _decode_purchase_result(data: bytes) -> Dict:
+    _, success, new_points, points_per_click, points_per_second, quantity, item_cost = _PURCHASE_RESULT.unpack_from(data)
+    text, _ = _unpack_str(data, _PURCHASE_RESULT.size)
+    result = {"success": bool(success), "message": text}
+    if success:
+        result.update({
+            "new_points": _points(new_points), "new_points_per_click": points_per_click,
+            "new_points_per_second": points_per_second, "item_quantity": quantity, "item_cost": _points(item_cost)
+        })
+    return {"type": "purchase_result", "data": result}
+
+
+def _decode_items_list(data: bytes) -> Dict:
+    catalog_version, offset = _unpack_str(data, 1)
+    (count,) = _U32.unpack_from(data, offset)
+    offset += 4
+    items: List[Dict] = []
+    for _ in range(count):
+        item_id, quantity, current_cost, base_cost, per_click, per_second, multiplier = _ITEM.unpack_from(data, offset)
+        offset += _ITEM.size
+        name, offset = _unpack_str(data, offset)
+        description, offset = _unpack_str(data, offset)
+        image_url, offset = _unpack_str(data, offset)
+        items.append({
+            "id": item_id, "name": name, "description": description, "base_cost": _points(base_cost),
+            "current_cost": _points(current_cost), "points_per_click": per_click, "points_per_second": per_second,
+            "cost_multiplier": multiplier, "quantity": quantity, "image_url": image_url
+        })
+    return {"type": "items_list", "catalog_version": catalog_version, "data": items}
+
+
+def _decode_items_delta(data: bytes) -> Dict:
+    catalog_version, offset = _unpack_str(data, 1)
+    (count,) = _U32.unpack_from(data, offset)
+    offset += 4
+    items = []
+    for _ in range(count):
+        item_id, quantity, current_cost = _ITEM_DELTA.unpack_from(data, offset)
+        offset += _ITEM_DELTA.size
+        items.append({"id": item_id, "quantity": quantity, "current_cost": _points(current_cost)})
+    points, points_per_click, points_per_second = _RATES.unpack_from(data, offset)
+    delta: Dict[str, Any] = {"items": items}
+    if not math.isnan(points_per_click):
+        delta.update({
+            "points": _points(points), "points_per_click": points_per_click, "points_per_second": points_per_second
+        })
+    return {"type": "items_delta", "catalog_version": catalog_version, "data": delta}
+
+
+def _decode_leaderboard_update(data: bytes) -> Dict:
+    (count,) = _U32.unpack_from(data, 1)
+    offset = 5
+    entries = []
+    for _ in range(count):
+        entry_id, rank, lifetime_points = _ENTRY.unpack_from(data, offset)
+        nickname, offset = _unpack_str(data, offset + _ENTRY.size)
+        entries.append({"id": entry_id, "nickname": nickname, "lifetime_points": _points(lifetime_points), "rank": rank})
+    return {"type": "leaderboard_update", "data": entries}
+
+
+def _decode_rank_update(data: bytes) -> Dict:
+    _, rank, lifetime_points = _RANK_UPDATE.unpack_from(data)
+    return {"type": "rank_update", "data": {"rank": rank, "lifetime_points": _points(lifetime_points)}}
+
+
+def _decode_stats_update(data: bytes) -> Dict:
+    _, players, online, lifetime_points, clicks = _STATS_UPDATE.unpack_from(data)
+    return {"type": "stats_update", "data": {
+        "players": players, "lifetime_points": _points(lifetime_points), "clicks": clicks, "online": online
+    }}
+
+
+def _decode_rate_limited(data: bytes) -> Dict:
+    _, retry_after = _RATE_LIMITED.unpack_from(data)
+    return {"type": "rate_limited", "data": {"retry_after": retry_after}}
+
+
+def _decode_error(data: bytes) -> Dict:
+    text, _ = _unpack_str(data, 1)
+    return {"type": "error", "data": {"message": text}}
+
+
+def _decode_buy_item(data: bytes) -> Dict:
+    _, item_id = _BUY_ITEM.unpack_from(data)
+    return {"type": "buy_item", "item_id": item_id}
+
+
+def _decode_get_items(data: bytes) -> Dict:
+    catalog_version = _unpack_str(data, 1)[0] if len(data) > 1 else None
+    return {"type": "get_items", "catalog_version": catalog_version}
+
+
+def _decode_subscribe(data: bytes) -> Dict:
+    topic, offset = _unpack_str(data, 1)
+    (limit,) = _U16.unpack_from(data, offset)
+    return {"type": "subscribe", "topic": topic, "limit": limit or None}
+
+
+def _decode_unsubscribe(data: bytes) -> Dict:
+    return {"type": "unsubscribe", "topic": _unpack_str(data, 1)[0]}
+
+
+_DECODERS: Dict[int, Callable[[bytes], Dict]] = {
+    GAME_STATE: _decode_game_state,
+    CLICK_RESULT: _decode_click_result,
+    PURCHASE_RESULT: _decode_purchase_result,
+    ITEMS_LIST: _decode_items_list,
+    ITEMS_DELTA: _decode_items_delta,
+    LEADERBOARD_UPDATE: _decode_leaderboard_update,
+    RANK_UPDATE: _decode_rank_update,
+    STATS_UPDATE: _decode_stats_update,
+    RATE_LIMITED: _decode_rate_limited,
+    ERROR: _decode_error,
+    CLICK: lambda data: {"type": "click"},
+    BUY_ITEM: _decode_buy_item,
+    GET_STATE: lambda data: {"type": "get_state"},
+    GET_ITEMS: _decode_get_items,
+    PONG: lambda data: {"type": "pong"},
+    PING_REQUEST: lambda data: {"type": "ping"},
+    SUBSCRIBE: _decode_subscribe,
+    UNSUBSCRIBE: _decode_unsubscribe,
+    PING: lambda data: {"type": "ping"},
+    PONG_REPLY: lambda data: {"type": "pong"},
+}
+
+
+def decode_message(data: bytes) -> Dict[str, Any]:
+    """
+    Decode a binary frame into the message the JSON protocol would carry.
+
+    Unknown type bytes decode to {"type": None}; truncated frames raise
+    struct.error.
+    """
+    if not data:
+        return {"type": None}
+    decoder = _DECODERS.get(data[0])
+    if decoder is None:
+        return {"type": None}
+    return decoder(data)
+
+
+__all__ = [
+    "BINARY_SUBPROTOCOL",
+    "encode_message",
+    "decode_message",
+]
@@ -0,0 +1,158 @@
+"""
+Compare bytes on the wire and CPU cost per message for the compression
+options available to HTTP responses and WebSocket frames.
+
+Usage:
+    python -m benchmarks.compression [--repeat 200] [--leaderboard-size 100] [--json]
+
+Payloads mirror what the API sends: the full item list, game state with
+items, leaderboards and small WebSocket click results. permessage-deflate is
+simulated the way WebSocket servers apply it: raw deflate with a sliding
+window shared across consecutive messages (context takeover).
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+import zlib
+from typing import Callable, Dict, List
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ITEMS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "items.json")
+
+
+def build_items_list(quantity: int = 3) -> List[Dict]:
+    """Items as sent by /game/state/with-items and the WS get_items message"""
+    with open(ITEMS_FILE, "r") as f:
+        items = json.load(f)
+    calculated = []
+    for i, item in enumerate(items, start=1):
+        calculated.append({
+            "id": i,
+            "name": item["name"],
+            "description": item["description"],
+            "base_cost": item["base_cost"],
+            "current_cost": round(item["base_cost"] * item["cost_multiplier"] ** quantity),
+            "points_per_click": item["points_per_click"],
+            "points_per_second": item["points_per_second"],
+            "cost_multiplier": item["cost_multiplier"],
+            "quantity": quantity,
+            "image_url": item.get("image_url"),
+        })
+    return calculated
+
+
+def build_payloads(leaderboard_size: int) -> Dict[str, bytes]:
+    items = build_items_list()
+    state = {
+        "points": 123456,
+        "lifetime_points": 987654,
+        "clicks": 4321,
+        "points_per_click": 3.5,
+        "points_per_second": 42.1,
+    }
+    leaderboard = [
+        {"id": i, "nickname": f"player_{i}", "lifetime_points": 10_000_000 - i * 997, "rank": i}
+        for i in range(1, leaderboard_size + 1)
+    ]
+    messages = {
+        "items_list": {"type": "items_list", "data": items},
+        "state_with_items": dict(state, items=items),
+        "leaderboard_10": [entry for entry in leaderboard[:10]],
+        f"leaderboard_{leaderboard_size}": leaderboard,
+        "click_result": {
+            "type": "click_result",
+            "data": {"points_earned": 3.5, "new_total": 123459, "lifetime_points": 987657, "clicks": 4322},
+        },
+    }
+    return {name: json.dumps(message).encode() for name, message in messages.items()}
+
+
+def gzip_codec(level: int) -> Callable[[bytes], bytes]:
+    return lambda body: gzip.compress(body, compresslevel=level)
+
+
+def brotli_codec(quality: int) -> Callable[[bytes], bytes]:
+    return lambda body: brotli.compress(body, quality=quality)
+
+
+class PerMessageDeflate:
+    """Stateful raw deflate stream, one sync-flushed block per message"""
+
+    def __init__(self, level: int = zlib.Z_DEFAULT_COMPRESSION):
+        self.level = level
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def __call__(self, body: bytes) -> bytes:
+        data = self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        # The trailing empty block is implied by the WebSocket extension
+        return data[:-4]
+
+
+def measure(codec: Callable[[bytes], bytes], body: bytes, repeat: int) -> Dict[str, float]:
+    encoded = codec(body)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec(body)
+    elapsed = time.perf_counter() - start
+    return {
+        "bytes": len(encoded),
+        "ratio": round(len(encoded) / len(body), 3),
+        "us_per_message": round(elapsed / repeat * 1_000_000, 2),
+    }
+
+
+def run(repeat: int, leaderboard_size: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    codecs: Dict[str, Callable[[], Callable[[bytes], bytes]]] = {
+        "identity": lambda: (lambda body: body),
+        "gzip-1": lambda: gzip_codec(1),
+        "gzip-6": lambda: gzip_codec(6),
+        "gzip-9": lambda: gzip_codec(9),
+        "permessage-deflate": PerMessageDeflate,
+    }
+    if brotli is not None:
+        codecs["br-4"] = lambda: brotli_codec(4)
+        codecs["br-11"] = lambda: brotli_codec(11)
+
+    results = {}
+    for payload_name, body in build_payloads(leaderboard_size).items():
+        results[payload_name] = {
+            codec_name: measure(factory(), body, repeat) for codec_name, factory in codecs.items()
+        }
+    return results
+
+
+def print_table(results: Dict[str, Dict[str, Dict[str, float]]]):
+    print(f"{'payload':<22}{'codec':<20}{'bytes':>8}{'ratio':>8}{'us/msg':>10}")
+    for payload_name, by_codec in results.items():
+        for codec_name, result in by_codec.items():
+            print(
+                f"{payload_name:<22}{codec_name:<20}{result['bytes']:>8}"
+                f"{result['ratio']:>8.3f}{result['us_per_message']:>10.2f}"
+            )
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Encodings per measurement")
+    parser.add_argument("--leaderboard-size", type=int, default=100, help="Entries in the large leaderboard payload")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.leaderboard_size)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+        if brotli is None:
+            print("brotli not installed, skipped br codecs")
+
+
+if __name__ == "__main__":
+    main()
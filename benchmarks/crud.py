@@ -0,0 +1,223 @@
+"""
+Micro-benchmarks for the app.crud hot paths against a temporary SQLite DB.
+
+No HTTP is involved: each operation calls the CRUD layer directly with one
+long-lived session, the way a request handler does. The user table is grown
+to each requested size in turn and every operation is measured at every size.
+
+Usage:
+    python -m benchmarks.crud [--sizes 10000,100000,1000000] [--iterations 200]
+                              [--output results.json]
+                              [--baseline benchmarks/results/crud_baseline.json]
+                              [--threshold 1.25]
+
+With --baseline the run is compared against stored results and the script
+exits with status 1 if any operation's median got slower than threshold x.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+# Point the app at a throwaway database before anything imports app.config
+_db_file = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+_db_file.close()
+os.environ["SQLITE_DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.models.item import Item, UserItem  # noqa: E402
+from app.models.user import User  # noqa: E402
+from benchmarks.stats import percentile  # noqa: E402
+
+ITEMS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "items.json")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "results", "crud_baseline.json")
+SEED_CHUNK = 20_000
+# Fraction of seeded users that own items
+OWNER_FRACTION = 0.2
+
+
+def seed_items(db) -> List[Item]:
+    with open(ITEMS_FILE, "r") as f:
+        for item_data in json.load(f):
+            db.add(Item(**item_data))
+    db.commit()
+    return crud.item.get_all_items(db)
+
+
+def seed_users(db, start: int, stop: int, item_ids: List[int]):
+    """Bulk insert users [start, stop) with random scores and inventories"""
+    now = int(time.time())
+    rng = random.Random(start)
+    for chunk_start in range(start, stop, SEED_CHUNK):
+        chunk_stop = min(stop, chunk_start + SEED_CHUNK)
+        users = []
+        user_items = []
+        for i in range(chunk_start, chunk_stop):
+            users.append({
+                "id": i + 1,
+                "nickname": f"bench_{i}",
+                "password": "x",
+                "points": rng.randint(0, 10**6),
+                "lifetime_points": rng.randint(0, 10**9),
+                "clicks": rng.randint(0, 10**5),
+                "points_per_click": 1.0,
+                "points_per_second": rng.choice((0.0, 0.1, 1.0, 8.0)),
+                "last_updated": now - rng.randint(0, 3600),
+            })
+            if rng.random() < OWNER_FRACTION:
+                for item_id in rng.sample(item_ids, k=min(3, len(item_ids))):
+                    user_items.append({"user_id": i + 1, "item_id": item_id, "quantity": rng.randint(1, 20)})
+        db.execute(insert(User), users)
+        if user_items:
+            db.execute(insert(UserItem), user_items)
+        db.commit()
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 5) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "mean_us": round(sum(timings) / len(timings) * 1e6, 2),
+        "p50_us": round(percentile(timings, 50) * 1e6, 2),
+        "p95_us": round(percentile(timings, 95) * 1e6, 2),
+        "p99_us": round(percentile(timings, 99) * 1e6, 2),
+    }
+
+
+def benchmark_size(db, size: int, items: List[Item], iterations: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(size)
+    item_ids = [item.id for item in items]
+
+    def random_user_id() -> int:
+        return rng.randint(1, size)
+
+    def process_click():
+        crud.game.process_click(db, random_user_id())
+
+    def buy_item():
+        user_id = random_user_id()
+        db.query(User).filter(User.id == user_id).update({User.points: 10**12})
+        crud.game.buy_item(db, user_id, rng.choice(item_ids))
+
+    def update_passive_points():
+        user = db.get(User, random_user_id())
+        user.points_per_second = 1.0
+        user.last_updated -= 10
+        crud.game.update_passive_points(db, user)
+
+    def get_leaderboard():
+        crud.game.get_leaderboard(db, 10)
+
+    def get_user_items():
+        crud.item.get_user_items(db, random_user_id())
+
+    def calculate_item_cost():
+        item = rng.choice(items)
+        crud.item.calculate_item_cost(item.base_cost, rng.randint(0, 200), item.cost_multiplier)
+
+    operations = {
+        "process_click": process_click,
+        "buy_item": buy_item,
+        "update_passive_points": update_passive_points,
+        "get_leaderboard": get_leaderboard,
+        "get_user_items": get_user_items,
+        "calculate_item_cost": calculate_item_cost,
+    }
+    results = {}
+    for name, fn in operations.items():
+        results[name] = measure(fn, iterations)
+        db.expire_all()
+    return results
+
+
+def run(sizes: List[int], iterations: int) -> Dict:
+    db = SessionLocal()
+    results = {}
+    try:
+        items = seed_items(db)
+        item_ids = [item.id for item in items]
+        seeded = 0
+        for size in sorted(sizes):
+            start = time.perf_counter()
+            seed_users(db, seeded, size, item_ids)
+            seeded = size
+            print(f"seeded {size} users in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+            results[str(size)] = benchmark_size(db, size, items, iterations)
+    finally:
+        db.close()
+        engine.dispose()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print median ratios against the baseline and return regressed operations"""
+    regressions = []
+    print(f"{'size':>9}  {'operation':<24}{'baseline us':>13}{'current us':>13}{'ratio':>8}")
+    for size, operations in current["results"].items():
+        for name, result in operations.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = result["p50_us"] / base["p50_us"] if base["p50_us"] else 1.0
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"{size:>9}  {name:<24}{base['p50_us']:>13.2f}{result['p50_us']:>13.2f}{ratio:>8.2f}{flag}")
+            if flag:
+                regressions.append(f"{name}@{size}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated user table sizes")
+    parser.add_argument("--iterations", type=int, default=200, help="Measured calls per operation and size")
+    parser.add_argument("--output", help="Write results JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help=f"Compare against a stored results file, e.g. {DEFAULT_BASELINE}")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    try:
+        result = run([int(size) for size in args.sizes.split(",")], args.iterations)
+    finally:
+        os.unlink(_db_file.name)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
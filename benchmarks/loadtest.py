@@ -0,0 +1,264 @@
+"""
+Asyncio load generator for the REST and WebSocket game endpoints.
+
+Registers N synthetic users against a running server, then lets every user
+issue operations picked from a weighted mix until the duration elapses.
+Reports throughput and p50/p95/p99 latency per operation.
+
+Registration and login count against the server's per-address auth rate
+limit (AUTH_RATE_LIMIT_PER_IP attempts per window), and every synthetic user
+needs two attempts from this one address, so start the server with the limit
+disabled.
+
+Usage:
+    AUTH_RATE_LIMIT_PER_IP=0 python main.py  # in another terminal
+    python -m benchmarks.loadtest --users 50 --duration 30 \\
+        --mix click=60,buy=5,state=10,leaderboard=5,ws_click=15,ws_buy=2,ws_get_items=3
+
+Requires httpx and websockets.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks.stats import summarize
+
+DEFAULT_MIX = "click=60,buy=5,state=10,leaderboard=5,ws_click=15,ws_buy=2,ws_get_items=3"
+PASSWORD = "loadtest"
+# Pause after a failed operation, doubled per consecutive failure up to the cap
+ERROR_BACKOFF = 0.05
+ERROR_BACKOFF_MAX = 1.0
+
+# WS request type -> response type the client waits for
+WS_REPLIES = {
+    "click": "click_result",
+    "buy_item": "purchase_result",
+    "get_items": "items_list",
+    "get_state": "game_state",
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def report(self, elapsed: float) -> Dict[str, Dict]:
+        operations = set(self.latencies) | set(self.errors)
+        report = {}
+        for name in sorted(operations):
+            summary = summarize(self.latencies[name], elapsed)
+            summary["rejected"] = self.rejected[name]
+            summary["errors"] = self.errors[name]
+            report[name] = summary
+        return report
+
+
+def check_setup_response(response: httpx.Response):
+    if response.status_code == 429:
+        raise SystemExit("Registration was rate limited; restart the server with AUTH_RATE_LIMIT_PER_IP=0")
+    response.raise_for_status()
+
+
+class SyntheticUser:
+    def __init__(self, http: httpx.AsyncClient, ws_url: str, nickname: str, item_ids: List[int]):
+        self.http = http
+        self.ws_url = ws_url
+        self.nickname = nickname
+        self.item_ids = item_ids
+        self.headers: Dict[str, str] = {}
+        self.token: Optional[str] = None
+        self.ws = None
+
+    async def setup(self):
+        response = await self.http.post("/user/register", json={"nickname": self.nickname, "password": PASSWORD})
+        check_setup_response(response)
+        response = await self.http.post("/user/login", data={"username": self.nickname, "password": PASSWORD})
+        check_setup_response(response)
+        self.token = response.json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def drop_ws(self):
+        """Forget a WebSocket that failed; the next WS operation reconnects"""
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    async def ws_request(self, message: Dict) -> Dict:
+        if self.ws is None:
+            self.ws = await websockets.connect(f"{self.ws_url}/game/ws/{self.token}")
+            await self._ws_reply("game_state")
+        await self.ws.send(json.dumps(message))
+        return await self._ws_reply(WS_REPLIES[message["type"]])
+
+    async def _ws_reply(self, reply_type: str) -> Dict:
+        # Skip pushes (e.g. leaderboard_update) until the expected reply arrives
+        while True:
+            reply = json.loads(await self.ws.recv())
+            if reply.get("type") == reply_type:
+                return reply
+
+
+async def op_click(user: SyntheticUser) -> bool:
+    return (await user.http.post("/game/click", headers=user.headers)).is_success
+
+
+async def op_buy(user: SyntheticUser) -> bool:
+    item_id = random.choice(user.item_ids)
+    return (await user.http.post(f"/game/buy/{item_id}", headers=user.headers)).is_success
+
+
+async def op_state(user: SyntheticUser) -> bool:
+    return (await user.http.get("/game/state/with-items", headers=user.headers)).is_success
+
+
+async def op_leaderboard(user: SyntheticUser) -> bool:
+    return (await user.http.get("/game/leaderboard")).is_success
+
+
+async def op_ws_click(user: SyntheticUser) -> bool:
+    await user.ws_request({"type": "click"})
+    return True
+
+
+async def op_ws_buy(user: SyntheticUser) -> bool:
+    reply = await user.ws_request({"type": "buy_item", "item_id": random.choice(user.item_ids)})
+    return bool(reply["data"].get("success"))
+
+
+async def op_ws_get_items(user: SyntheticUser) -> bool:
+    await user.ws_request({"type": "get_items"})
+    return True
+
+
+OPERATIONS = {
+    "click": op_click,
+    "buy": op_buy,
+    "state": op_state,
+    "leaderboard": op_leaderboard,
+    "ws_click": op_ws_click,
+    "ws_buy": op_ws_buy,
+    "ws_get_items": op_ws_get_items,
+}
+
+
+async def drive_user(user: SyntheticUser, mix: Dict[str, float], deadline: float, recorder: Recorder, think_time: float):
+    names = list(mix)
+    weights = list(mix.values())
+    failures = 0
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            ok = await OPERATIONS[name](user)
+        except Exception:
+            recorder.errors[name] += 1
+            if name.startswith("ws_"):
+                await user.drop_ws()
+            # Back off instead of hammering a failing server in a tight loop
+            await asyncio.sleep(min(ERROR_BACKOFF * 2 ** failures, ERROR_BACKOFF_MAX))
+            failures = min(failures + 1, 10)
+            continue
+        failures = 0
+        recorder.latencies[name].append(time.perf_counter() - start)
+        if not ok:
+            # Expected refusals such as "Not enough points"
+            recorder.rejected[name] += 1
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+async def run(args) -> Dict:
+    mix = parse_mix(args.mix)
+    ws_url = args.base_url.replace("http", "ws", 1)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as http:
+        item_ids = [item["id"] for item in (await http.get("/items/")).json()]
+        if not item_ids:
+            raise SystemExit("Server has no items; buy operations need at least one")
+
+        run_id = uuid.uuid4().hex[:6]
+        users = [SyntheticUser(http, ws_url, f"load_{run_id}_{i}", item_ids) for i in range(args.users)]
+        semaphore = asyncio.Semaphore(args.setup_concurrency)
+
+        async def setup(user: SyntheticUser):
+            async with semaphore:
+                await user.setup()
+
+        await asyncio.gather(*(setup(user) for user in users))
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        try:
+            await asyncio.gather(*(drive_user(user, mix, deadline, recorder, args.think_time) for user in users))
+        finally:
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*(user.close() for user in users), return_exceptions=True)
+
+    return {
+        "users": args.users,
+        "duration_s": round(elapsed, 2),
+        "mix": mix,
+        "operations": recorder.report(elapsed),
+    }
+
+
+def print_report(result: Dict):
+    print(f"{result['users']} users, {result['duration_s']} s")
+    print(f"{'operation':<14}{'count':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rejected':>10}{'errors':>8}")
+    for name, s in result["operations"].items():
+        print(
+            f"{name:<14}{s['count']:>8}{s['rps']:>10.1f}{s['p50_ms']:>10.2f}"
+            f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['rejected']:>10}{s['errors']:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:3001", help="Server to load")
+    parser.add_argument("--users", type=int, default=20, help="Synthetic users to register")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to generate load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma separated operation=weight pairs")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pause between operations of one user")
+    parser.add_argument("--setup-concurrency", type=int, default=4, help="Parallel registrations (bcrypt bound)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="HTTP timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare the JSON and binary WebSocket protocols: bytes per message, with and
+without permessage-deflate, and encode/decode CPU per message.
+
+Usage:
+    python -m benchmarks.ws_protocol [--repeat 2000] [--leaderboard-size 100] [--json]
+
+Messages mirror what the game endpoint sends and receives. JSON is encoded
+the way Starlette's send_json does it; deflated sizes use the same raw
+deflate as benchmarks.compression on a fresh stream, i.e. the first message
+of its kind on a connection (later identical messages shrink to a few bytes
+with either protocol).
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+from app.utils.ws_protocol import encode_message, decode_message
+from benchmarks.compression import PerMessageDeflate, build_items_list
+
+
+def build_messages(leaderboard_size: int) -> Dict[str, Dict]:
+    items = build_items_list()
+    leaderboard = [
+        {"id": i, "nickname": f"player_{i}", "lifetime_points": 10_000_000 - i * 997, "rank": i}
+        for i in range(1, leaderboard_size + 1)
+    ]
+    return {
+        "click": {"type": "click"},
+        "buy_item": {"type": "buy_item", "item_id": 3},
+        "click_result": {
+            "type": "click_result",
+            "data": {"points_earned": 3.5, "new_total": 123459, "lifetime_points": 987657, "clicks": 4322},
+        },
+        "purchase_result": {
+            "type": "purchase_result",
+            "data": {
+                "success": True, "message": "Successfully purchased Grandma", "new_points": 120000,
+                "new_points_per_click": 4.5, "new_points_per_second": 43.1, "item_quantity": 4, "item_cost": 1749,
+            },
+        },
+        "items_list": {"type": "items_list", "catalog_version": "items-1a2b3c4d-7", "data": items},
+        "items_delta": {
+            "type": "items_delta",
+            "catalog_version": "items-1a2b3c4d-7",
+            "data": {
+                "items": [{"id": 3, "quantity": 4, "current_cost": 1749}],
+                "points": 120000, "points_per_click": 4.5, "points_per_second": 43.1,
+            },
+        },
+        "leaderboard_10": {"type": "leaderboard_update", "data": leaderboard[:10]},
+        f"leaderboard_{leaderboard_size}": {"type": "leaderboard_update", "data": leaderboard},
+    }
+
+
+def encode_json(message: Dict) -> bytes:
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def timed(function: Callable, argument, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(argument)
+    return round((time.perf_counter() - start) / repeat * 1_000_000, 2)
+
+
+def deflated_size(body: bytes) -> int:
+    return len(PerMessageDeflate()(body))
+
+
+def run(repeat: int, leaderboard_size: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    protocols = {
+        "json": (encode_json, json.loads),
+        "binary": (encode_message, decode_message),
+    }
+    results = {}
+    for name, message in build_messages(leaderboard_size).items():
+        results[name] = {}
+        for protocol, (encode, decode) in protocols.items():
+            body = encode(message)
+            results[name][protocol] = {
+                "bytes": len(body),
+                "deflated_bytes": deflated_size(body),
+                "encode_us": timed(encode, message, repeat),
+                "decode_us": timed(decode, body, repeat),
+            }
+    return results
+
+
+def print_table(results: Dict[str, Dict[str, Dict[str, float]]]):
+    print(f"{'message':<20}{'protocol':<10}{'bytes':>8}{'deflated':>10}{'enc us':>9}{'dec us':>9}")
+    for name, by_protocol in results.items():
+        for protocol, result in by_protocol.items():
+            print(
+                f"{name:<20}{protocol:<10}{result['bytes']:>8}{result['deflated_bytes']:>10}"
+                f"{result['encode_us']:>9.2f}{result['decode_us']:>9.2f}"
+            )
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="Encodings and decodings per measurement")
+    parser.add_argument("--leaderboard-size", type=int, default=100, help="Entries in the large leaderboard message")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.leaderboard_size)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
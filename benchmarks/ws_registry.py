@@ -0,0 +1,128 @@
+"""
+Benchmark the WebSocket connection registry under connect/disconnect churn.
+
+Usage:
+    python -m benchmarks.ws_registry [--connections 50000] [--churn 20000] [--json]
+
+Fills the registry with N connections of fake sockets, then measures random
+disconnect + reconnect pairs at that size, the mean time of a broadcast to
+everyone and the memory held per registered connection. The previous registry (a dict by
+user plus a list for broadcasts, removal by list.remove) is measured the
+same way for comparison; pass --skip-legacy when it gets too slow.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, List
+
+from app.api.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    """Socket stand-in whose sends cost nothing"""
+    __slots__ = ()
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def send_bytes(self, data):
+        pass
+
+    async def send_json(self, data):
+        pass
+
+
+class LegacyConnectionManager:
+    """The registry before multi-tab support, kept for comparison"""
+
+    def __init__(self):
+        self.active_connections: Dict[int, FakeWebSocket] = {}
+        self.broadcast_connections: List[FakeWebSocket] = []
+
+    async def connect(self, websocket, user_id: int, subprotocol=None):
+        await websocket.accept()
+        self.active_connections[user_id] = websocket
+        self.broadcast_connections.append(websocket)
+        return user_id
+
+    def disconnect(self, user_id: int):
+        if user_id in self.active_connections:
+            websocket = self.active_connections[user_id]
+            if websocket in self.broadcast_connections:
+                self.broadcast_connections.remove(websocket)
+            del self.active_connections[user_id]
+
+    async def broadcast(self, message):
+        for connection in self.broadcast_connections:
+            await connection.send_json(message)
+
+
+async def measure(manager, connections: int, churn: int, broadcasts: int = 5, seed: int = 1) -> Dict[str, float]:
+    rng = random.Random(seed)
+    handles = []
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for user_id in range(connections):
+        handles.append(await manager.connect(FakeWebSocket(), user_id))
+    connect_seconds = time.perf_counter() - start
+    bytes_per_connection = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(churn):
+        slot = rng.randrange(connections)
+        manager.disconnect(handles[slot])
+        handles[slot] = await manager.connect(FakeWebSocket(), slot)
+    churn_seconds = time.perf_counter() - start
+
+    message = {"type": "leaderboard_update", "data": []}
+    start = time.perf_counter()
+    for _ in range(broadcasts):
+        await manager.broadcast(message)
+    broadcast_seconds = (time.perf_counter() - start) / broadcasts
+
+    return {
+        "connect_us": round(connect_seconds / connections * 1_000_000, 2),
+        "churn_us_per_pair": round(churn_seconds / churn * 1_000_000, 2),
+        "broadcast_ms": round(broadcast_seconds * 1000, 2),
+        "bytes_per_connection": round(bytes_per_connection),
+    }
+
+
+def run(connections: int, churn: int, skip_legacy: bool) -> Dict[str, Dict[str, float]]:
+    registries = {"registry": ConnectionManager}
+    if not skip_legacy:
+        registries["legacy"] = LegacyConnectionManager
+    return {name: asyncio.run(measure(factory(), connections, churn)) for name, factory in registries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=50_000, help="Connections kept open")
+    parser.add_argument("--churn", type=int, default=20_000, help="Disconnect + reconnect pairs to measure")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only measure the current registry")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.connections, args.churn, args.skip_legacy)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'registry':<12}{'connect us':>12}{'churn us':>12}{'broadcast ms':>14}{'B/conn':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<12}{result['connect_us']:>12.2f}{result['churn_us_per_pair']:>12.2f}"
+            f"{result['broadcast_ms']:>14.2f}{result['bytes_per_connection']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,554 @@
+"""
+WebSocket capacity and soak test against a local server.
+
+Starts the app with uvicorn on a throwaway SQLite database seeded with one
+user per connection, opens every /game/ws/{token} connection and keeps them
+all open while --active of them send a click/buy_item/get_items mix at
+--rate messages per second for --duration seconds. The other connections
+only receive pushes, like players with the game open in a background tab,
+and a few probe connections ping the server twice a second.
+
+Reported:
+- resident memory of the server before connecting, with all connections
+  open and after the soak, and the increase per connection (Linux /proc)
+- event loop lag of the server (ubbclicker_event_loop_lag_seconds) and of
+  the load generator itself; a lagging generator invalidates the run
+- leaderboard pushes: fan-out time on the server (periodic_leaderboard_update
+  and the purchase publisher, ubbclicker_ws_broadcast_duration_seconds) and
+  the spread between the first and the last connection receiving a push
+- message loss: requests left without a reply after --drain seconds, pushes
+  a connection missed and connections the server dropped
+
+Usage:
+    python -m benchmarks.ws_soak [--connections 10000] [--active 500] [--duration 120]
+                                 [--rate 2] [--mix click=80,buy_item=5,get_items=15]
+                                 [--binary] [--no-compression] [--json]
+
+Server settings come from the environment, as for main.py (for example
+WS_LEADERBOARD_PUBLISH_INTERVAL=0.5 python -m benchmarks.ws_soak). More
+than about 1000 connections need a higher open file limit than most shells
+default to; the script raises its soft limit to the hard limit and the
+server inherits it. Requires httpx and websockets.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional
+
+# Point the app at a throwaway database before anything imports app.config
+_db_file = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+_db_file.close()
+os.environ["SQLITE_DATABASE_URL"] = f"sqlite:///{_db_file.name}"
+
+import httpx  # noqa: E402
+import websockets  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.config import config  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.models.item import Item  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils.metrics import DEFAULT_BUCKETS  # noqa: E402
+from app.utils.security import create_access_token, get_password_hash  # noqa: E402
+from app.utils.ws_protocol import BINARY_SUBPROTOCOL, encode_message, decode_message  # noqa: E402
+from benchmarks.stats import percentile, summarize  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ITEMS_FILE = os.path.join(ROOT, "items.json")
+DEFAULT_MIX = "click=80,buy_item=5,get_items=15"
+START_POINTS = 1_000_000
+PROBE_RATE = 2.0
+# Pushes arriving closer together than this are taken as one fan-out
+ROUND_GAP = 0.25
+# Load generator lag above which it, not the server, limits the results
+CLIENT_LAG_WARNING = 0.1
+
+# Reply type -> request it answers
+REPLY_OF = {
+    "click_result": "click",
+    "rate_limited": "click",
+    "purchase_result": "buy_item",
+    "items_list": "get_items",
+    "pong": "ping",
+}
+
+
+def raise_file_limit() -> Optional[int]:
+    """Raise the soft open file limit to the hard limit; returns the new limit"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        return hard
+    return soft
+
+
+def seed(connections: int) -> List[str]:
+    """Insert the catalog and one user per connection; returns their access tokens"""
+    # Nobody logs in, so one bcrypt hash serves every user
+    password = get_password_hash("soak")
+    with open(ITEMS_FILE, "r") as f:
+        items = json.load(f)
+    with engine.begin() as db:
+        db.execute(insert(Item), items)
+        db.execute(insert(User), [
+            {"nickname": f"soak_{i}", "password": password, "points": START_POINTS, "lifetime_points": START_POINTS}
+            for i in range(connections)
+        ])
+        user_ids = db.execute(select(User.id).order_by(User.id)).scalars().all()
+    return [create_access_token(user_id) for user_id in user_ids]
+
+
+def item_ids() -> List[int]:
+    with engine.connect() as db:
+        return db.execute(select(Item.id)).scalars().all()
+
+
+def start_server(port: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "main:fastapi_app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--backlog", "4096",
+    ]
+    # Same WebSocket settings as main.py
+    if not config.WS_PER_MESSAGE_DEFLATE:
+        command.append("--ws-per-message-deflate=false")
+    if config.WS_PING_INTERVAL:
+        command += ["--ws-ping-interval", str(config.WS_PING_INTERVAL), "--ws-ping-timeout", str(config.WS_PING_TIMEOUT)]
+    return subprocess.Popen(command, cwd=ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL)
+
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+async def wait_until_ready(http: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with status {server.returncode}")
+        try:
+            if (await http.get("/health")).is_success:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("Server did not start in time")
+
+
+def memory(pid: int) -> Dict[str, Optional[int]]:
+    """Resident and peak resident memory in bytes, None where /proc is unavailable"""
+    values: Dict[str, Optional[int]] = {"VmRSS": None, "VmHWM": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in values:
+                    values[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return {"rss": values["VmRSS"], "peak_rss": values["VmHWM"]}
+
+
+async def scrape(http: httpx.AsyncClient) -> Dict[str, float]:
+    """Samples of the Prometheus endpoint keyed by name and labels"""
+    samples = {}
+    for line in (await http.get("/metrics")).text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+def histogram_delta(before: Dict[str, float], after: Dict[str, float], name: str) -> Dict[str, float]:
+    """
+    Observations of a histogram between two scrapes. Percentiles are bucket
+    upper bounds, None when beyond the largest bucket.
+    """
+    count = after.get(f"{name}_count", 0) - before.get(f"{name}_count", 0)
+    total = after.get(f"{name}_sum", 0) - before.get(f"{name}_sum", 0)
+    prefix = f'{name}_bucket{{le="'
+    buckets = sorted(
+        (float(key[len(prefix):-2]), after[key] - before.get(key, 0))
+        for key in after if key.startswith(prefix)
+    )
+
+    def bound(p: float) -> Optional[float]:
+        for upper, cumulative in buckets:
+            if count and cumulative >= p / 100 * count:
+                return round(upper * 1000, 3) if upper != float("inf") else None
+        return 0.0
+
+    return {
+        "count": int(count),
+        "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+        "p50_le_ms": bound(50),
+        "p99_le_ms": bound(99),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.measuring = False
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.sent: Dict[str, int] = defaultdict(int)
+        self.send_errors = 0
+        self.dropped = 0
+        self.push_times: List[float] = []
+
+
+class SoakConnection:
+    """One client connection, answering server pings and matching replies to requests"""
+    __slots__ = ("ws", "binary", "pending", "pushes", "closing", "reader")
+
+    def __init__(self, ws, binary: bool):
+        self.ws = ws
+        self.binary = binary
+        # Send times of requests waiting for a reply, by request type
+        self.pending: Dict[str, Deque[float]] = defaultdict(deque)
+        self.pushes = 0
+        self.closing = False
+        self.reader: Optional[asyncio.Task] = None
+
+    async def send(self, message: Dict):
+        if self.binary:
+            await self.ws.send(encode_message(message, client=True))
+        else:
+            await self.ws.send(json.dumps(message))
+
+    async def request(self, recorder: Recorder, message: Dict):
+        kind = message["type"]
+        self.pending[kind].append(time.perf_counter())
+        if recorder.measuring:
+            recorder.sent[kind] += 1
+        await self.send(message)
+
+    async def read(self, recorder: Recorder):
+        try:
+            async for frame in self.ws:
+                now = time.perf_counter()
+                message = decode_message(frame) if isinstance(frame, bytes) else json.loads(frame)
+                kind = message.get("type")
+                if kind == "leaderboard_update":
+                    if recorder.measuring:
+                        self.pushes += 1
+                        recorder.push_times.append(now)
+                    continue
+                if kind == "ping":
+                    # The heartbeat closes connections that stay silent
+                    await self.send({"type": "pong"})
+                    continue
+                request = REPLY_OF.get(kind)
+                if kind == "items_delta" and "points" not in message["data"]:
+                    # An answer to get_items; deltas with points follow purchases
+                    request = "get_items"
+                queue = self.pending.get(request)
+                if queue:
+                    sent = queue.popleft()
+                    if recorder.measuring:
+                        recorder.latencies[request].append(now - sent)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if not self.closing:
+                recorder.dropped += 1
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self.pending.values())
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"click", "buy_item", "get_items"}
+    if unknown:
+        raise SystemExit(f"Unknown messages in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+async def open_connections(url: str, tokens: List[str], args, recorder: Recorder):
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    connect_times: List[float] = []
+    failures = 0
+
+    async def open_one(token: str) -> Optional[SoakConnection]:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ws = await websockets.connect(
+                    f"{url}/game/ws/{token}",
+                    subprotocols=[BINARY_SUBPROTOCOL] if args.binary else None,
+                    compression=None if args.no_compression else "deflate",
+                    # Browsers do not ping; the server's heartbeat does
+                    ping_interval=None,
+                    max_size=None,
+                    open_timeout=args.timeout,
+                )
+            except Exception:
+                failures += 1
+                return None
+            connect_times.append(time.perf_counter() - start)
+        connection = SoakConnection(ws, ws.subprotocol == BINARY_SUBPROTOCOL)
+        connection.reader = asyncio.create_task(connection.read(recorder))
+        return connection
+
+    start = time.perf_counter()
+    opened = await asyncio.gather(*(open_one(token) for token in tokens))
+    elapsed = time.perf_counter() - start
+    return [connection for connection in opened if connection], summarize(connect_times, elapsed), failures
+
+
+async def drive(connection: SoakConnection, recorder: Recorder, mix: Dict[str, float], rate: float,
+                deadline: float, items: List[int], rng: random.Random):
+    """Send messages on a fixed schedule, whether or not earlier ones were answered"""
+    names, weights = list(mix), list(mix.values())
+    interval = 1 / rate
+    next_send = time.perf_counter() + rng.random() * interval
+    while next_send < deadline:
+        await asyncio.sleep(max(next_send - time.perf_counter(), 0))
+        kind = rng.choices(names, weights)[0]
+        message: Dict = {"type": kind}
+        if kind == "buy_item":
+            message["item_id"] = rng.choice(items)
+        try:
+            await connection.request(recorder, message)
+        except websockets.ConnectionClosed:
+            recorder.send_errors += 1
+            return
+        next_send += interval
+
+
+async def monitor_lag(lags: List[float], deadline: float, interval: float = 0.1):
+    """Event loop lag of the load generator"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - start - interval, 0.0))
+
+
+def delivery_spread(push_times: List[float]) -> Dict[str, float]:
+    """Time from the first to the last connection receiving each fan-out"""
+    spreads = []
+    first = last = None
+    for arrival in sorted(push_times):
+        if last is not None and arrival - last > ROUND_GAP:
+            spreads.append(last - first)
+            first = None
+        if first is None:
+            first = arrival
+        last = arrival
+    if first is not None:
+        spreads.append(last - first)
+    spreads.sort()
+    return {
+        "rounds": len(spreads),
+        "p50_ms": round(percentile(spreads, 50) * 1000, 3),
+        "p99_ms": round(percentile(spreads, 99) * 1000, 3),
+        "max_ms": round(spreads[-1] * 1000, 3) if spreads else 0.0,
+    }
+
+
+def megabytes(value: Optional[int]) -> Optional[float]:
+    return round(value / 2 ** 20, 1) if value is not None else None
+
+
+async def soak(args, server: subprocess.Popen, tokens: List[str], items: List[int]) -> Dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as http:
+        await wait_until_ready(http, server)
+        await scrape(http)
+        base_memory = memory(server.pid)
+
+        recorder = Recorder()
+        connections, connect, connect_failures = await open_connections(
+            base_url.replace("http", "ws", 1), tokens, args, recorder
+        )
+        if not connections:
+            raise SystemExit("No connection could be opened")
+        await asyncio.sleep(args.settle)
+        connected_memory = memory(server.pid)
+
+        active = connections[:args.active]
+        probes = connections[args.active:args.active + args.probes] or connections[:args.probes]
+        mix = parse_mix(args.mix)
+        rng = random.Random(args.seed)
+        client_lags: List[float] = []
+
+        before = await scrape(http)
+        recorder.measuring = True
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            monitor_lag(client_lags, deadline),
+            *(drive(connection, recorder, mix, args.rate, deadline, items, random.Random(rng.random()))
+              for connection in active),
+            *(drive(connection, recorder, {"ping": 1}, PROBE_RATE, deadline, items, random.Random(rng.random()))
+              for connection in probes),
+        )
+        # Wait for replies still in flight before counting them lost
+        drain_deadline = time.perf_counter() + args.drain
+        while time.perf_counter() < drain_deadline and any(connection.waiting() for connection in connections):
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - start
+        after = await scrape(http)
+        recorder.measuring = False
+        end_memory = memory(server.pid)
+
+        lost: Dict[str, int] = defaultdict(int)
+        for connection in connections:
+            for kind, queue in connection.pending.items():
+                lost[kind] += len(queue)
+        rounds = int(after.get("ubbclicker_ws_broadcast_duration_seconds_count", 0)
+                     - before.get("ubbclicker_ws_broadcast_duration_seconds_count", 0))
+        missed = sum(max(rounds - connection.pushes, 0) for connection in connections)
+
+        for connection in connections:
+            connection.closing = True
+        await asyncio.gather(*(connection.ws.close() for connection in connections), return_exceptions=True)
+        await asyncio.gather(*(connection.reader for connection in connections), return_exceptions=True)
+
+    client_lags.sort()
+    operations = {}
+    for kind in sorted(set(recorder.sent) | set(recorder.latencies)):
+        summary = summarize(recorder.latencies[kind], elapsed)
+        summary["sent"] = recorder.sent[kind]
+        summary["lost"] = lost[kind]
+        operations[kind] = summary
+
+    connected_growth = None
+    if connected_memory["rss"] is not None and base_memory["rss"] is not None:
+        connected_growth = round((connected_memory["rss"] - base_memory["rss"]) / len(connections))
+    return {
+        "connections": len(connections),
+        "connect_failures": connect_failures,
+        "connect": connect,
+        "active": len(active),
+        "probes": len(probes),
+        "duration_s": round(elapsed, 2),
+        "server_memory_mb": {
+            "base": megabytes(base_memory["rss"]),
+            "connected": megabytes(connected_memory["rss"]),
+            "end": megabytes(end_memory["rss"]),
+            "peak": megabytes(end_memory["peak_rss"]),
+        },
+        "bytes_per_connection": connected_growth,
+        "event_loop_lag": {
+            "server": histogram_delta(before, after, "ubbclicker_event_loop_lag_seconds"),
+            "client_p99_ms": round(percentile(client_lags, 99) * 1000, 3),
+            "client_max_ms": round(client_lags[-1] * 1000, 3) if client_lags else 0.0,
+        },
+        "leaderboard_pushes": {
+            "server_fan_out": histogram_delta(before, after, "ubbclicker_ws_broadcast_duration_seconds"),
+            "delivery_spread": delivery_spread(recorder.push_times),
+            "expected": rounds * len(connections),
+            "received": len(recorder.push_times),
+            "missed": missed,
+        },
+        "operations": operations,
+        "send_errors": recorder.send_errors,
+        "dropped_connections": recorder.dropped,
+    }
+
+
+def run(args) -> Dict:
+    file_limit = raise_file_limit()
+    if file_limit is not None and file_limit < args.connections + 100:
+        print(f"warning: open file limit {file_limit} is below {args.connections} connections", file=sys.stderr)
+    tokens = seed(args.connections)
+    server = start_server(args.port)
+    try:
+        return asyncio.run(soak(args, server, tokens, item_ids()))
+    finally:
+        stop_server(server)
+        engine.dispose()
+        try:
+            os.unlink(_db_file.name)
+        except OSError:
+            pass
+
+
+def upper_bound(value: Optional[float]) -> str:
+    return f"<= {value} ms" if value is not None else f"> {max(DEFAULT_BUCKETS) * 1000:g} ms"
+
+
+def print_report(result: Dict):
+    connect = result["connect"]
+    print(
+        f"{result['connections']} connections ({result['connect_failures']} failed), "
+        f"connect p50 {connect['p50_ms']:.1f} ms p99 {connect['p99_ms']:.1f} ms; "
+        f"{result['active']} active, {result['probes']} probes, {result['duration_s']} s"
+    )
+    server_memory = result["server_memory_mb"]
+    print(
+        f"server RSS MB: base {server_memory['base']}, connected {server_memory['connected']}, "
+        f"end {server_memory['end']}, peak {server_memory['peak']}; "
+        f"{result['bytes_per_connection']} B per connection"
+    )
+    lag = result["event_loop_lag"]
+    print(
+        f"event loop lag: server p50 {upper_bound(lag['server']['p50_le_ms'])}, p99 {upper_bound(lag['server']['p99_le_ms'])}; "
+        f"load generator p99 {lag['client_p99_ms']} ms, max {lag['client_max_ms']} ms"
+    )
+    if lag["client_p99_ms"] > CLIENT_LAG_WARNING * 1000:
+        print("warning: the load generator itself is lagging; run it on another host or lower --connections/--active")
+    pushes = result["leaderboard_pushes"]
+    fan_out, spread = pushes["server_fan_out"], pushes["delivery_spread"]
+    print(
+        f"leaderboard pushes: {fan_out['count']} fan-outs, mean {fan_out['mean_ms']} ms, p99 {upper_bound(fan_out['p99_le_ms'])}; "
+        f"delivery spread p50 {spread['p50_ms']} ms, p99 {spread['p99_ms']} ms; "
+        f"{pushes['received']}/{pushes['expected']} received, {pushes['missed']} missed"
+    )
+    print(f"{'message':<12}{'sent':>8}{'lost':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in result["operations"].items():
+        print(
+            f"{name:<12}{s['sent']:>8}{s['lost']:>8}{s['rps']:>10.1f}{s['p50_ms']:>10.2f}"
+            f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+        )
+    print(f"send errors {result['send_errors']}, connections dropped by the server {result['dropped_connections']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10_000, help="Connections kept open, one user each")
+    parser.add_argument("--active", type=int, default=500, help="Connections sending the message mix")
+    parser.add_argument("--probes", type=int, default=10, help="Connections measuring ping round trips")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds of traffic")
+    parser.add_argument("--rate", type=float, default=2.0, help="Messages per second of each active connection")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma separated message=weight pairs")
+    parser.add_argument("--binary", action="store_true", help="Offer the binary subprotocol")
+    parser.add_argument("--no-compression", action="store_true", help="Do not negotiate permessage-deflate")
+    parser.add_argument("--port", type=int, default=3101, help="Port of the server started for the test")
+    parser.add_argument("--connect-concurrency", type=int, default=100, help="Handshakes in flight at once")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait after connecting before measuring")
+    parser.add_argument("--drain", type=float, default=5.0, help="Seconds to wait for outstanding replies")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Handshake and HTTP timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the message mix")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
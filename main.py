@@ -1,11 +1,15 @@
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
 
 from app import api
+from app.config import config
+from app.middleware import CompressionMiddleware, MetricsMiddleware, SQLProfileMiddleware
 from app.database import SessionLocal
+from app.exceptions import ConcurrentUpdateError
 from app import crud
 
 fastapi_app = FastAPI(title="UBBClicker API")
@@ -33,11 +37,41 @@ fastapi_app.add_middleware(
         "Origin",
         "Access-Control-Request-Method",
         "Access-Control-Request-Headers",
+        "If-None-Match",
+        "X-SQL-Profile",
     ],
+    expose_headers=["ETag", "X-SQL-Profile"],
 )
 
+# Opt-in SQL statement profiling (SQL_PROFILE, or X-SQL-Profile when SQL_PROFILE_ALLOW_HEADER)
+fastapi_app.add_middleware(
+    SQLProfileMiddleware,
+    always_on=config.SQL_PROFILE,
+    repeat_threshold=config.SQL_PROFILE_REPEAT_THRESHOLD,
+)
+
+# Compress large responses (state with items, item list, leaderboards)
+fastapi_app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=config.COMPRESSION_GZIP_LEVEL,
+    brotli_enabled=config.COMPRESSION_BROTLI,
+    brotli_quality=config.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Outermost, so recorded latency includes compression and CORS handling
+fastapi_app.add_middleware(MetricsMiddleware)
+
 fastapi_app.include_router(api.root_router)
 
+# Optimistic updates that kept conflicting with concurrent ones for the same user
+@fastapi_app.exception_handler(ConcurrentUpdateError)
+async def concurrent_update_handler(request: Request, exc: ConcurrentUpdateError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": "Game state changed concurrently, please retry"},
+    )
+
 # Health check endpoint for testing CORS
 @fastapi_app.get("/health")
 async def health_check():
@@ -85,7 +119,15 @@ async def startup_event():
 
 def main():
     # SQLite tables are already created in app/__init__.py
-    uvicorn.run("main:fastapi_app", port=3001, reload=True)
+    uvicorn.run(
+        "main:fastapi_app",
+        port=3001,
+        reload=True,
+        ws_per_message_deflate=config.WS_PER_MESSAGE_DEFLATE,
+        # Protocol-level pings also let the server notice dead TCP connections
+        ws_ping_interval=config.WS_PING_INTERVAL or None,
+        ws_ping_timeout=config.WS_PING_TIMEOUT,
+    )
 
 
 if __name__ == "__main__":
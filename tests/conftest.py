@@ -5,8 +5,10 @@ from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 import tempfile
 
-from app.database import Base, get_db
+from app.database import Base, get_db, instrument_engine
 from app.models.user import User
+from app.crud.game import leaderboard_cache
+from app.utils.rate_limit import click_limiter, auth_ip_limiter, auth_nickname_limiter
 from main import fastapi_app
 
 @pytest.fixture(scope="function")
@@ -22,6 +24,7 @@ def db_engine():
     engine = create_engine(
         TEST_SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
     )
+    instrument_engine(engine)
     Base.metadata.create_all(bind=engine)
     
     yield engine
@@ -57,6 +60,11 @@ def client(db_session):
             pass
             
     fastapi_app.dependency_overrides[get_db] = override_get_db
+    # Cached leaderboards belong to the previous test's database
+    leaderboard_cache.clear()
+    click_limiter.clear()
+    auth_ip_limiter.clear()
+    auth_nickname_limiter.clear()
     with TestClient(fastapi_app) as client:
         yield client
         
@@ -1,15 +1,20 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+import asyncio
+import json
 import time
 
 from app.models.user import User
 from app.models.item import Item, UserItem
 from app.schemas.user import UserCreate
-from app.schemas.item import ItemCreate
+from app.schemas.item import ItemCreate, ItemUpdate
 from app.crud.user import user as user_crud
 from app.crud.item import item as item_crud
 from app.crud.game import game as game_crud
+from app.utils.ws_protocol import BINARY_SUBPROTOCOL, encode_message, decode_message
+from app.api.websocket import ConnectionManager, LeaderboardPublisher, manager
+from app.utils import metrics
 
 
 def test_get_game_state(client, db_session):
@@ -131,6 +136,394 @@ def test_buy_item(client, db_session):
     assert response.status_code == 404
 
 
+def test_batch_commands(client, db_session):
+    """Test running clicks, a purchase and reads in one batch request."""
+    user = user_crud.register(db_session, UserCreate(nickname="batchuser", password="password123"))
+    user.points = 5
+    db_session.commit()
+    item = item_crud.create(db_session, ItemCreate(
+        name="Batch Cursor", description="Clicks automatically", base_cost=10,
+        points_per_click=1, points_per_second=0
+    ))
+
+    response = client.post("/user/login", data={"username": "batchuser", "password": "password123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = client.post("/game/batch", headers=headers, json={"commands": [
+        {"type": "buy_item", "item_id": item.id},
+        {"type": "click", "count": 5},
+        {"type": "buy_item", "item_id": item.id},
+        {"type": "click"},
+        {"type": "get_state"},
+        {"type": "get_items"},
+        {"type": "get_leaderboard", "limit": 5},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["type"] for result in results] == [
+        "purchase_result", "click_result", "purchase_result", "click_result",
+        "game_state", "items_list", "leaderboard"
+    ]
+    assert results[0]["data"]["success"] is False  # 5 points, costs 10
+    assert results[1]["data"]["new_total"] == 10
+    assert results[2]["data"]["success"] is True
+    assert results[3]["data"]["points_earned"] == 2
+    assert results[4]["data"]["points"] == 2
+    assert results[4]["data"]["clicks"] == 6
+    assert [i["quantity"] for i in results[5]["data"] if i["id"] == item.id] == [1]
+
+    # Everything was committed together
+    db_session.expire_all()
+    user = user_crud.get(db_session, user.id)
+    assert (user.points, user.clicks, user.points_per_click) == (2, 6, 2)
+
+    response = client.post("/game/batch", headers=headers, json={"commands": [{"type": "buy_item"}]})
+    assert response.status_code == 422
+
+    # More clicks than the rate limit's burst could never be allowed
+    from app.utils.rate_limit import click_limiter
+    response = client.post("/game/batch", headers=headers, json={"commands": [
+        {"type": "click", "count": int(click_limiter.burst)},
+        {"type": "click"},
+    ]})
+    assert response.status_code == 422
+    response = client.post("/game/batch", json={"commands": [{"type": "get_state"}]})
+    assert response.status_code == 401
+
+
+def test_websocket_items_delta(client, db_session):
+    """Test that a WebSocket purchase pushes only the changed item and get_items honours the catalog version."""
+    user = user_crud.register(db_session, UserCreate(nickname="deltauser", password="password123"))
+    user.points = 100
+    db_session.commit()
+    item = item_crud.create(db_session, ItemCreate(
+        name="Delta Cursor", description="Clicks automatically", base_cost=10,
+        points_per_click=1, points_per_second=0
+    ))
+    response = client.post("/user/login", data={"username": "deltauser", "password": "password123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect(f"/game/ws/{token}") as websocket:
+        websocket.receive_json()
+        # Leaderboard pushes after the purchase would interleave with the replies
+        websocket.send_json({"type": "unsubscribe", "topic": "leaderboard"})
+        websocket.send_json({"type": "get_items"})
+        message = websocket.receive_json()
+        assert message["type"] == "items_list"
+        version = message["catalog_version"]
+
+        websocket.send_json({"type": "buy_item", "item_id": item.id})
+        assert websocket.receive_json()["type"] == "purchase_result"
+        message = websocket.receive_json()
+        assert message["type"] == "items_delta"
+        assert message["catalog_version"] == version
+        assert message["data"]["items"] == [{"id": item.id, "quantity": 1, "current_cost": 11}]
+        assert message["data"]["points_per_click"] == 2
+
+        # A client holding the current catalog only gets quantities and costs
+        websocket.send_json({"type": "get_items", "catalog_version": version})
+        message = websocket.receive_json()
+        assert message["type"] == "items_delta"
+        assert {"id": item.id, "quantity": 1, "current_cost": 11} in message["data"]["items"]
+
+        # After a catalog change the full list is sent again
+        item_crud.update(db_session, db_obj=item, obj_in=ItemUpdate(name="Renamed Cursor"))
+        websocket.send_json({"type": "get_items", "catalog_version": version})
+        message = websocket.receive_json()
+        assert message["type"] == "items_list"
+        assert message["catalog_version"] != version
+
+
+def test_websocket_binary_protocol(client, db_session):
+    """Test that the binary subprotocol carries the same messages as JSON in fewer bytes."""
+    user = user_crud.register(db_session, UserCreate(nickname="binaryuser", password="password123"))
+    user.points = 100
+    db_session.commit()
+    item = item_crud.create(db_session, ItemCreate(
+        name="Binary Cursor", description="Clicks automatically", base_cost=10,
+        points_per_click=1, points_per_second=0.5
+    ))
+    response = client.post("/user/login", data={"username": "binaryuser", "password": "password123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect(f"/game/ws/{token}", subprotocols=[BINARY_SUBPROTOCOL]) as websocket:
+        assert websocket.accepted_subprotocol == BINARY_SUBPROTOCOL
+        state = decode_message(websocket.receive_bytes())
+        assert state["type"] == "game_state"
+        assert state["data"]["points"] == 100
+        websocket.send_bytes(encode_message({"type": "unsubscribe", "topic": "leaderboard"}, client=True))
+
+        websocket.send_bytes(encode_message({"type": "click"}))
+        frame = websocket.receive_bytes()
+        assert decode_message(frame) == {"type": "click_result", "data": {
+            "points_earned": 1.0, "new_total": 101, "lifetime_points": 1, "clicks": 1
+        }}
+        assert len(frame) < len(json.dumps(decode_message(frame)))
+
+        websocket.send_bytes(encode_message({"type": "buy_item", "item_id": item.id}))
+        purchase = decode_message(websocket.receive_bytes())
+        assert purchase["data"]["success"] is True
+        assert purchase["data"]["new_points_per_second"] == 0.5
+        delta = decode_message(websocket.receive_bytes())
+        assert delta["data"]["items"] == [{"id": item.id, "quantity": 1, "current_cost": 11}]
+
+        # JSON text frames are still understood
+        websocket.send_json({"type": "get_items"})
+        items = decode_message(websocket.receive_bytes())
+        assert items["type"] == "items_list"
+        assert [i["name"] for i in items["data"] if i["id"] == item.id] == ["Binary Cursor"]
+        assert items["data"][0]["image_url"] is None
+
+        websocket.send_bytes(encode_message({"type": "subscribe", "topic": "rank"}, client=True))
+        rank = decode_message(websocket.receive_bytes())
+        assert rank["type"] == "rank_update"
+        assert rank["data"]["rank"] >= 1
+
+    # Clients not offering the subprotocol keep getting JSON
+    with client.websocket_connect(f"/game/ws/{token}") as websocket:
+        assert websocket.receive_json()["type"] == "game_state"
+
+
+def test_websocket_multiple_tabs(client, db_session):
+    """Test that every tab of a user gets click results and closing one keeps the others."""
+    user = user_crud.register(db_session, UserCreate(nickname="tabsuser", password="password123"))
+    response = client.post("/user/login", data={"username": "tabsuser", "password": "password123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect(f"/game/ws/{token}") as first:
+        first.receive_json()
+        with client.websocket_connect(f"/game/ws/{token}") as second:
+            second.receive_json()
+            assert len(manager.user_connections(user.id)) == 2
+
+            first.send_json({"type": "click"})
+            assert first.receive_json()["data"]["clicks"] == 1
+            assert second.receive_json()["data"]["clicks"] == 1
+
+            # Replies to reads only go to the tab that asked
+            second.send_json({"type": "get_state"})
+            assert second.receive_json()["data"]["clicks"] == 1
+
+        assert len(manager.user_connections(user.id)) == 1
+        first.send_json({"type": "click"})
+        assert first.receive_json()["data"]["clicks"] == 2
+    assert manager.user_connections(user.id) == []
+
+
+class RecordingWebSocket:
+    """WebSocket stand-in that records what the server sends"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data):
+        self.sent.append(decode_message(data))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def test_websocket_heartbeat_evicts_silent_connections():
+    """Test that the heartbeat pings quiet connections and reclaims silent ones."""
+    registry = ConnectionManager()
+    active, quiet, dead = RecordingWebSocket(), RecordingWebSocket(), RecordingWebSocket()
+
+    async def scenario():
+        await registry.connect(active, 1)
+        quiet_connection = await registry.connect(quiet, 2, BINARY_SUBPROTOCOL)
+        dead_connection = await registry.connect(dead, 3)
+        quiet_connection.last_seen -= 25
+        dead_connection.last_seen -= 61
+
+        evicted = await registry.sweep(ping_interval=20, idle_timeout=60)
+        await registry.broadcast({"type": "leaderboard_update", "data": []})
+        return evicted
+
+    reclaimed = metrics.WS_CONNECTIONS_RECLAIMED_TOTAL.labels("idle")
+    before = reclaimed.value
+    assert asyncio.run(scenario()) == 1
+    assert reclaimed.value == before + 1
+
+    assert len(registry) == 2
+    assert registry.user_connections(3) == []
+    assert dead.closed_with == 1001
+    assert dead.sent == []
+    assert quiet.sent == [{"type": "ping"}, {"type": "leaderboard_update", "data": []}]
+    assert active.sent == [{"type": "leaderboard_update", "data": []}]
+
+
+def test_websocket_heartbeat_keeps_silent_clients_by_default():
+    """Test that without an idle timeout silent but reachable clients are only pinged."""
+    registry = ConnectionManager()
+    silent = RecordingWebSocket()
+
+    async def scenario():
+        connection = await registry.connect(silent, 1)
+        connection.last_seen -= 3600
+        return await registry.sweep(ping_interval=20, idle_timeout=0)
+
+    assert asyncio.run(scenario()) == 0
+    assert len(registry) == 1
+    assert silent.sent == [{"type": "ping"}]
+    assert silent.closed_with is None
+
+
+def test_websocket_heartbeat_pings_concurrently():
+    """Test that stalled sockets time out together instead of one after another."""
+    class StalledWebSocket(RecordingWebSocket):
+        async def send_text(self, data):
+            await asyncio.sleep(60)
+
+    registry = ConnectionManager()
+    stalled = [StalledWebSocket() for _ in range(5)]
+
+    async def scenario():
+        for user_id, websocket in enumerate(stalled, 1):
+            connection = await registry.connect(websocket, user_id)
+            connection.last_seen -= 25
+        start = time.monotonic()
+        evicted = await registry.sweep(ping_interval=20, idle_timeout=60, send_timeout=0.2, batch_size=3)
+        return evicted, time.monotonic() - start
+
+    evicted, elapsed = asyncio.run(scenario())
+    assert evicted == 5
+    assert len(registry) == 0
+    assert all(websocket.closed_with == 1001 for websocket in stalled)
+    # Two batches of pings, not five sequential timeouts
+    assert elapsed < 0.9
+
+
+def test_websocket_ping(client, db_session):
+    """Test that clients can ping the server and that pongs are accepted silently."""
+    user_crud.register(db_session, UserCreate(nickname="pinguser", password="password123"))
+    response = client.post("/user/login", data={"username": "pinguser", "password": "password123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect(f"/game/ws/{token}") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "pong"})
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+
+def test_websocket_topic_subscriptions(client, db_session):
+    """Test subscribing to the leaderboard, rank and stats topics."""
+    for nickname, lifetime_points in (("topicuser", 50), ("topicleader", 500), ("topicthird", 5)):
+        user = user_crud.register(db_session, UserCreate(nickname=nickname, password="password123"))
+        user.lifetime_points = lifetime_points
+    db_session.commit()
+    response = client.post("/user/login", data={"username": "topicuser", "password": "password123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect(f"/game/ws/{token}") as websocket:
+        websocket.receive_json()
+        connection = manager.user_connections(user_crud.get_by_nickname(db_session, "topicuser").id)[0]
+        assert connection in manager.subscribers("leaderboard")  # WS_LEADERBOARD_BY_DEFAULT
+
+        websocket.send_json({"type": "subscribe", "topic": "leaderboard", "limit": 2})
+        message = websocket.receive_json()
+        assert message["type"] == "leaderboard_update"
+        assert [entry["nickname"] for entry in message["data"]] == ["topicleader", "topicuser"]
+
+        websocket.send_json({"type": "subscribe", "topic": "rank"})
+        assert websocket.receive_json() == {"type": "rank_update", "data": {"rank": 2, "lifetime_points": 50}}
+
+        websocket.send_json({"type": "subscribe", "topic": "stats"})
+        message = websocket.receive_json()
+        assert message["type"] == "stats_update"
+        assert message["data"]["players"] == 3
+        assert message["data"]["lifetime_points"] == 555
+        assert message["data"]["online"] >= 1
+
+        websocket.send_json({"type": "unsubscribe", "topic": "leaderboard"})
+        websocket.send_json({"type": "subscribe", "topic": "weather"})
+        assert websocket.receive_json() == {"type": "error", "data": {"message": "Unknown topic: weather"}}
+        assert connection not in manager.subscribers("leaderboard")
+        assert connection in manager.subscribers("rank")
+    assert connection not in manager.subscribers("rank")
+
+
+def test_websocket_publish_only_to_subscribers(db_session):
+    """Test that each topic is encoded for and sent to its subscribers only."""
+    for nickname, lifetime_points in (("pubfirst", 300), ("pubsecond", 200), ("pubthird", 100)):
+        user = user_crud.register(db_session, UserCreate(nickname=nickname, password="password123"))
+        user.lifetime_points = lifetime_points
+    db_session.commit()
+    third = user_crud.get_by_nickname(db_session, "pubthird")
+
+    registry = ConnectionManager()
+    short, full, ranked, silent = (RecordingWebSocket() for _ in range(4))
+
+    async def scenario():
+        registry.subscribe(await registry.connect(short, 1), "leaderboard", limit=1)
+        registry.subscribe(await registry.connect(full, 2, BINARY_SUBPROTOCOL), "leaderboard", limit=3)
+        registry.subscribe(await registry.connect(ranked, third.id), "rank")
+        await registry.connect(silent, 4)
+        await registry.publish(db=db_session)
+
+    asyncio.run(scenario())
+    assert [entry["nickname"] for entry in short.sent[0]["data"]] == ["pubfirst"]
+    assert [entry["nickname"] for entry in full.sent[0]["data"]] == ["pubfirst", "pubsecond", "pubthird"]
+    assert ranked.sent == [{"type": "rank_update", "data": {"rank": 3, "lifetime_points": 100}}]
+    assert silent.sent == []
+
+
+def test_leaderboard_publisher_coalesces_purchases(db_session):
+    """Test that purchases only push the leaderboard when they can change it, at most once per interval."""
+    for nickname, lifetime_points in (("coalfirst", 300), ("coalsecond", 200), ("coalthird", 100)):
+        user = user_crud.register(db_session, UserCreate(nickname=nickname, password="password123"))
+        user.lifetime_points = lifetime_points
+    db_session.commit()
+    first = user_crud.get_by_nickname(db_session, "coalfirst")
+    third = user_crud.get_by_nickname(db_session, "coalthird")
+
+    registry = ConnectionManager()
+    pushes = []
+
+    async def publish(topics=None, db=None):
+        pushes.append(time.monotonic())
+        await ConnectionManager.publish(registry, topics, db=db_session)
+
+    registry.publish = publish
+    publisher = LeaderboardPublisher(registry, interval=0.3)
+    viewer = RecordingWebSocket()
+
+    async def scenario():
+        registry.subscribe(await registry.connect(viewer, 99), "leaderboard", limit=2)
+        task = asyncio.create_task(publisher.run())
+        try:
+            # Nothing pushed yet, so anything may change the board
+            assert publisher.note_change(third.id, 100)
+            await asyncio.sleep(0.05)
+            assert len(pushes) == 1
+
+            # Below the last entry of the pushed top 2, and unchanged points of a listed player
+            assert not publisher.note_change(third.id, 150)
+            assert not publisher.note_change(first.id, 300)
+
+            # A burst within the interval is pushed once, after the interval
+            for points in (250, 260, 270):
+                assert publisher.note_change(third.id, points)
+            await asyncio.sleep(0.1)
+            assert len(pushes) == 1
+            await asyncio.sleep(0.3)
+            assert len(pushes) == 2
+            assert pushes[1] - pushes[0] >= 0.3
+        finally:
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert [message["type"] for message in viewer.sent] == ["leaderboard_update", "leaderboard_update"]
+    assert not publisher.dirty
+
+
 def test_get_leaderboard(client, db_session):
     """Test retrieving the leaderboard."""
     # Create multiple users with different lifetime points
@@ -163,6 +556,26 @@ def test_get_leaderboard(client, db_session):
     assert data[2]["rank"] == 3
 
 
+def test_get_ranks(db_session):
+    """Test that counted and window ranks agree, ties included."""
+    points = [300, 100, 300, 2 ** 60, 0]
+    users = []
+    for i, lifetime_points in enumerate(points):
+        user = user_crud.register(db_session, UserCreate(nickname=f"ranked{i}", password="password"))
+        user.lifetime_points = lifetime_points
+        users.append(user)
+    db_session.commit()
+    ids = [user.id for user in users]
+    
+    expected = {ids[3]: 1, ids[0]: 2, ids[2]: 2, ids[1]: 4, ids[4]: 5}
+    for count_limit in (0, len(ids)):
+        ranks = game_crud.get_ranks(db_session, ids, count_limit=count_limit)
+        assert {user_id: rank["rank"] for user_id, rank in ranks.items()} == expected
+        assert ranks[ids[3]]["lifetime_points"] == 2 ** 60
+    assert game_crud.get_ranks(db_session, [ids[1], 999999]) == {ids[1]: {"rank": 4, "lifetime_points": 100}}
+    assert game_crud.get_ranks(db_session, []) == {}
+
+
 def test_passive_points_generation(db_session):
     """Test passive points generation over time."""
     # Create test user
@@ -201,6 +614,154 @@ def test_passive_points_generation(db_session):
     assert user.last_updated > current_time - 5  # Should be updated to current time
 
 
+def test_checkpoint_passive_income(db_session):
+    """Test crediting passive income of all users in one statement."""
+    current_time = int(time.time())
+    fast = user_crud.register(db_session, UserCreate(nickname="fastgen", password="password123"))
+    slow = user_crud.register(db_session, UserCreate(nickname="slowgen", password="password123"))
+    idle = user_crud.register(db_session, UserCreate(nickname="idlegen", password="password123"))
+    fast.points_per_second = 2.0
+    fast.last_updated = current_time - 5
+    # Has not earned a whole point yet, so it keeps accumulating
+    slow.points_per_second = 0.1
+    slow.last_updated = current_time - 5
+    idle.last_updated = current_time - 5
+    db_session.commit()
+    
+    assert game_crud.checkpoint_passive_income(db_session) == 1
+    
+    assert fast.points >= 10
+    assert fast.lifetime_points == fast.points
+    assert fast.last_updated >= current_time
+    assert slow.points == 0
+    assert slow.last_updated == current_time - 5
+    assert idle.points == 0
+    assert idle.last_updated == current_time - 5
+
+
+def test_checkpoint_passive_income_carries_fractions(db_session, monkeypatch):
+    """Test that frequent checkpoints do not round fractional passive income away."""
+    clock = [1_000_000]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    user = user_crud.register(db_session, UserCreate(nickname="fracgen", password="password123"))
+    user.points_per_second = 0.19
+    user.last_updated = clock[0]
+    db_session.commit()
+
+    # 0.19 pps checkpointed every 10 seconds for 1000 seconds
+    for _ in range(100):
+        clock[0] += 10
+        game_crud.checkpoint_passive_income(db_session)
+
+    # Truncating every checkpoint would have credited only 100 points
+    assert user.points + user.passive_carry == pytest.approx(190)
+    assert user.lifetime_points == user.points
+
+    # Reading the state and a rebalance settle the same way
+    clock[0] += 5
+    game_crud.update_passive_points(db_session, user)
+    assert user.points == 190
+    clock[0] += 5
+    game_crud.recompute_user_stats(db_session)
+    assert user.points == 191
+    assert user.passive_carry == pytest.approx(0.9)
+
+
+def test_checkpoint_passive_income_saturates(db_session, monkeypatch):
+    """Test that passive income overflowing a double saturates instead of breaking checkpoints."""
+    import math
+    from app.utils.bignum import POINTS_MAX
+
+    clock = [1_000_000]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    user = user_crud.register(db_session, UserCreate(nickname="overflow", password="password123"))
+    user.points_per_second = 1e307
+    user.last_updated = clock[0]
+    db_session.commit()
+
+    for _ in range(2):
+        clock[0] += 100
+        game_crud.checkpoint_passive_income(db_session)
+
+    db_session.refresh(user)
+    assert user.points == POINTS_MAX
+    assert user.lifetime_points == POINTS_MAX
+    assert user.passive_carry == 0
+    assert not math.isinf(user.points)
+
+
+def test_concurrent_purchase_does_not_overspend(db_engine, db_session):
+    """Test that a purchase based on a stale read is retried instead of overspending."""
+    from sqlalchemy.orm import sessionmaker
+    from app.utils import metrics
+    
+    item = item_crud.create(db_session, ItemCreate(
+        name="Contested", description="Bought twice at once", base_cost=10,
+        points_per_click=1.0, points_per_second=0.0, cost_multiplier=1.0
+    ))
+    user = user_crud.register(db_session, UserCreate(nickname="racer", password="password123"))
+    user.points = 15
+    user.lifetime_points = 15
+    user.last_updated = int(time.time())
+    db_session.commit()
+    db_session.refresh(user)
+    conflicts = metrics.OPTIMISTIC_CONFLICTS_TOTAL.labels("buy_item").value
+    
+    # Another request buys the item after this session has read the user
+    other_session = sessionmaker(bind=db_engine)()
+    try:
+        assert game_crud.buy_item(other_session, user.id, item.id)["success"]
+    finally:
+        other_session.close()
+    
+    result = game_crud.buy_item(db_session, user.id, item.id)
+    
+    assert result == {"success": False, "message": "Not enough points"}
+    assert metrics.OPTIMISTIC_CONFLICTS_TOTAL.labels("buy_item").value == conflicts + 1
+    db_session.refresh(user)
+    assert user.points == 5
+    assert item_crud.get_user_item(db_session, user.id, item.id).quantity == 1
+
+
+def test_retried_purchase_folds_journal_once(db_session, tmp_path, monkeypatch):
+    """Test that a purchase retried after a version conflict credits journaled clicks once."""
+    from sqlalchemy.orm.exc import StaleDataError
+    from app.utils.journal import game_journal
+    
+    item = item_crud.create(db_session, ItemCreate(
+        name="Retried", description="Bought after a conflict", base_cost=2,
+        points_per_click=1.0, points_per_second=0.0, cost_multiplier=1.0
+    ))
+    user = user_crud.register(db_session, UserCreate(nickname="retrier", password="password123"))
+    user.last_updated = int(time.time()) - 5
+    db_session.commit()
+    
+    # The first purchase commit loses to a concurrent update of the row
+    add_user_item = item_crud.add_user_item
+    conflicts = []
+    
+    def add_user_item_with_conflict(*args, **kwargs):
+        if not conflicts:
+            conflicts.append(True)
+            raise StaleDataError("users row was updated concurrently")
+        return add_user_item(*args, **kwargs)
+    
+    monkeypatch.setattr(item_crud, "add_user_item", add_user_item_with_conflict)
+    game_journal.open(str(tmp_path / "clicks.journal"))
+    try:
+        for _ in range(3):
+            game_crud.process_click(db_session, user.id)
+        
+        assert game_crud.buy_item(db_session, user.id, item.id)["success"]
+        assert conflicts
+        db_session.expire_all()
+        user = db_session.get(User, user.id)
+        assert (user.clicks, user.lifetime_points, user.points) == (3, 3, 1)
+        assert game_journal.pending_for(user.id) is None
+    finally:
+        game_journal.close()
+
+
 def test_calculate_item_cost(db_session):
     """Test item cost calculation based on quantity."""
     base_cost = 10
@@ -210,4 +771,418 @@ def test_calculate_item_cost(db_session):
     assert item_crud.calculate_item_cost(base_cost, 0, multiplier) == 10
     assert item_crud.calculate_item_cost(base_cost, 1, multiplier) == 11  # 10 * 1.15 = 11.5, rounded to 11
     assert item_crud.calculate_item_cost(base_cost, 2, multiplier) == 13  # 10 * 1.15^2 = 13.225, rounded to 13
-    assert item_crud.calculate_item_cost(base_cost, 10, multiplier) == 41  # 10 * 1.15^10 = 40.87, rounded to 41
\ No newline at end of file
+    assert item_crud.calculate_item_cost(base_cost, 10, multiplier) == 41  # 10 * 1.15^10 = 40.87, rounded to 41
+
+def test_get_leaderboard_conditional(client, db_session):
+    """Test ETag revalidation of the leaderboard."""
+    user = user_crud.register(db_session, UserCreate(nickname="etagleader", password="password"))
+    user.lifetime_points = 100
+    db_session.commit()
+    
+    response = client.get("/game/leaderboard")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    
+    response = client.get("/game/leaderboard", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_get_leaderboard_limit_bounds(client):
+    """Test that the leaderboard limit is validated and cached limits stay bounded."""
+    from app.crud.game import leaderboard_cache
+    
+    assert client.get("/game/leaderboard", params={"limit": -1}).status_code == 422
+    assert client.get("/game/leaderboard", params={"limit": 0}).status_code == 422
+    assert client.get("/game/leaderboard", params={"limit": 101}).status_code == 422
+    
+    for limit in range(1, 101):
+        assert client.get("/game/leaderboard", params={"limit": limit}).status_code == 200
+    assert len(leaderboard_cache.keys()) <= leaderboard_cache.max_entries
+    assert 100 in leaderboard_cache.keys()
+
+
+def test_metrics_endpoint(client, db_session):
+    """Test that request, SQL and WebSocket metrics are exposed."""
+    user_crud.register(db_session, UserCreate(nickname="metricsuser", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "metricsuser", "password": "password123"}
+    )
+    token = response.json()["access_token"]
+    client.post("/game/click", headers={"Authorization": f"Bearer {token}"})
+    
+    with client.websocket_connect(f"/game/ws/{token}") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "click"})
+        websocket.receive_json()
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'ubbclicker_http_request_duration_seconds_bucket{method="POST",route="/game/click",le="+Inf"}' in body
+    assert "ubbclicker_db_commits_total" in body
+    assert 'ubbclicker_ws_messages_total{type="click"}' in body
+    
+    # Every click request ran at least one SQL statement
+    for line in body.splitlines():
+        if line.startswith('ubbclicker_db_statements_per_request_bucket{route="/game/click",le="0"}'):
+            assert line.endswith(" 0")
+
+
+def test_event_loop_lag_monitor():
+    """Test that work holding the event loop shows up as event loop lag."""
+    from app.api.game import monitor_event_loop_lag
+
+    lag = metrics.EVENT_LOOP_LAG._children[()]
+    count, total = sum(lag.bucket_counts), lag.sum
+
+    async def scenario():
+        task = asyncio.create_task(monitor_event_loop_lag(0.01))
+        await asyncio.sleep(0)
+        time.sleep(0.05)  # a blocking call on the loop
+        await asyncio.sleep(0.015)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert sum(lag.bucket_counts) > count
+    assert lag.sum - total >= 0.03
+
+
+def test_sql_profile_header(client, db_session, caplog, monkeypatch):
+    """Test that X-SQL-Profile returns a statement summary for the request."""
+    from app.config import config
+    user_crud.register(db_session, UserCreate(nickname="profileuser", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "profileuser", "password": "password123"}
+    )
+    token = response.json()["access_token"]
+    
+    # Profiling is opt-in
+    response = client.get("/game/state/with-items", headers={"Authorization": f"Bearer {token}"})
+    assert "x-sql-profile" not in response.headers
+    
+    # The header is ignored unless explicitly allowed
+    headers = {"Authorization": f"Bearer {token}", "X-SQL-Profile": "1"}
+    response = client.get("/game/state/with-items", headers=headers)
+    assert "x-sql-profile" not in response.headers
+    
+    monkeypatch.setattr(config, "SQL_PROFILE_ALLOW_HEADER", True)
+    with caplog.at_level("WARNING", logger="app.utils.sql_profile"):
+        response = client.get(
+            "/game/state/with-items",
+            headers={"Authorization": f"Bearer {token}", "X-SQL-Profile": "1"}
+        )
+    assert response.status_code == 200
+    summary = dict(part.strip().split("=") for part in response.headers["x-sql-profile"].split(";"))
+    assert int(summary["statements"]) > 0
+    assert "repeated" in summary
+    # The full profile is logged where an unconfigured logger shows it
+    assert any(r.getMessage().startswith("SQL profile for GET /game/state/with-items") for r in caplog.records)
+
+
+def test_slow_query_log(client, db_session, caplog, monkeypatch):
+    """Test that slow statements are logged with route and query plan."""
+    from app.utils.slow_query import slow_query_log
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0.000001)
+    
+    user_crud.register(db_session, UserCreate(nickname="slowuser", password="password"))
+    with caplog.at_level("WARNING", logger="app.utils.slow_query"):
+        response = client.get("/game/leaderboard?limit=5")
+    assert response.status_code == 200
+    
+    entries = [r.getMessage() for r in caplog.records if "ORDER BY users.lifetime_points" in r.getMessage()]
+    assert entries
+    assert "GET /game/leaderboard" in entries[0]
+    assert "parameters: (int, int)" in entries[0]
+    assert "SCAN users" in entries[0]
+
+
+def test_click_rate_limit(client, db_session, monkeypatch):
+    """Test that clicks above the per-user rate are rejected without DB work."""
+    from app.utils.rate_limit import click_limiter
+    monkeypatch.setattr(click_limiter, "rate", 1.0)
+    monkeypatch.setattr(click_limiter, "burst", 3.0)
+    
+    user_crud.register(db_session, UserCreate(nickname="autoclicker", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "autoclicker", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    statuses = [client.post("/game/click", headers=headers).status_code for _ in range(5)]
+    assert statuses[:3] == [200, 200, 200]
+    assert statuses[3:] == [429, 429]
+    
+    response = client.post("/game/click", headers=headers)
+    assert int(response.headers["retry-after"]) >= 1
+    
+    # Rejected clicks were not counted
+    response = client.get("/game/state", headers=headers)
+    assert response.json()["clicks"] == 3
+
+
+def test_click_journal(client, db_session, tmp_path):
+    """Test journaled clicks, snapshots and replay after a crash."""
+    from app.utils.journal import game_journal
+    journal_path = str(tmp_path / "clicks.journal")
+    
+    user = user_crud.register(db_session, UserCreate(nickname="journaled", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "journaled", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    game_journal.open(journal_path)
+    try:
+        for _ in range(3):
+            response = client.post("/game/click", headers=headers)
+        assert response.json()["clicks"] == 3
+        
+        # Clicks are only in the journal so far, but visible in the state
+        db_session.expire_all()
+        assert db_session.get(User, user.id).clicks == 0
+        assert client.get("/game/state", headers=headers).json()["points"] == 3
+        
+        assert game_crud.snapshot_journal(db_session, compact=True) == 1
+        assert db_session.get(User, user.id).clicks == 3
+        assert client.get("/game/state", headers=headers).json()["points"] == 3
+        
+        # Simulate a crash: journaled clicks that were never snapshotted
+        client.post("/game/click", headers=headers)
+        client.post("/game/click", headers=headers)
+        game_journal.close()
+        
+        game_journal.open(journal_path)
+        assert game_crud.recover_journal(db_session) == 2
+        db_session.expire_all()
+        user = db_session.get(User, user.id)
+        assert (user.clicks, user.points, user.lifetime_points) == (5, 5, 5)
+        
+        # Replaying again after the snapshot applies nothing twice
+        game_journal.close()
+        game_journal.open(journal_path)
+        assert game_crud.recover_journal(db_session) == 0
+        db_session.expire_all()
+        assert db_session.get(User, user.id).clicks == 5
+    finally:
+        game_journal.close()
+
+
+def test_purchase_folds_only_buyers_journal(db_session, tmp_path):
+    """Test that a purchase folds only the buyer's journaled clicks and replay skips them."""
+    from app.utils.journal import game_journal
+    journal_path = str(tmp_path / "clicks.journal")
+    
+    item = item_crud.create(db_session, ItemCreate(
+        name="Journal Item", description="Bought with journaled points", base_cost=2,
+        points_per_click=1.0, points_per_second=0.0, cost_multiplier=1.0
+    ))
+    buyer = user_crud.register(db_session, UserCreate(nickname="jbuyer", password="password123"))
+    clicker = user_crud.register(db_session, UserCreate(nickname="jclicker", password="password123"))
+    
+    game_journal.open(journal_path)
+    try:
+        for _ in range(3):
+            game_crud.process_click(db_session, buyer.id)
+            game_crud.process_click(db_session, clicker.id)
+        
+        assert game_crud.buy_item(db_session, buyer.id, item.id)["success"]
+        db_session.expire_all()
+        assert (db_session.get(User, buyer.id).points, db_session.get(User, buyer.id).clicks) == (1, 3)
+        # The other player's clicks are still only journaled
+        assert db_session.get(User, clicker.id).clicks == 0
+        assert game_journal.pending_for(buyer.id) is None
+        assert game_journal.pending_for(clicker.id) == (3, 3)
+        
+        # Crash before any snapshot: the buyer's folded clicks are not replayed
+        game_journal.close()
+        game_journal.open(journal_path)
+        assert game_crud.recover_journal(db_session) == 3
+        db_session.expire_all()
+        assert (db_session.get(User, buyer.id).clicks, db_session.get(User, buyer.id).lifetime_points) == (3, 3)
+        assert db_session.get(User, clicker.id).clicks == 3
+    finally:
+        game_journal.close()
+
+
+def test_user_actor_coalesces_clicks(db_engine, db_session):
+    """Test that clicks queued to a user's actor are persisted together and in order."""
+    import asyncio
+    from sqlalchemy.orm import sessionmaker
+    from app.api.actors import UserActors
+    from app.utils import metrics
+    
+    item = item_crud.create(db_session, ItemCreate(
+        name="Actor Item", description="Bought between clicks", base_cost=2,
+        points_per_click=1.0, points_per_second=0.0, cost_multiplier=1.0
+    ))
+    user = user_crud.register(db_session, UserCreate(nickname="actoruser", password="password123"))
+    actors = UserActors(idle_timeout=0.05, session_factory=sessionmaker(autoflush=False, bind=db_engine))
+    
+    async def burst():
+        commands = [actors.click(user.id) for _ in range(3)]
+        commands.append(actors.buy(user.id, item.id))
+        commands += [actors.click(user.id) for _ in range(2)]
+        results = await asyncio.gather(*commands)
+        assert len(actors) == 1
+        await asyncio.sleep(0.2)
+        assert len(actors) == 0
+        return results
+    
+    batch_sizes = metrics.USER_ACTOR_BATCH_SIZE.labels()
+    up_to_eight = batch_sizes.bucket_counts[5]
+    results = asyncio.run(burst())
+    
+    # All six commands were taken in one batch (the 5 < size <= 8 bucket)
+    assert batch_sizes.bucket_counts[5] == up_to_eight + 1
+    assert [result["new_total"] for result in results[:3]] == [1, 2, 3]
+    assert results[3]["success"] and results[3]["new_points"] == 1
+    # Clicks after the purchase earn the new points per click
+    assert [result["new_total"] for result in results[4:]] == [3, 5]
+    assert [result["clicks"] for result in results[4:]] == [4, 5]
+    
+    db_session.expire_all()
+    assert db_session.get(User, user.id).clicks == 5
+
+
+def test_user_actor_stop_cancels_in_flight_batch(db_engine):
+    """Test that stopping the actors resolves the futures of the batch being processed."""
+    import asyncio
+    import threading
+    from sqlalchemy.orm import sessionmaker
+    from app.api.actors import UserActors
+    
+    actors = UserActors(session_factory=sessionmaker(autoflush=False, bind=db_engine))
+    started, release = threading.Event(), threading.Event()
+    
+    def blocked(user_id, group):
+        started.set()
+        release.wait(5)
+        return [None] * len(group)
+    actors._execute = blocked
+    
+    async def scenario():
+        pending = asyncio.ensure_future(actors.click(1))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await actors.stop()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(pending, 1)
+    
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        actors._executor.shutdown()
+
+
+def test_click_through_user_actor(client, db_engine, db_session, monkeypatch):
+    """Test the REST click endpoint with per-user actors enabled."""
+    from sqlalchemy.orm import sessionmaker
+    from app.api.actors import user_actors
+    from app.config import config
+    monkeypatch.setattr(config, "USER_ACTORS", True)
+    monkeypatch.setattr(user_actors, "session_factory", sessionmaker(autoflush=False, bind=db_engine))
+    
+    user_crud.register(db_session, UserCreate(nickname="actorclient", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "actorclient", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    for expected in (1, 2):
+        response = client.post("/game/click", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["clicks"] == expected
+
+
+def test_points_beyond_int64(client, db_session):
+    """Test that points past int64 are stored as doubles, sorted and sent compactly."""
+    from app.utils.bignum import INT64_MAX, POINTS_MAX
+    
+    rich = user_crud.register(db_session, UserCreate(nickname="rich", password="password123"))
+    richer = user_crud.register(db_session, UserCreate(nickname="richer", password="password123"))
+    rich.points = rich.lifetime_points = INT64_MAX - 1
+    rich.points_per_click = 10.0
+    richer.points = richer.lifetime_points = 10 ** 30
+    db_session.commit()
+    
+    response = client.post(
+        "/user/login",
+        data={"username": "rich", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = client.post("/game/click", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["new_total"] == float(INT64_MAX + 9)
+    assert "e+18" in response.text
+    
+    # INTEGER and REAL values sort together numerically
+    leaderboard = client.get("/game/leaderboard").json()
+    assert [entry["nickname"] for entry in leaderboard] == ["richer", "rich"]
+    assert leaderboard[0]["lifetime_points"] == 1e30
+    
+    # Costs saturate instead of overflowing
+    assert item_crud.calculate_item_cost(10, 10_000, 1.15) == POINTS_MAX
+    assert item_crud.calculate_item_cost(10, 300, 1.15) > INT64_MAX
+
+
+def test_websocket_sends_large_points_as_floats(client, db_session):
+    """Test that WebSocket JSON frames never carry integers JavaScript would truncate."""
+    user = user_crud.register(db_session, UserCreate(nickname="bigws", password="password123"))
+    user.points = user.lifetime_points = 2 ** 60
+    db_session.commit()
+    response = client.post("/user/login", data={"username": "bigws", "password": "password123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect(f"/game/ws/{token}") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "unsubscribe", "topic": "leaderboard"})
+        websocket.send_json({"type": "click"})
+        message = websocket.receive_json()
+        assert message["type"] == "click_result"
+        assert isinstance(message["data"]["new_total"], float)
+        assert message["data"]["new_total"] == float(2 ** 60 + 1)
+
+
+def test_leaderboard_stream():
+    """Test that stream subscribers share one encoded event and resume by event id."""
+    import asyncio
+    from app.api.stream import LeaderboardStream, KEEPALIVE
+    from app.utils.cache import CachedValue
+    
+    stream = LeaderboardStream(interval=60, keepalive=0.05)
+    first = CachedValue([{"id": 1, "nickname": "a", "lifetime_points": 5, "rank": 1}], '"leaderboard-x-1-10"')
+    second = CachedValue([{"id": 2, "nickname": "b", "lifetime_points": 2 ** 60, "rank": 1}], '"leaderboard-x-2-10"')
+    
+    async def scenario():
+        # The producer would query the database; events are published by hand instead
+        stream.publish(first)
+        fresh = stream.subscribe()
+        resumed = stream.subscribe(last_event_id="leaderboard-x-1-10")
+        assert await fresh.__anext__() == b"retry: 5000\n\n"
+        assert await resumed.__anext__() == b"retry: 5000\n\n"
+        await stream.stop()
+        
+        event = await fresh.__anext__()
+        assert event.startswith(b"id: leaderboard-x-1-10\nevent: leaderboard\ndata: ")
+        # Already seen before reconnecting, so only a keepalive
+        assert await resumed.__anext__() == KEEPALIVE
+        
+        stream.publish(second)
+        assert await fresh.__anext__() is await resumed.__anext__()
+        assert stream.payload.startswith(b"id: leaderboard-x-2-10\n")
+        assert b'"lifetime_points":1.152921504606847e+18' in stream.payload
+        assert stream.subscribers == 2
+        
+        await fresh.aclose()
+        await resumed.aclose()
+        assert stream.subscribers == 0
+    
+    asyncio.run(scenario())
@@ -255,4 +255,92 @@ def test_get_user_items(client, db_session):
         f"/items/user/{other_user.id}",
         headers={"Authorization": f"Bearer {token}"}
     )
-    assert response.status_code == 403  # Forbidden
\ No newline at end of file
+    assert response.status_code == 403  # Forbidden
+
+def test_get_all_items_conditional(client, db_session):
+    """Test ETag revalidation of the item catalog."""
+    item_crud.create(db_session, ItemCreate(name="Etag Item", description="Cached item", base_cost=10))
+    
+    # First request returns the catalog with an ETag
+    response = client.get("/items/")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "max-age" in response.headers["cache-control"]
+    
+    # Revalidating with the same ETag returns 304 without a body
+    response = client.get("/items/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    
+    # Changing the catalog invalidates the ETag
+    item_crud.create(db_session, ItemCreate(name="Etag Item 2", description="New item", base_cost=20))
+    response = client.get("/items/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_get_all_items_compressed(client, db_session):
+    """Test that large item lists are gzip-compressed and small ones are not."""
+    item_crud.create(db_session, ItemCreate(name="Small Item", description="Tiny", base_cost=1))
+    
+    response = client.get("/items/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    
+    for i in range(20):
+        item_crud.create(db_session, ItemCreate(
+            name=f"Compressed Item {i}",
+            description="An item with a long enough description to grow the response",
+            base_cost=10 * (i + 1)
+        ))
+    
+    response = client.get("/items/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 21
+
+
+def test_update_item_recomputes_owner_stats(client, db_session):
+    """Test that rebalancing an item fixes its owners' derived stats."""
+    owner = user_crud.register(db_session, UserCreate(nickname="rebalanced", password="password123"))
+    other = user_crud.register(db_session, UserCreate(nickname="bystander", password="password123"))
+    booster = item_crud.create(db_session, ItemCreate(
+        name="Booster", description="Click booster", base_cost=10, points_per_click=0.5
+    ))
+    farm = item_crud.create(db_session, ItemCreate(
+        name="Farm", description="Passive income", base_cost=10, points_per_second=2.0
+    ))
+    item_crud.add_user_item(db_session, owner.id, booster.id, quantity=2)
+    item_crud.add_user_item(db_session, owner.id, farm.id, quantity=3)
+    owner.points_per_click = 2.0
+    owner.points_per_second = 6.0
+    db_session.commit()
+    
+    response = client.post(
+        "/user/login",
+        data={"username": "rebalanced", "password": "password123"}
+    )
+    token = response.json()["access_token"]
+    
+    response = client.put(
+        f"/items/{booster.id}",
+        json={"points_per_click": 1.5},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    
+    db_session.refresh(owner)
+    db_session.refresh(other)
+    assert owner.points_per_click == 1 + 2 * 1.5
+    assert owner.points_per_second == 3 * 2.0
+    assert other.points_per_click == 1.0
+    
+    # A full recomputation also resets users whose stats drifted
+    other.points_per_second = 5.0
+    db_session.commit()
+    response = client.post("/items/recompute-stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["updated_users"] == 2
+    db_session.refresh(other)
+    assert other.points_per_second == 0.0
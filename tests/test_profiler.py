@@ -0,0 +1,68 @@
+import os
+import time
+
+from app.config import config
+from app.crud.user import user as user_crud
+from app.schemas.user import UserCreate
+
+
+def test_profiler_requires_auth(client):
+    """Test that the profiler toggle is protected."""
+    response = client.post("/profiler/start", json={"duration": 1})
+    assert response.status_code == 401
+
+
+def test_profiler_samples_routes(client, db_session, tmp_path, monkeypatch):
+    """Test that a profiler run attributes samples to routes and writes them."""
+    monkeypatch.setattr(config, "PROFILER_OUTPUT_DIR", str(tmp_path))
+    user_crud.register(db_session, UserCreate(nickname="profiler", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "profiler", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    response = client.post("/profiler/start", json={"duration": 10, "interval_ms": 60000}, headers=headers)
+    assert response.status_code == 422
+    
+    response = client.post("/profiler/start", json={"duration": 10, "interval_ms": 1}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["running"] is True
+    
+    # A second start while running is rejected
+    response = client.post("/profiler/start", json={"duration": 10}, headers=headers)
+    assert response.status_code == 409
+    
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        client.post("/game/click", headers=headers)
+        status = client.get("/profiler/status", headers=headers).json()
+        if "POST /game/click" in status["by_label"]:
+            break
+    
+    response = client.post("/profiler/stop", headers=headers)
+    data = response.json()
+    assert data["running"] is False
+    assert "POST /game/click" in data["by_label"]
+    assert os.path.exists(data["output"])
+    
+    stacks = client.get("/profiler/stacks", headers=headers).text
+    assert any(line.startswith("POST /game/click;") for line in stacks.splitlines())
+
+
+def test_profiler_runs_keep_separate_files(tmp_path):
+    """Test that runs started at the same moment do not overwrite each other's output."""
+    from collections import Counter
+    from app.utils.profiler import SamplingProfiler
+    
+    outputs = []
+    for stack in (("first", "stack"), ("second", "stack")):
+        run = SamplingProfiler()
+        run.output_dir = str(tmp_path)
+        run.started_at = 1_700_000_000.123
+        run.samples = Counter({stack: 1})
+        run._write()
+        outputs.append(run.last_output)
+    
+    assert len(set(outputs)) == 2
+    assert [open(path).read().split()[0] for path in outputs] == ["first;stack", "second;stack"]
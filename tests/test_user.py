@@ -137,4 +137,70 @@ def test_refresh_token(client: TestClient, db_session: Session):
         "/user/refresh-token",
         headers={"Authorization": "Bearer invalidtoken"}
     )
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def test_login_rate_limit(client: TestClient, db_session: Session, monkeypatch):
+    """Test that repeated login attempts for one nickname are throttled."""
+    from app.utils.rate_limit import auth_nickname_limiter
+    monkeypatch.setattr(auth_nickname_limiter, "limit", 3)
+    user_crud.register(db_session, UserCreate(nickname="stuffed", password="password123"))
+    
+    for _ in range(3):
+        response = client.post(
+            "/user/login",
+            data={"username": "stuffed", "password": "wrongpass"}
+        )
+        assert response.status_code == 401
+    
+    # Even the correct password is refused until the window slides
+    response = client.post(
+        "/user/login",
+        data={"username": "stuffed", "password": "password123"}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    
+    # Rejected attempts don't use up the address's quota
+    from app.utils.rate_limit import auth_ip_limiter
+    monkeypatch.setattr(auth_ip_limiter, "limit", 4)
+    for _ in range(5):
+        response = client.post(
+            "/user/login",
+            data={"username": "stuffed", "password": "password123"}
+        )
+        assert response.status_code == 429
+    
+    # Other nicknames are unaffected
+    user_crud.register(db_session, UserCreate(nickname="innocent", password="password123"))
+    response = client.post(
+        "/user/login",
+        data={"username": "innocent", "password": "password123"}
+    )
+    assert response.status_code == 200
+
+
+def test_auth_rate_limit_concurrent_attempts(monkeypatch):
+    """Test that concurrent attempts never pass a limit before it is charged."""
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+    from fastapi import HTTPException
+    from app.api.user import check_auth_rate_limit
+    from app.utils.rate_limit import auth_ip_limiter, auth_nickname_limiter
+    monkeypatch.setattr(auth_ip_limiter, "limit", 5)
+    monkeypatch.setattr(auth_nickname_limiter, "limit", 3)
+    request = SimpleNamespace(client=SimpleNamespace(host="10.0.0.1"))
+    
+    def attempt(nickname):
+        try:
+            check_auth_rate_limit("login", request, nickname)
+            return True
+        except HTTPException:
+            return False
+    
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(attempt, ["racer"] * 32))
+    assert sum(results) == 3
+    
+    # Attempts rejected for their nickname were refunded to the address
+    assert attempt("other") and attempt("other")
+    assert not attempt("third")